@@ -0,0 +1,11 @@
+import os
+import shutil
+import tempfile
+
+# set before the app modules create their loggers
+LOG_PATH = tempfile.mkdtemp(prefix="verbiverse_log_")
+os.environ["VERBIVERSE_LOG_PATH"] = LOG_PATH
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(LOG_PATH, ignore_errors=True)
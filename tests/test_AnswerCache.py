@@ -0,0 +1,107 @@
+import os
+import shutil
+from types import SimpleNamespace
+
+from langchain.chains.combine_documents import create_stuff_documents_chain
+from langchain_community.chat_message_histories import ChatMessageHistory
+from langchain_core.documents import Document
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+
+from verbiverse.LLM.AnswerCache import AnswerCache
+from verbiverse.LLM.ChatRAGChain import ChatRAGChain
+from verbiverse.LLM.LexicalIndex import BM25Index, HybridRetriever
+
+CACHE_FOLDER = "./test_answer_cache"
+CACHE_PATH = os.path.join(CACHE_FOLDER, "answer_cache.db")
+
+
+def setup_function():
+    shutil.rmtree(CACHE_FOLDER, ignore_errors=True)
+    os.makedirs(CACHE_FOLDER)
+
+
+def teardown_module():
+    shutil.rmtree(CACHE_FOLDER, ignore_errors=True)
+
+
+def test_retrievalCache():
+    cache = AnswerCache(CACHE_PATH)
+    cache.putRetrieval("page 1", "what is a tree house?", [3, 1], [1.0, 0.0, 0.0])
+    assert cache.getRetrieval("page 1", "what is a tree house?") == (
+        "what is a tree house?",
+        [3, 1],
+    )
+    # another reading page is another search
+    assert cache.getRetrieval("page 2", "what is a tree house?") is None
+
+    similar = [0.99, 0.1, 0.0]
+    assert cache.getRetrieval("page 1", "what's a tree house?", similar) is None
+    assert cache.getRetrieval(
+        "page 1", "what's a tree house?", similar, threshold=0.95
+    ) == ("what is a tree house?", [3, 1])
+    assert cache.getRetrieval("page 1", "who is Annie?", [0.0, 1.0, 0.0], 0.95) is None
+    cache.close()
+
+
+def test_answerCache():
+    cache = AnswerCache(CACHE_PATH, max_rows=2)
+    cache.putAnswer("model a", "question", [1, 2], "answer a")
+    assert cache.getAnswer("model a", "question", [1, 2]) == "answer a"
+    assert cache.getAnswer("model b", "question", [1, 2]) is None
+    assert cache.getAnswer("model a", "question", [2, 1]) is None
+
+    cache.putAnswer("model a", "second", [1], "answer 2")
+    # the least recently used is removed over the max rows
+    cache.getAnswer("model a", "question", [1, 2])
+    cache.putAnswer("model a", "third", [1], "answer 3")
+    assert cache.getAnswer("model a", "second", [1]) is None
+    assert cache.getAnswer("model a", "question", [1, 2]) == "answer a"
+    cache.close()
+
+    cache = AnswerCache(CACHE_PATH)
+    assert cache.getAnswer("model a", "third", [1]) == "answer 3"
+    cache.close()
+
+
+def test_streamAnswer():
+    splits = [
+        Document(page_content="Jack and Annie found a tree house.", metadata={}),
+        Document(page_content="The tree house was full of books.", metadata={}),
+        Document(page_content="A Pteranodon flew over the woods.", metadata={}),
+    ]
+    reader = SimpleNamespace(pdf_path="book.pdf", pages=splits)
+    chain = ChatRAGChain(reader)
+    try:
+        chat = FakeListChatModel(responses=["It is a house in a tree.", "Annie."])
+        prompt = ChatPromptTemplate.from_messages(
+            [
+                ("system", "{context}"),
+                MessagesPlaceholder(variable_name="chat_history"),
+                ("human", "{input}"),
+            ]
+        )
+        chain.question_answer_chain = create_stuff_documents_chain(chat, prompt)
+        # the history is not used by the questions of the test
+        chain.demo_ephemeral_chat_history_for_chain = ChatMessageHistory()
+        chain.contextualize_chain = None
+        chain.model_key = "fake"
+        chain.db = None
+        chain.retriever = HybridRetriever(
+            splits=splits,
+            index=BM25Index.build([split.page_content for split in splits]),
+            k=1,
+        )
+        chain.answer_cache = AnswerCache(CACHE_PATH)
+
+        def ask(message):
+            chain.demo_ephemeral_chat_history_for_chain.clear()
+            return chain.invoke(message)
+
+        assert ask("what is the tree house?") == "It is a house in a tree."
+        # answered from the cache, the fake model would answer "Annie."
+        assert ask("what is the tree house?") == "It is a house in a tree."
+        assert chat.i == 1
+        assert ask("what flew over the woods?") == "Annie."
+    finally:
+        chain.close()
@@ -0,0 +1,66 @@
+import os
+import shutil
+from typing import List
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from verbiverse.LLM.EmbeddingCache import CachedEmbeddings, EmbeddingCache
+
+CACHE_FOLDER = "./test_embedding_cache"
+
+
+class CountingEmbedding(DeterministicFakeEmbedding):
+    calls: int = 0
+    texts: int = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        self.texts += len(texts)
+        return super().embed_documents(texts)
+
+
+def setup_module():
+    shutil.rmtree(CACHE_FOLDER, ignore_errors=True)
+
+
+def teardown_module():
+    shutil.rmtree(CACHE_FOLDER, ignore_errors=True)
+
+
+def test_cachedEmbeddings():
+    cache = EmbeddingCache(os.path.join(CACHE_FOLDER, "cache.db"))
+    model = CountingEmbedding(size=16)
+    embed = CachedEmbeddings(model, "openai", "fake", cache)
+
+    texts = ["Jack", "Annie", "Jack", "tree house"]
+    vectors = embed.embed_documents(texts)
+    assert model.calls == 1
+    # duplicated texts are sent once
+    assert model.texts == 3
+    assert vectors[0] == vectors[2]
+    assert embed.hitRate() == 0.25
+
+    # embedding the same book again makes no call
+    assert embed.embed_documents(texts) == vectors
+    assert model.calls == 1
+    assert embed.embed_documents(["tree house", "dinosaur"])[0] == vectors[3]
+    assert model.calls == 2 and model.texts == 4
+    assert embed.hits == 6 and embed.misses == 4
+
+    # the cache is kept on disk and separated by model
+    cache.close()
+    cache = EmbeddingCache(os.path.join(CACHE_FOLDER, "cache.db"))
+    model = CountingEmbedding(size=16)
+    assert (
+        CachedEmbeddings(model, "openai", "fake", cache).embed_documents(texts)
+        == vectors
+    )
+    assert model.calls == 0
+    CachedEmbeddings(model, "openai", "other", cache).embed_documents(texts)
+    assert model.calls == 1
+
+    embed = CachedEmbeddings(model, "openai", "fake", cache)
+    query = embed.embed_query("Jack")
+    assert embed.embed_query("Jack") == query
+    assert embed.hits == 1 and embed.misses == 1
+    cache.close()
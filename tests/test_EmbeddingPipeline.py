@@ -0,0 +1,107 @@
+import asyncio
+import threading
+import time
+from typing import List
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from verbiverse.LLM.EmbeddingPipeline import (
+    AdaptiveLimiter,
+    PrecomputedEmbeddings,
+    embedDocuments,
+    isRateLimitError,
+)
+
+lock = threading.Lock()
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+class SlowEmbedding(DeterministicFakeEmbedding):
+    """Takes 50 ms per request and rejects the first `rate_limited` requests"""
+
+    rate_limited: int = 0
+    calls: int = 0
+    running: int = 0
+    max_running: int = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with lock:
+            self.calls += 1
+            if self.calls <= self.rate_limited:
+                raise RateLimitError("Error code: 429 - Rate limit reached")
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(0.05)
+        with lock:
+            self.running -= 1
+            # the fake vectors are drawn from the global numpy random state
+            return super().embed_documents(texts)
+
+
+def test_isRateLimitError():
+    assert isRateLimitError(RateLimitError())
+    assert isRateLimitError(
+        Exception("Throttling.RateQuota: Requests rate limit exceeded")
+    )
+    assert not isRateLimitError(ValueError("invalid input"))
+
+
+def test_embedDocuments():
+    texts = [f"chunk {i}" for i in range(100)]
+    model = SlowEmbedding(size=8)
+    progress = []
+
+    start = time.monotonic()
+    vectors = asyncio.run(
+        embedDocuments(
+            texts,
+            model,
+            batch_size=10,
+            limiter=AdaptiveLimiter(initial=4, maximum=8),
+            progress=lambda done, total: progress.append((done, total)),
+        )
+    )
+    assert time.monotonic() - start < 10 * 0.05
+    assert model.max_running > 1
+    assert vectors == model.embed_documents(texts)
+    assert len(progress) == 10 and progress[-1] == (100, 100)
+
+
+def test_embedDocumentsBackoff():
+    texts = [f"chunk {i}" for i in range(40)]
+    model = SlowEmbedding(size=8, rate_limited=2)
+    limiter = AdaptiveLimiter(initial=4, maximum=4, base_backoff=0.01)
+
+    async def run():
+        return await embedDocuments(texts, model, batch_size=10, limiter=limiter)
+
+    vectors = asyncio.run(run())
+    assert vectors == DeterministicFakeEmbedding(size=8).embed_documents(texts)
+    assert model.calls == 6
+    # halved twice by the rate limits
+    assert limiter.limit < 4
+
+
+def test_embedDocumentsFailed():
+    model = SlowEmbedding(size=8, rate_limited=100)
+    limiter = AdaptiveLimiter(base_backoff=0.001)
+    try:
+        asyncio.run(embedDocuments(["chunk"], model, limiter=limiter, max_retries=2))
+    except RateLimitError:
+        pass
+    else:
+        assert False, "the rate limit error is raised after the retries"
+    assert model.calls == 3
+
+
+def test_precomputedEmbeddings():
+    model = DeterministicFakeEmbedding(size=8)
+    embed = PrecomputedEmbeddings({"known": [0.0] * 8}, model)
+    assert embed.embed_documents(["known", "new"]) == [
+        [0.0] * 8,
+        model.embed_documents(["new"])[0],
+    ]
+    assert embed.embed_query("query") == model.embed_query("query")
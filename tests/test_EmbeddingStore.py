@@ -0,0 +1,104 @@
+import json
+import os
+import shutil
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from verbiverse.LLM.EmbeddingStore import MANIFEST_NAME, EmbeddingStore
+
+STORE_FOLDER = "./test_embed_db"
+BOOK_FOLDER = "./test_books"
+EMBEDDING = {"provider": "openai", "model": "fake"}
+
+
+def cleanFolders():
+    for folder in (STORE_FOLDER, BOOK_FOLDER):
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def setup_module():
+    cleanFolders()
+    os.makedirs(BOOK_FOLDER)
+
+
+def teardown_module():
+    cleanFolders()
+
+
+def writeBook(name: str, content: str) -> str:
+    path = os.path.join(BOOK_FOLDER, name)
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(content)
+    return path
+
+
+def buildStore(store: EmbeddingStore, pages, embed):
+    """Builds the store in one step like the indexer, see `IncrementalIndexer.run`."""
+    splits = store.split(pages)
+    db, saved = store.create(embed, len(splits))
+    assert saved == set()
+    db.add_documents(splits, ids=[str(index) for index in range(len(splits))])
+    store.checkpoint(range(len(splits)))
+    store.finish(len(splits))
+    return db
+
+
+def test_storeKey():
+    book = writeBook("book.txt", "Jack and Annie found a tree house.")
+    copy = writeBook("copy.txt", "Jack and Annie found a tree house.")
+    edited = writeBook("edited.txt", "Jack and Annie found a magic tree house.")
+
+    store = EmbeddingStore(book, STORE_FOLDER, EMBEDDING)
+    assert EmbeddingStore(copy, STORE_FOLDER, EMBEDDING).key == store.key
+    assert EmbeddingStore(edited, STORE_FOLDER, EMBEDDING).key != store.key
+    other_model = {"provider": "openai", "model": "other"}
+    assert EmbeddingStore(book, STORE_FOLDER, other_model).key != store.key
+    other_provider = {"provider": "tongyi", "model": "fake"}
+    assert EmbeddingStore(book, STORE_FOLDER, other_provider).key != store.key
+
+
+def test_openStore():
+    content = "Jack and Annie went to the time of dinosaurs."
+    book = writeBook("dinosaurs.txt", content)
+    pages = [Document(page_content=content, metadata={"page": 0})]
+    embed = DeterministicFakeEmbedding(size=8)
+
+    store = EmbeddingStore(book, STORE_FOLDER, EMBEDDING)
+    assert not store.exists()
+    db = buildStore(store, pages, embed)
+    assert store.exists() and not os.path.exists(store.journal_path)
+    assert db.similarity_search("dinosaurs", k=1)[0].page_content == content
+    manifest = store.readManifest()
+    assert manifest["chunks"] == 1
+    assert manifest["embedding"] == EMBEDDING
+    assert manifest["sources"] == [os.path.abspath(book)]
+
+    # a renamed book is not embedded again
+    renamed = os.path.join(BOOK_FOLDER, "renamed.txt")
+    os.rename(book, renamed)
+    store = EmbeddingStore(renamed, STORE_FOLDER, EMBEDDING)
+    assert store.exists()
+    db = store.load(embed)
+    assert db.similarity_search("dinosaurs", k=1)[0].page_content == content
+    assert store.readManifest()["sources"] == [
+        os.path.abspath(book),
+        os.path.abspath(renamed),
+    ]
+    assert len(os.listdir(STORE_FOLDER)) == 1
+
+
+def test_unfinishedStore():
+    content = "Jack and Annie met a knight."
+    book = writeBook("knight.txt", content)
+    store = EmbeddingStore(book, STORE_FOLDER, EMBEDDING)
+    os.makedirs(store.path)
+    with open(os.path.join(store.path, MANIFEST_NAME), "w") as file:
+        json.dump({"key": "another store"}, file)
+    assert not store.exists()
+
+    pages = [Document(page_content=content, metadata={"page": 0})]
+    # the files of the other store are removed before building
+    buildStore(store, pages, DeterministicFakeEmbedding(size=8))
+    assert store.readManifest()["content_sha256"] == store.content_digest
+    assert store.exists()
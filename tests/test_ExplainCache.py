@@ -0,0 +1,53 @@
+import os
+import shutil
+
+from verbiverse.LLM.ExplainCache import ExplainCache, explainKey, getExplainCache
+
+CACHE_FOLDER = "./test_explain_cache"
+CACHE_PATH = os.path.join(CACHE_FOLDER, "explain_cache.db")
+
+
+def setup_function():
+    shutil.rmtree(CACHE_FOLDER, ignore_errors=True)
+
+
+def teardown_module():
+    shutil.rmtree(CACHE_FOLDER, ignore_errors=True)
+
+
+def test_explainKey():
+    key = explainKey("Tree house", "page 1", "chinese", "v1", "model")
+    assert explainKey(" tree\nhouse ", "page 1", "chinese", "v1", "model") == key
+    assert explainKey("Tree house", "page 2", "chinese", "v1", "model") != key
+    assert explainKey("Tree house", "page 1", "english", "v1", "model") != key
+    assert explainKey("Tree house", "page 1", "chinese", "v2", "model") != key
+    assert explainKey("Tree house", "page 1", "chinese", "v1", "other") != key
+
+
+def test_explainCache():
+    cache = ExplainCache(CACHE_PATH, max_rows=2)
+    assert cache.get("a") is None
+    cache.put("a", "tree", "a house in a tree")
+    assert cache.get("a") == "a house in a tree"
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.hitRate() == 0.5
+
+    cache.put("b", "house", "a building")
+    # the least recently used is removed over the max rows
+    cache.get("a")
+    cache.put("c", "woods", "a small forest")
+    assert cache.rows() == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == "a house in a tree"
+    cache.close()
+
+    cache = ExplainCache(CACHE_PATH)
+    assert cache.get("c") == "a small forest"
+    assert (cache.hits, cache.misses) == (1, 0)
+    cache.close()
+
+
+def test_sharedCache():
+    cache = getExplainCache(CACHE_FOLDER)
+    assert getExplainCache(CACHE_FOLDER) is cache
+    assert cache.db_path == CACHE_PATH
@@ -0,0 +1,95 @@
+from verbiverse.LLM.ExplainContext import (
+    ContextBuilder,
+    clipSentence,
+    estimateTokens,
+    splitSentences,
+)
+
+PAGE = """The tree house was at the top of the tallest tree in the woods. Jack looked up at it.
+Annie was al-
+ready climbing the rope ladder. "Come on!" she said.
+
+The house was full of books. Jack picked one about dinosaurs. Pi is 3.14 here."""
+
+
+def test_splitSentences():
+    sentences = [sentence for _, sentence in splitSentences(PAGE)]
+    assert sentences == [
+        "The tree house was at the top of the tallest tree in the woods.",
+        "Jack looked up at it.",
+        "Annie was already climbing the rope ladder.",
+        '"Come on!" she said.',
+        "The house was full of books.",
+        "Jack picked one about dinosaurs.",
+        "Pi is 3.14 here.",
+    ]
+    assert [paragraph for paragraph, _ in splitSentences(PAGE)] == [0] * 4 + [1] * 3
+    assert [sentence for _, sentence in splitSentences("我们走吧。你好！然后")] == [
+        "我们走吧。",
+        "你好！",
+        "然后",
+    ]
+    assert estimateTokens("我们走吧 the woods") == 6
+
+
+def test_buildContext():
+    builder = ContextBuilder()
+    # the sentence of the selection, then its neighbours in the budget
+    assert (
+        builder.build("page", PAGE, "rope\nladder", 8)
+        == "Annie was already climbing the rope ladder."
+    )
+    assert builder.build("page", PAGE, "already climbing", 13) == (
+        "Jack looked up at it. Annie was already climbing the rope ladder."
+    )
+    # every occurrence in the budget, apart sentences are joined by an ellipsis
+    assert builder.build("page", PAGE, "HOUSE", 20) == (
+        "The tree house was at the top of the tallest tree in the woods."
+        " ... The house was full of books."
+    )
+    assert builder.build("page", PAGE, "house", 1000) == " ".join(
+        sentence for _, sentence in splitSentences(PAGE)
+    )
+    # a missing selection gets the start of the page
+    assert builder.build("page", PAGE, "zebra", 15) == (
+        "The tree house was at the top of the tallest tree in the woods."
+    )
+    assert builder.build("page", "", "zebra", 15) == ""
+
+
+def test_clipSentence():
+    sentence = "The tree house was at the top of the tallest tree in the woods."
+    start = sentence.index("tallest")
+    assert (
+        clipSentence(sentence, start, start + 12, 5) == "...the tallest tree in the..."
+    )
+    assert clipSentence(sentence, 0, 3, 3) == "The tree house..."
+    assert clipSentence(sentence, 0, 3, 20) == sentence
+
+
+def test_subtitleLines():
+    builder = ContextBuilder()
+    lines = "line one\nhouse in line two\nline three\nline four house\nline five"
+    # the occurrence nearest to the current line goes first
+    assert (
+        builder.build("video", lines, "house", 3, line_breaks=True, focus=3)
+        == "line four house"
+    )
+    assert (
+        builder.build("video", lines, "house", 4, line_breaks=True, focus=1)
+        == "house in line two"
+    )
+    assert builder.build("video", lines, "four", 9, line_breaks=True) == (
+        "line three\nline four house\nline five"
+    )
+
+
+def test_pageCache():
+    builder = ContextBuilder(max_pages=2)
+    first = builder.pageSentences(1, PAGE)
+    assert builder.pageSentences(1, PAGE) is first
+    # a changed text of the page is split again
+    assert builder.pageSentences(1, PAGE + " More.") is not first
+    builder.pageSentences(2, PAGE)
+    builder.pageSentences(3, PAGE)
+    assert list(builder.pages) == [(2, False), (3, False)]
@@ -0,0 +1,146 @@
+import asyncio
+import shutil
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.prompts import PromptTemplate
+
+import verbiverse.LLM.ExplainService as explain
+from verbiverse.Functions.LanguageType import ExplainLanguage
+
+CACHE_FOLDER = "./test_explain_service"
+
+
+class FakePrompt:
+    template = PromptTemplate.from_template("Explain {word} in {answer_language}")
+    version = "test"
+
+
+@pytest.fixture
+def chat(monkeypatch):
+    chat = FakeListChatModel(responses=["a house in a tree"], sleep=0.01)
+    monkeypatch.setattr(explain, "getChatModelByCfg", lambda: chat)
+    monkeypatch.setattr(explain, "getExplainPromptTemplate", lambda *args: FakePrompt())
+    monkeypatch.setattr(explain, "translate", lambda text: "树屋")
+    # the config of the module, imported by its bare name in it
+    saved = explain.cfg.database_folder.value
+    explain.cfg.database_folder.value = CACHE_FOLDER
+    yield chat
+    explain.cfg.database_folder.value = saved
+    shutil.rmtree(CACHE_FOLDER, ignore_errors=True)
+
+
+def collect(task):
+    messages = []
+    task.messageCallBackSignal.connect(messages.append)
+    return messages
+
+
+def test_concurrencyLimit(chat):
+    async def run():
+        service = explain.ExplainService(limit=2)
+        most = 0
+
+        async def watch():
+            nonlocal most
+            while service.tasks:
+                most = max(most, service.active)
+                await asyncio.sleep(0.005)
+
+        tasks = [
+            service.explain(f"word {index}", "page", ExplainLanguage.MOTHER_TONGUE)
+            for index in range(5)
+        ]
+        messages = [collect(task) for task in tasks]
+        await asyncio.gather(watch(), *(task.task for task in tasks))
+        return most, messages
+
+    most, messages = asyncio.run(run())
+    assert most == 2
+    assert all("".join(m) == "a house in a tree\n\nBing: 树屋" for m in messages)
+
+
+def test_lazyCondition():
+    # the service created at import is not bound to any event loop
+    assert explain.explain_service.condition is None
+    service = explain.ExplainService(limit=1)
+    assert service.condition is None
+
+    async def wait():
+        await service.notify()
+        return service.condition
+
+    first = asyncio.run(wait())
+    assert first is not None and service.getCondition() is first
+
+
+def test_raiseConcurrency(chat):
+    saved = explain.cfg.explain_concurrency.value
+
+    async def run():
+        explain.cfg.explain_concurrency.value = 1
+        service = explain.ExplainService()
+        tasks = [
+            service.explain(f"limit {index}", "page", ExplainLanguage.MOTHER_TONGUE)
+            for index in range(3)
+        ]
+        await asyncio.sleep(0.03)
+        waiting = service.active
+        # the waiting explanations start before the running one is finished
+        explain.cfg.explain_concurrency.value = 3
+        await asyncio.sleep(0.01)
+        raised = service.active
+        await asyncio.gather(*(task.task for task in tasks))
+        return service, waiting, raised
+
+    try:
+        service, waiting, raised = asyncio.run(run())
+    finally:
+        explain.cfg.explain_concurrency.value = saved
+    explain.cfg.explain_concurrency.valueChanged.disconnect(service.onLimitChanged)
+    assert (waiting, raised) == (1, 3)
+
+
+def test_cancel(chat):
+    async def run():
+        service = explain.ExplainService(limit=1)
+        first = service.explain("tree house", "page 1", ExplainLanguage.MOTHER_TONGUE)
+        waiting = service.explain("Annie", "page 1", ExplainLanguage.MOTHER_TONGUE)
+        finished = []
+        first.finished.connect(lambda: finished.append(first))
+        waiting.finished.connect(lambda: finished.append(waiting))
+        messages = collect(first)
+        await asyncio.sleep(0.05)
+        # cancelled in the stream and while waiting for the running one
+        first.stop()
+        waiting.stop()
+        await asyncio.gather(first.task, waiting.task)
+        return service, finished, messages
+
+    service, finished, messages = asyncio.run(run())
+    assert 0 < len(messages) < len("a house in a tree")
+    assert len(finished) == 2
+    assert service.active == 0 and not service.tasks
+
+
+def test_cachedExplanation(chat):
+    chat.responses = ["first answer", "second answer"]
+
+    async def run(regenerate=False):
+        service = explain.ExplainService(limit=1)
+        task = service.explain(
+            "Tree  house",
+            "page 1",
+            ExplainLanguage.MOTHER_TONGUE,
+            regenerate=regenerate,
+        )
+        hits = []
+        task.cacheHitSignal.connect(lambda: hits.append(True))
+        messages = collect(task)
+        await task.task
+        return bool(hits), "".join(messages)
+
+    assert asyncio.run(run()) == (False, "first answer\n\nBing: 树屋")
+    assert asyncio.run(run()) == (True, "first answer\n\nBing: 树屋")
+    assert asyncio.run(run(regenerate=True)) == (False, "second answer\n\nBing: 树屋")
+    assert asyncio.run(run()) == (True, "second answer\n\nBing: 树屋")
@@ -0,0 +1,197 @@
+import asyncio
+import os
+import shutil
+import sqlite3
+import time
+from types import SimpleNamespace
+from typing import List
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from PySide6.QtCore import SIGNAL
+
+import verbiverse.LLM.ChatRAGChain as chat_chain
+from verbiverse.LLM.EmbeddingStore import STATUS_BUILDING, EmbeddingStore
+from verbiverse.LLM.IncrementalIndexer import IncrementalIndexer
+
+STORE_FOLDER = "./test_index_db"
+BOOK_PATH = "./test_index_book.txt"
+EMBEDDING = {"provider": "openai", "model": "fake"}
+
+
+class CountingEmbedding(DeterministicFakeEmbedding):
+    texts: List[str] = []
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.texts.extend(texts)
+        return super().embed_documents(texts)
+
+
+class SlowEmbedding(DeterministicFakeEmbedding):
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(0.01)
+        return super().embed_documents(texts)
+
+
+def makePages(count: int) -> List[Document]:
+    return [
+        Document(page_content=f"page {page} of the book", metadata={"page": page})
+        for page in range(count)
+    ]
+
+
+def setup_module():
+    shutil.rmtree(STORE_FOLDER, ignore_errors=True)
+    with open(BOOK_PATH, "w", encoding="utf-8") as file:
+        file.write("a book of 20 pages")
+
+
+def teardown_module():
+    shutil.rmtree(STORE_FOLDER, ignore_errors=True)
+    os.remove(BOOK_PATH)
+
+
+def test_incrementalIndexer():
+    store = EmbeddingStore(BOOK_PATH, STORE_FOLDER, EMBEDDING)
+    pages = makePages(20)
+    progress = []
+    indexer = IncrementalIndexer(
+        store,
+        store.split(pages),
+        DeterministicFakeEmbedding(size=8),
+        page=10,
+        round_size=4,
+        progress=lambda done, total: progress.append((done, total)),
+    )
+
+    assert [indexer.pages[index] for index in indexer.nextRound()] == [10, 11, 9, 12]
+    indexer.setPage(0)
+    assert [indexer.pages[index] for index in indexer.nextRound()] == [0, 1, 2, 3]
+    indexer.setPage(10)
+
+    async def run():
+        db = await indexer.start()
+        # the nearest pages are searchable after the first round
+        assert indexer.indexed >= 4
+        indexed_pages = {metadata["page"] for metadata in db.get()["metadatas"]}
+        assert {9, 10, 11, 12} <= indexed_pages
+
+        await indexer.task
+        return db
+
+    db = asyncio.run(run())
+    assert indexer.finished() and indexer.indexed == 20
+    assert len(db.get()["ids"]) == 20
+    assert store.readManifest()["chunks"] == 20
+    assert progress[-1] == (20, 20)
+
+
+def test_resumeIndexer():
+    with open(BOOK_PATH, "w", encoding="utf-8") as file:
+        file.write("a book of 30 pages")
+    store = EmbeddingStore(BOOK_PATH, STORE_FOLDER, EMBEDDING)
+    splits = store.split(makePages(30))
+    embed = CountingEmbedding(size=8)
+
+    async def interrupt():
+        indexer = IncrementalIndexer(store, splits, embed, round_size=5)
+        await indexer.start()
+        indexer.stop()
+        try:
+            await indexer.task
+        except asyncio.CancelledError:
+            pass
+        return indexer.indexed
+
+    indexed = asyncio.run(interrupt())
+    assert 5 <= indexed < 30
+    assert not store.exists()
+    assert store.readManifest()["status"] == STATUS_BUILDING
+    assert len(store.readJournal()) == indexed
+    # a checkpoint interrupted while writing is ignored
+    with open(store.journal_path, "a", encoding="utf-8") as file:
+        file.write("28 29")
+    assert len(store.readJournal()) == indexed
+    # the interrupted checkpoint is dropped before appending
+    _, resumed = store.create(embed, len(splits))
+    assert len(resumed) == indexed
+    with open(store.journal_path, "r", encoding="utf-8") as file:
+        assert file.read().endswith("\n")
+    saved = {splits[index].page_content for index in resumed}
+    embed.texts.clear()
+
+    async def resume():
+        indexer = IncrementalIndexer(store, splits, embed, round_size=5)
+        db = await indexer.start()
+        await indexer.task
+        return db
+
+    db = asyncio.run(resume())
+    # the saved chunks are not embedded again
+    assert len(embed.texts) == 30 - indexed
+    assert saved.isdisjoint(embed.texts)
+    assert sorted(int(chunk_id) for chunk_id in db.get()["ids"]) == list(range(30))
+    assert store.exists()
+    assert not os.path.exists(store.journal_path)
+
+
+def configReceivers() -> int:
+    return chat_chain.signalBus.receivers(SIGNAL("llm_config_change_signal()"))
+
+
+def test_reconfigureStatus(monkeypatch):
+    with open(BOOK_PATH, "w", encoding="utf-8") as file:
+        file.write("a book of 2000 pages")
+    monkeypatch.setattr(chat_chain, "hasEmbedModel", lambda: True)
+    monkeypatch.setattr(chat_chain, "getEmbedModelByCfg", lambda: SlowEmbedding(size=8))
+    monkeypatch.setattr(
+        chat_chain, "getChatModelByCfg", lambda: FakeListChatModel(responses=["a"])
+    )
+    monkeypatch.setattr(chat_chain, "getTargetLanguage", lambda: "English")
+    # the config and the signals of the module, imported by their bare names in it
+    monkeypatch.setattr(chat_chain.cfg.database_folder, "value", STORE_FOLDER)
+    monkeypatch.setattr(chat_chain.cfg.vector_store_backend, "value", "float16")
+    statuses = []
+    chat_chain.signalBus.status_signal.connect(
+        lambda title, content: statuses.append(content)
+    )
+
+    async def run():
+        reader = SimpleNamespace(pdf_path=BOOK_PATH, pages=makePages(2000))
+        chain = chat_chain.ChatRAGChain(reader)
+        try:
+            await chain.createChatChain()
+            assert chain.indexing_status
+            stores.append(chain.db)
+            # the LLM config is changed while the PDF is indexed in the background
+            chat_chain.signalBus.llm_config_change_signal.emit()
+            for _ in range(500):
+                if len(statuses) == 4:
+                    break
+                await asyncio.sleep(0.01)
+            stores.append(chain.db)
+        finally:
+            chain.close()
+
+        return chain
+
+    receivers = configReceivers()
+    stores = []
+    chain = asyncio.run(run())
+    # every status opened by "Please wait!!" is closed once
+    assert statuses == [
+        "Please wait!!",
+        "Embedding stopped!!",
+        "Please wait!!",
+        "Embedding finished!!",
+    ]
+    # a closed chain is not indexed again by a change of the LLM config
+    assert configReceivers() == receivers
+    assert chain.store_path is None
+    # the vector stores of the reconfigured and the closed chain are closed
+    assert stores[0] is not stores[1]
+    for store in stores:
+        with pytest.raises(sqlite3.ProgrammingError):
+            store.conn.execute("SELECT 1")
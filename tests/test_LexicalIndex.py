@@ -0,0 +1,96 @@
+import shutil
+
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from verbiverse.LLM.LexicalIndex import (
+    BM25Index,
+    HybridRetriever,
+    openLexicalIndex,
+    tokenize,
+)
+
+INDEX_FOLDER = "./test_lexical_index"
+TEXTS = [
+    "Jack and Annie found a tree house in the woods.",
+    "The tree house was full of books.",
+    "Annie pointed at a picture of a Pteranodon.",
+    "A Tyrannosaurus rex came out of the woods.",
+    "Jack wrote in his notebook about the dinosaurs.",
+]
+SPLITS = [
+    Document(page_content=text, metadata={"page": page})
+    for page, text in enumerate(TEXTS)
+]
+
+
+def setup_module():
+    shutil.rmtree(INDEX_FOLDER, ignore_errors=True)
+
+
+def teardown_module():
+    shutil.rmtree(INDEX_FOLDER, ignore_errors=True)
+
+
+def test_tokenize():
+    assert tokenize("Jack's tree-house, 1993") == ["jack", "s", "tree", "house", "1993"]
+    assert tokenize("神奇树屋 Magic") == ["神", "奇", "树", "屋", "magic"]
+
+
+def test_bm25Search():
+    index = BM25Index.build(TEXTS)
+    assert [chunk_id for chunk_id, _ in index.search("pteranodon")] == [2]
+    # the rare term ranks before the common one
+    results = index.search("tree rex", k=3)
+    assert results[0][0] == 3
+    assert {chunk_id for chunk_id, _ in results} == {0, 1, 3}
+    assert results[0][1] >= results[1][1] >= results[2][1]
+    assert index.search("unknown") == []
+    assert len(index.search("jack annie tree woods", k=2)) == 2
+
+
+def test_openLexicalIndex():
+    index = openLexicalIndex(INDEX_FOLDER, SPLITS)
+    loaded = openLexicalIndex(INDEX_FOLDER, SPLITS)
+    assert loaded is not index
+    assert loaded.search("jack notebook") == index.search("jack notebook")
+
+
+def test_hybridRetriever():
+    index = BM25Index.build(TEXTS)
+    retriever = HybridRetriever(splits=SPLITS, index=index, k=2)
+    documents = retriever.invoke("Who saw the Pteranodon?")
+    assert documents[0].page_content == TEXTS[2]
+
+    embed = DeterministicFakeEmbedding(size=8)
+    store = Chroma.from_documents(SPLITS, embed, persist_directory=INDEX_FOLDER + "/db")
+    retriever = HybridRetriever(splits=SPLITS, index=index, vector_store=store, k=3)
+    documents = retriever.invoke("Pteranodon")
+    assert len(documents) == 3
+    # the vector store returns every chunk, only the lexical match gets two ranks
+    assert documents[0].page_content == TEXTS[2]
+
+
+def test_pageProximity():
+    texts = [f"page {page} talks about the magic tree house" for page in range(30)]
+    texts[2] = "the magic tree house magic tree house again and again"
+    splits = [
+        Document(page_content=text, metadata={"page": page})
+        for page, text in enumerate(texts)
+    ]
+    index = BM25Index.build(texts)
+    retriever = HybridRetriever(splits=splits, index=index, k=1, fetch_k=30)
+    assert retriever.invoke("magic tree house")[0].metadata["page"] == 2
+
+    retriever.page = 20
+    retriever.page_window = 3
+    assert retriever.invoke("magic tree house")[0].metadata["page"] == 20
+
+    # no chunk after the reading page
+    retriever.page_window = 0
+    retriever.read_pages_only = True
+    retriever.page = 1
+    retriever.k = 5
+    pages = {document.metadata["page"] for document in retriever.invoke("magic")}
+    assert pages == {0, 1}
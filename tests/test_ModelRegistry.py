@@ -0,0 +1,100 @@
+import shutil
+
+import httpx
+import pytest
+
+# the config and signals of the module, imported by their bare names in it
+from verbiverse.LLM.LLMServerInfo import (
+    ModelRegistry,
+    cfg,
+    getChatModelByCfg,
+    getEmbedModelByCfg,
+    model_registry,
+    signalBus,
+)
+
+CACHE_FOLDER = "./test_model_registry"
+CONFIG = {
+    cfg.provider: "openai",
+    cfg.model_name: "gpt-test",
+    cfg.embed_model_name: "embed-test",
+    cfg.user_key: "sk-test",
+    cfg.provider_url: "http://localhost:1/v1",
+    # the embedding cache of the embed model is opened in it
+    cfg.database_folder: CACHE_FOLDER,
+}
+
+
+@pytest.fixture
+def config():
+    # set the values without saving the config file
+    saved = {item: item.value for item in CONFIG}
+    for item, value in CONFIG.items():
+        item.value = value
+    model_registry.clear()
+    yield
+    for item, value in saved.items():
+        item.value = value
+    model_registry.clear()
+    shutil.rmtree(CACHE_FOLDER, ignore_errors=True)
+
+
+def test_modelRegistry():
+    registry = ModelRegistry()
+    built = []
+
+    def factory():
+        built.append(object())
+        return built[-1]
+
+    first = registry.get(("chat", "openai", "url", "model", "key"), factory)
+    assert registry.get(("chat", "openai", "url", "model", "key"), factory) is first
+    assert registry.get(("chat", "openai", "url", "other", "key"), factory) is not first
+    assert registry.httpClient("openai", "url") is registry.httpClient("openai", "url")
+
+    registry.clear()
+    assert registry.get(("chat", "openai", "url", "model", "key"), factory) is not first
+    assert len(built) == 3
+
+
+def test_sharedModels(config):
+    chat = getChatModelByCfg()
+    assert getChatModelByCfg() is chat
+    embed = getEmbedModelByCfg()
+    # the chat and embedding requests share the connections of the provider url
+    assert embed.embed.client._client._client is chat.client._client._client
+
+    cfg.user_key.value = "sk-other"
+    assert getChatModelByCfg() is not chat
+
+    cfg.user_key.value = "sk-test"
+    assert getChatModelByCfg() is chat
+    signalBus.llm_config_change_signal.emit()
+    assert getChatModelByCfg() is not chat
+
+
+def test_retiredClients(monkeypatch):
+    monkeypatch.setattr(
+        httpx.HTTPTransport,
+        "handle_request",
+        lambda self, request: httpx.Response(200, stream=httpx.ByteStream(b"answer")),
+    )
+    registry = ModelRegistry()
+    idle = registry.httpClient("openai", "http://idle")
+    assert idle.get("http://idle/models").content == b"answer"
+    streaming = registry.httpClient("openai", "http://streaming")
+    with streaming.stream("POST", "http://streaming/chat") as response:
+        registry.clear()
+        # the idle pool is closed at once, the streaming one after its response
+        assert idle.is_closed and not streaming.is_closed
+        assert response.read() == b"answer"
+    assert streaming.is_closed and not registry.retired
+
+    current = registry.httpClient("openai", "http://idle")
+    assert current is not idle
+    with current.stream("POST", "http://idle/chat"):
+        registry.clear()
+        assert len(registry.retired) == 1
+        # closed by the app even with requests in flight
+        registry.close()
+        assert current.is_closed and not registry.retired
@@ -0,0 +1,197 @@
+import asyncio
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from verbiverse.LLM.EmbeddingStore import EmbeddingStore
+from verbiverse.LLM.IncrementalIndexer import IncrementalIndexer
+from verbiverse.LLM.NumpyVectorStore import (
+    NumpyVectorStore,
+    matchFilter,
+    normalize,
+    quantize,
+)
+
+STORE_FOLDER = "./test_numpy_store"
+BOOK_PATH = "./test_numpy_store_book.txt"
+EMBEDDING = {"provider": "openai", "model": "fake"}
+
+
+def setup_function():
+    shutil.rmtree(STORE_FOLDER, ignore_errors=True)
+
+
+def teardown_module():
+    shutil.rmtree(STORE_FOLDER, ignore_errors=True)
+    if os.path.exists(BOOK_PATH):
+        os.remove(BOOK_PATH)
+
+
+def makeDocuments(count: int):
+    return [
+        Document(
+            page_content=f"chunk {index} of page {index // 3}",
+            metadata={"page": index // 3},
+        )
+        for index in range(count)
+    ]
+
+
+def test_quantize():
+    vectors = normalize(np.random.default_rng(0).normal(size=(50, 64)))
+    rows, scales = quantize(vectors, "int8")
+    assert rows.dtype == np.int8
+    assert np.abs(rows * scales[:, None] - vectors).max() <= scales.max() / 2 + 1e-6
+    rows, _ = quantize(vectors, "float16")
+    assert rows.dtype == np.float16
+    assert np.abs(rows - vectors).max() < 1e-3
+
+
+def test_matchFilter():
+    assert matchFilter({"page": 3}, {"page": {"$lte": 3}})
+    assert not matchFilter({"page": 4}, {"page": {"$lte": 3}})
+    assert matchFilter({"page": 4, "source": "a"}, {"page": {"$gt": 3}, "source": "a"})
+    assert not matchFilter({}, {"page": {"$lte": 3}})
+    with pytest.raises(ValueError):
+        matchFilter({"page": 3}, {"page": {"$in": [3]}})
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_similaritySearch(dtype):
+    embed = DeterministicFakeEmbedding(size=64)
+    documents = makeDocuments(30)
+    store = NumpyVectorStore(STORE_FOLDER, embed, capacity=30, dtype=dtype)
+    store.add_documents(documents, ids=[str(index) for index in range(30)])
+
+    # the best match of a chunk is itself
+    found = store.similarity_search_with_score(documents[7].page_content, k=3)
+    assert found[0][0].page_content == documents[7].page_content
+    assert found[0][1] == pytest.approx(1.0, abs=0.02)
+    assert [score for _, score in found] == sorted(
+        (score for _, score in found), reverse=True
+    )
+
+    # the ranking follows the exact cosine similarity
+    vectors = normalize(embed.embed_documents([d.page_content for d in documents]))
+    query = normalize(embed.embed_query("a question"))
+    expected = np.argsort(-(vectors @ query))[:5]
+    found = store.similarity_search("a question", k=5)
+    assert [d.page_content for d in found][:2] == [
+        documents[index].page_content for index in expected[:2]
+    ]
+
+    found = store.similarity_search(
+        documents[20].page_content, k=30, filter={"page": {"$lte": 3}}
+    )
+    assert len(found) == 12
+    assert all(document.metadata["page"] <= 3 for document in found)
+    store.close()
+
+
+def test_persistence():
+    embed = DeterministicFakeEmbedding(size=16)
+    documents = makeDocuments(10)
+    # without capacity the matrix grows
+    store = NumpyVectorStore(STORE_FOLDER, embed, dtype="int8")
+    store.add_documents(documents[:4])
+    store.add_documents(documents[4:])
+    assert store.rows() >= 10
+    store.close()
+
+    store = NumpyVectorStore(STORE_FOLDER, embed)
+    assert store.dtype == "int8" and not store.writable
+    assert store.get()["ids"] == [str(index) for index in range(10)]
+    found = store.similarity_search(documents[9].page_content, k=1)
+    assert found[0].page_content == documents[9].page_content
+    # a replaced chunk is not duplicated
+    store.add_documents(documents[9:], ids=["9"])
+    assert len(store.get()["ids"]) == 10
+    assert len(store.similarity_search(documents[9].page_content, k=20)) == 10
+    store.close()
+
+
+def test_closedStore():
+    embed = DeterministicFakeEmbedding(size=16)
+    documents = makeDocuments(4)
+    store = NumpyVectorStore(STORE_FOLDER, embed, capacity=10)
+    store.add_documents(documents[:3])
+    store.close()
+    # the saved rows are not replaced by a new matrix
+    with pytest.raises(ValueError):
+        store.add_documents(documents[3:], ids=["3"])
+    with pytest.raises(ValueError):
+        store.similarity_search(documents[0].page_content, k=1)
+
+    store = NumpyVectorStore(STORE_FOLDER, embed)
+    assert store.get()["ids"] == ["0", "1", "2"]
+    assert (np.abs(store.matrix[:3].astype(np.float32)).sum(axis=1) > 0).all()
+    store.close()
+
+
+def test_indexerWithNumpyStore():
+    with open(BOOK_PATH, "w", encoding="utf-8") as file:
+        file.write("a book for the numpy store")
+    store = EmbeddingStore(BOOK_PATH, STORE_FOLDER, EMBEDDING, backend="float16")
+    assert store.key != EmbeddingStore(BOOK_PATH, STORE_FOLDER, EMBEDDING).key
+    splits = makeDocuments(20)
+
+    async def index():
+        indexer = IncrementalIndexer(
+            store, splits, DeterministicFakeEmbedding(size=8), page=5, round_size=4
+        )
+        db = await indexer.start()
+        await indexer.task
+        return db
+
+    db = asyncio.run(index())
+    # imported by its bare name in EmbeddingStore
+    assert type(db).__name__ == NumpyVectorStore.__name__
+    assert store.exists()
+    assert store.readManifest()["backend"] == "float16"
+    assert sorted(db.get()["ids"], key=int) == [str(index) for index in range(20)]
+    db.close()
+
+    db = store.load(DeterministicFakeEmbedding(size=8))
+    found = db.similarity_search(splits[3].page_content, k=1)
+    assert found[0].page_content == splits[3].page_content
+    db.close()
+
+
+def test_stopIndexer():
+    with open(BOOK_PATH, "w", encoding="utf-8") as file:
+        file.write("a book stopped while indexing")
+    store = EmbeddingStore(BOOK_PATH, STORE_FOLDER, EMBEDDING, backend="float16")
+    splits = makeDocuments(20)
+
+    async def index():
+        indexer = IncrementalIndexer(
+            store, splits, DeterministicFakeEmbedding(size=8), round_size=4
+        )
+        db = await indexer.start()
+        adding = threading.Event()
+        add_texts = db.add_texts
+
+        def slowAdd(*args, **kwargs):
+            adding.set()
+            time.sleep(0.1)
+            return add_texts(*args, **kwargs)
+
+        db.add_texts = slowAdd
+        await asyncio.to_thread(adding.wait)
+        # the thread of the cancelled round is still adding its chunks
+        indexer.stop()
+        indexer.join()
+        db.close()
+
+    asyncio.run(index())
+    db = NumpyVectorStore(store.path, DeterministicFakeEmbedding(size=8))
+    ids = [int(chunk_id) for chunk_id in db.get()["ids"]]
+    assert len(ids) == 8
+    assert (np.abs(db.matrix[ids].astype(np.float32)).sum(axis=1) > 0).all()
+    db.close()
@@ -0,0 +1,50 @@
+import pytest
+
+from verbiverse.LLM.LLMServerInfo import PromptRegistry
+
+PROMPTS = {
+    ":/prompt/explain_prompt.txt": "Explain {word} in {answer_language}: {data}",
+    ":/prompt/explain_chinese.txt": "用中文解释 {word}: {data}",
+}
+
+
+class FakeResources:
+    def __init__(self):
+        self.prompts = dict(PROMPTS)
+        self.reads = []
+
+    def load(self, name: str) -> str:
+        self.reads.append(name)
+        if name not in self.prompts:
+            raise FileNotFoundError(name)
+        return self.prompts[name]
+
+
+def test_promptRegistry():
+    resources = FakeResources()
+    registry = PromptRegistry(resources.load)
+    names = [":/prompt/explain_chinese.txt", ":/prompt/explain_prompt.txt"]
+
+    prompt = registry.get(("explain", "chinese", False), names)
+    assert prompt.name == ":/prompt/explain_chinese.txt"
+    assert sorted(prompt.template.input_variables) == ["data", "word"]
+    assert registry.get(("explain", "chinese", False), names) is prompt
+    assert resources.reads == [":/prompt/explain_chinese.txt"]
+
+    # the missing prompt falls back to the default once
+    names = [":/prompt/explain_japanese.txt", ":/prompt/explain_prompt.txt"]
+    fallback = registry.get(("explain", "japanese", False), names)
+    registry.get(("explain", "japanese", False), names)
+    assert fallback.name == ":/prompt/explain_prompt.txt"
+    assert resources.reads[1:] == names
+
+    # an edited prompt gets another version after the registry is cleared
+    resources.prompts[":/prompt/explain_prompt.txt"] += "\nBe concise."
+    assert registry.get(("explain", "japanese", False), names) is fallback
+    registry.clear()
+    edited = registry.get(("explain", "japanese", False), names)
+    assert edited.version != fallback.version
+    assert len(edited.version) == 12
+
+    with pytest.raises(FileNotFoundError):
+        registry.get(("check", "japanese"), [":/prompt/check_japanese.txt"])
@@ -0,0 +1,132 @@
+import datetime
+
+import numpy as np
+import pytest
+
+from verbiverse.Functions.ReviewScheduler import (
+    CardState,
+    FSRSScheduler,
+    ReviewGrade,
+    ReviewScheduler,
+    SM2Scheduler,
+    julianDaysToDbTime,
+    toJulianDay,
+)
+
+NOW = datetime.datetime(2024, 7, 1, 8, 30)
+
+
+def makeCards(count: int) -> dict:
+    return {
+        "review_times": np.full(count, 3.0),
+        "ease": np.full(count, 2.5),
+        "interval": np.full(count, 15.0),
+        "stability": np.full(count, 15.0),
+        "difficulty": np.full(count, 5.0),
+        "last_review": np.full(count, toJulianDay(NOW)),
+        "due": np.full(count, toJulianDay(NOW) + 15),
+    }
+
+
+def test_julianDay():
+    day = toJulianDay(NOW)
+    assert julianDaysToDbTime(np.array([day]))[0] == str(NOW) + ".000000"
+
+
+def test_incompleteScheduler():
+    class NoAdvance(ReviewScheduler):
+        def review(self, card, grade, now):
+            return card
+
+        def intervals(self, cards):
+            return cards["interval"]
+
+    # fails when it is created, not in the middle of a forecast
+    with pytest.raises(TypeError):
+        NoAdvance()
+
+
+def test_sm2Review():
+    scheduler = SM2Scheduler()
+    card = CardState("word")
+    intervals = []
+    for i in range(4):
+        card = scheduler.review(card, ReviewGrade.GOOD, NOW)
+        intervals.append(card.interval)
+    assert intervals == [1, 6, 15, 38]
+    assert card.next_review_on == NOW + datetime.timedelta(days=38)
+
+    card = scheduler.review(card, ReviewGrade.AGAIN, NOW)
+    assert card.review_times == 0 and card.interval == 1 and card.ease < 2.5
+
+
+def test_fsrsReview():
+    scheduler = FSRSScheduler()
+    card = scheduler.review(CardState("word"), ReviewGrade.GOOD, NOW)
+    assert card.stability == FSRSScheduler.WEIGHTS[2]
+    assert card.next_review_on == NOW + datetime.timedelta(days=4)
+
+    later = NOW + datetime.timedelta(days=4)
+    good = scheduler.review(
+        CardState("a", 1, 2.5, 4, card.stability, card.difficulty, NOW),
+        ReviewGrade.GOOD,
+        later,
+    )
+    again = scheduler.review(
+        CardState("b", 1, 2.5, 4, card.stability, card.difficulty, NOW),
+        ReviewGrade.AGAIN,
+        later,
+    )
+    assert good.stability > card.stability > again.stability
+    assert again.review_times == 0 and good.difficulty < again.difficulty
+
+
+def test_fsrsLapse():
+    scheduler = FSRSScheduler()
+    card = scheduler.review(CardState("word"), ReviewGrade.GOOD, NOW)
+
+    def onTime(card):
+        # the retrievability is the desired retention, as assumed by `advance`
+        elapsed = card.stability * scheduler.intervalFactor()
+        return card.last_review_on + datetime.timedelta(days=elapsed)
+
+    card = scheduler.review(card, ReviewGrade.AGAIN, onTime(card))
+    lapsed = (card.stability, card.difficulty)
+    assert card.review_times == 0 and card.stability < FSRSScheduler.WEIGHTS[2]
+
+    cards = {
+        "review_times": np.array([0.0]),
+        "interval": np.array([float(card.interval)]),
+        "stability": np.array([card.stability]),
+        "difficulty": np.array([card.difficulty]),
+    }
+    scheduler.advance(cards, np.array([True]))
+    card = scheduler.review(card, ReviewGrade.GOOD, onTime(card))
+    # the stability after the lapse is kept, the scalar and vectorized reviews agree
+    assert card.stability > lapsed[0]
+    assert np.isclose(cards["stability"][0], card.stability)
+    assert np.isclose(cards["difficulty"][0], card.difficulty)
+    assert cards["review_times"][0] == card.review_times == 1
+
+
+def test_reschedule():
+    cards = makeCards(3)
+    cards["last_review"][2] = np.nan
+    due = FSRSScheduler(0.9).reschedule(cards)
+    assert np.allclose(due[:2], cards["last_review"][:2] + 15)
+    assert due[2] == cards["due"][2]
+
+    # a higher retention means shorter intervals
+    assert (FSRSScheduler(0.95).reschedule(cards)[:2] < due[:2]).all()
+    assert (SM2Scheduler(0.95).reschedule(cards)[:2] < due[:2]).all()
+
+
+def test_forecast():
+    cards = makeCards(100000)
+    today = toJulianDay(NOW)
+    for scheduler in (SM2Scheduler(), FSRSScheduler()):
+        forecast = scheduler.forecast(cards, today, 365)
+        assert len(forecast) == 365
+        assert forecast[15] == 100000 and forecast[:15].sum() == 0
+        # the input arrays are not changed
+        assert (cards["review_times"] == 3).all()
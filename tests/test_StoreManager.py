@@ -0,0 +1,111 @@
+import json
+import os
+import shutil
+
+from verbiverse.LLM.EmbeddingCache import EMBEDDING_CACHE_NAME
+from verbiverse.LLM.EmbeddingStore import MANIFEST_NAME, EmbeddingStore
+from verbiverse.LLM.StoreManager import STATUS_LEGACY, StoreManager
+
+STORE_FOLDER = "./test_store_manager"
+EMBEDDING = {"provider": "openai", "model": "fake"}
+# the md5 of a PDF path, the name of a store of the old layout
+LEGACY_NAME = "0123456789abcdef0123456789abcdef_db"
+
+
+def setup_function():
+    shutil.rmtree(STORE_FOLDER, ignore_errors=True)
+    os.makedirs(STORE_FOLDER)
+
+
+def teardown_module():
+    shutil.rmtree(STORE_FOLDER, ignore_errors=True)
+
+
+def writeStore(name: str, size: int, last_used: str = None) -> str:
+    path = os.path.join(STORE_FOLDER, name)
+    os.makedirs(path)
+    with open(os.path.join(path, "chroma.sqlite3"), "wb") as file:
+        file.write(b"\0" * size)
+    if last_used is not None:
+        manifest = {
+            "status": "ready",
+            "sources": [f"/books/{name}.pdf"],
+            "last_used_on": last_used,
+        }
+        with open(os.path.join(path, MANIFEST_NAME), "w", encoding="utf-8") as file:
+            json.dump(manifest, file)
+    return os.path.abspath(path)
+
+
+def test_usage():
+    writeStore("old", 1000, "2024-01-01 10:00:00")
+    writeStore("new", 2000, "2024-03-01 10:00:00")
+    writeStore(LEGACY_NAME, 500)
+    with open(os.path.join(STORE_FOLDER, EMBEDDING_CACHE_NAME), "wb") as file:
+        file.write(b"\0" * 300)
+
+    manager = StoreManager(STORE_FOLDER)
+    stores = manager.usage()
+    # the legacy store is last used when it was modified, just now
+    assert [store.name for store in stores] == [LEGACY_NAME, "new.pdf", "old.pdf"]
+    assert stores[0].status == STATUS_LEGACY and stores[0].size == 500
+    # the manifest counts as well
+    assert stores[1].size > 2000
+    assert manager.cacheSize() == 300
+
+
+def test_collect():
+    oldest = writeStore("oldest", 1000, "2024-01-01 10:00:00")
+    old = writeStore("old", 1000, "2024-02-01 10:00:00")
+    new = writeStore("new", 1000, "2024-03-01 10:00:00")
+    legacy = writeStore(LEGACY_NAME, 100)
+
+    manager = StoreManager(STORE_FOLDER)
+    # the old layout is removed under the budget as well
+    removed = manager.collect(budget=10000)
+    assert [store.path for store in removed] == [legacy]
+
+    manager.acquire(oldest)
+    removed = manager.collect(budget=2500)
+    # the store in use is kept, the least recently used of the others is removed
+    assert [store.path for store in removed] == [old]
+    assert os.path.exists(oldest) and os.path.exists(new)
+
+    manager.release(oldest)
+    removed = manager.collect(budget=1500)
+    assert [store.path for store in removed] == [oldest]
+    assert os.listdir(STORE_FOLDER) == ["new"]
+
+
+def test_collectKeepsOtherFolders():
+    other = writeStore("notes", 1000)
+    broken = writeStore("0" * 64, 1000)
+    with open(os.path.join(broken, MANIFEST_NAME), "w", encoding="utf-8") as file:
+        file.write("{broken")
+    legacy = writeStore(LEGACY_NAME, 100)
+
+    manager = StoreManager(STORE_FOLDER)
+    assert [store.path for store in manager.usage()] == [legacy]
+    removed = manager.collect(budget=0)
+    assert [store.path for store in removed] == [legacy]
+    assert os.path.exists(other) and os.path.exists(broken)
+
+
+def test_touch():
+    book = os.path.join(STORE_FOLDER, "book.txt")
+    with open(book, "w", encoding="utf-8") as file:
+        file.write("Jack and Annie found a tree house.")
+    store = EmbeddingStore(book, STORE_FOLDER, EMBEDDING)
+    os.makedirs(store.path)
+    store.finish(1)
+    finished = store.readManifest()["last_used_on"]
+
+    moved = os.path.join(STORE_FOLDER, "moved.txt")
+    shutil.copy(book, moved)
+    EmbeddingStore(moved, STORE_FOLDER, EMBEDDING).touch()
+    manifest = store.readManifest()
+    assert manifest["last_used_on"] >= finished
+    assert manifest["sources"] == [os.path.abspath(book), os.path.abspath(moved)]
+
+    (usage,) = StoreManager(STORE_FOLDER).usage()
+    assert usage.name == "moved.txt" and usage.status == "ready"
@@ -1,14 +1,35 @@
 import datetime
 import os
+import sqlite3
 
-from verbiverse.Functions.WordBookDatabase import Word, WordsBookDatabase
+from PySide6.QtCore import QCoreApplication
+
+from verbiverse.Functions.ReviewScheduler import FSRSScheduler, ReviewGrade
+from verbiverse.Functions.ReviewSession import ReviewSession
+from verbiverse.Functions.WordBookDatabase import (
+    Word,
+    WordsBookDatabase,
+    wordSortKey,
+)
+from verbiverse.Functions.WordsBookTransfer import exportWordsBook, importWordsBook
+
+# the signal bus and the writer module imported by the app modules
+import Functions.WordsBookWriter as writer_module  # noqa: E402,I001
+from Functions.SignalBus import signalBus  # noqa: E402,I001
 
 DATABASENAME = "./test.db"
+EXPORTNAME = "./test_words.tsv"
 
 
 def cleanDatabase():
-    if os.path.exists(DATABASENAME):
-        os.remove(DATABASENAME)
+    for path in (
+        DATABASENAME,
+        DATABASENAME + "-wal",
+        DATABASENAME + "-shm",
+        EXPORTNAME,
+    ):
+        if os.path.exists(path):
+            os.remove(path)
 
 
 def setup_module():
@@ -90,3 +111,281 @@ Example: In the dark cave, they imagined a monstrous creature lurking behind eve
     assert test_word in words_list
     print(words_list[test_word])
     assert words_list[test_word].resource == "test.pdf"
+
+
+def test_getDueWordsByCursor():
+    db = WordsBookDatabase(DATABASENAME)
+    for i in range(5):
+        db.addWord(f"due{i}", "explain", "example", "test.pdf")
+    tomorrow = datetime.datetime.now() + datetime.timedelta(days=2)
+
+    assert db.getDueWords(until=datetime.datetime.now()) == ([], None)
+    due_count = db.countDueWords(until=tomorrow)
+    assert due_count == len(db.getAllWords())
+
+    words, cursor = db.getDueWords(limit=2, until=tomorrow)
+    seen = [word.word for word in words]
+    while cursor is not None:
+        words, cursor = db.getDueWords(limit=2, cursor=cursor, until=tomorrow)
+        seen += [word.word for word in words]
+    assert len(seen) == due_count and len(set(seen)) == due_count
+
+
+def test_countDueWordsByDay():
+    db = WordsBookDatabase(DATABASENAME)
+    counts = db.countDueWordsByDay(days=3)
+    assert len(counts) == 3
+    assert sum(counts.values()) == db.countDueWords(
+        until=datetime.datetime.combine(
+            datetime.date.today() + datetime.timedelta(days=3), datetime.time()
+        )
+    )
+
+
+def test_exportAndImportWordsBook():
+    db = WordsBookDatabase(DATABASENAME)
+    count = len(db.getAllWords())
+    assert exportWordsBook(EXPORTNAME, db=db) == count
+
+    with open(EXPORTNAME, "a", encoding="utf-8") as file:
+        file.write("imported\t导入\tThe words are imported.\t\t\t0\t\n")
+    assert importWordsBook(EXPORTNAME, db=db) == count + 1
+    assert len(db.getAllWords()) == count + 1
+    assert db.getWord("imported").explain == "导入"
+    assert db.getWord("monster").resource == "test.pdf"
+
+
+def test_writeBehindAddWord():
+    db = WordsBookDatabase(DATABASENAME)
+    assert db.writer is not None
+    for i in range(100):
+        db.addWord("behind", f"explain {i}", "example", "test.pdf")
+    assert db.getWord("behind").explain == "explain 99"
+
+    db.flush()
+    conn = sqlite3.connect(DATABASENAME)
+    rows = conn.execute("SELECT explain FROM words WHERE word = 'behind'").fetchall()
+    conn.close()
+    assert rows == [("explain 99",)]
+
+
+def test_lazyWordsCache():
+    db = WordsBookDatabase(DATABASENAME)
+    words = db.updateWordsMap()
+    assert "hello" in words and "not-a-word" not in words
+    assert db.getWord("not-a-word") is None
+
+    hello = words["hello"]
+    assert hello.explain == "你好，一般用以问候"
+    assert db.getWord("hello") is hello
+    assert not hasattr(hello, "__dict__")
+    assert db.word_index["hello"].next_review_on == hello.next_review_on
+
+
+def test_searchWords():
+    db = WordsBookDatabase(DATABASENAME)
+    db.addWord(
+        "searchable", "a word to search", "Find the searchable word.", "book.pdf"
+    )
+
+    assert db.searchWords("search")[0].word == "searchable"
+    assert "searchable" in [word.word for word in db.searchWords("book.pdf")]
+    assert [word.word for word in db.searchWords('"word to search"')] == ["searchable"]
+    assert db.searchWords('"search word to"') == []
+
+    db.addWord("searchable", "updated", "Nothing here.", "book.pdf")
+    assert db.searchWords('"word to search"') == []
+    assert db.searchWords("   ") == []
+
+
+def test_recordReviewAndReschedule():
+    db = WordsBookDatabase(DATABASENAME)
+    db.addWord("review", "复习", "Review the words.", "test.pdf")
+    now = datetime.datetime.now()
+
+    state = db.recordReview("review", ReviewGrade.GOOD, now)
+    assert state.review_times == 1 and state.last_review_on == now
+    state = db.recordReview(
+        "review", ReviewGrade.GOOD, now + datetime.timedelta(days=1)
+    )
+    assert state.review_times == 2
+    assert db.getWord("review").next_review_on == str(state.next_review_on)
+    assert db.recordReview("not-a-word", ReviewGrade.GOOD) is None
+
+    db.flush()
+    conn = sqlite3.connect(DATABASENAME)
+    grades = conn.execute(
+        "SELECT grade FROM review_log WHERE word = 'review'"
+    ).fetchall()
+    conn.close()
+    assert grades == [(ReviewGrade.GOOD,), (ReviewGrade.GOOD,)]
+
+    assert db.rescheduleAll(FSRSScheduler(0.8)) >= 1
+    assert db.getCardState("review").next_review_on > state.next_review_on
+    assert db.word_index["review"].next_review_on == db.getWord("review").next_review_on
+
+
+def test_forecastWorkload():
+    db = WordsBookDatabase(DATABASENAME)
+    forecast = db.forecastWorkload(days=30)
+    assert len(forecast) == 30
+    # every word is reviewed at least once in the next month
+    assert forecast.sum() >= len(db.getAllWords())
+
+
+def test_reviewSession():
+    db = WordsBookDatabase(DATABASENAME)
+    until = datetime.datetime.now() + datetime.timedelta(days=2)
+    due_count = db.countDueWords(until=until)
+    session = ReviewSession(db, limit=4, flush_every=3, until=until)
+    assert len(session) == min(due_count, 4) == 4
+
+    answered = []
+    while session.current() is not None:
+        answered.append(session.current().word)
+        session.answer(ReviewGrade.GOOD, until)
+        assert len(session.pending) == session.reviewed % 3
+    assert session.answer(ReviewGrade.GOOD) is None
+    assert session.finish()[ReviewGrade.GOOD] == 4
+    assert session.pending == []
+
+    assert db.countDueWords(until=until) == due_count - 4
+    for word in answered:
+        assert db.getCardState(word).last_review_on == until
+
+
+def test_getWordsPage():
+    db = WordsBookDatabase(DATABASENAME)
+    count = len(db.getAllWords())
+    for order_by in ("word", "explain", "added_on"):
+        for descending in (False, True):
+            words, cursor = db.getWordsPage(3, order_by=order_by, descending=descending)
+            while cursor is not None:
+                page, cursor = db.getWordsPage(3, cursor, order_by, descending)
+                words += page
+            assert len(words) == count
+            keys = [(getattr(word, order_by), word.word) for word in words]
+            assert keys == sorted(keys, reverse=descending)
+
+    words, cursor = db.getWordsPage(query="search")
+    assert [word.word for word in words] == ["searchable"] and cursor is None
+    assert db.getWordsPage(query="!!") == ([], None)
+
+
+def test_resourceSortKey():
+    db = WordsBookDatabase(DATABASENAME)
+    db.addWord("sorted a", "a", "a", "sorted.pdf -> 2")
+    db.addWord("sorted b", "b", "b", "sorted.pdf -> 10")
+    db.addWord("sorted c", "c", "c", "another.pdf -> 30")
+    db.flush()
+
+    words, cursor = [], None
+    while True:
+        page, cursor = db.getWordsPage(1, cursor, "resource", query="sorted")
+        words += page
+        if cursor is None:
+            break
+        # the key of a word inserted in the table is its cursor
+        assert wordSortKey(page[-1], "resource") == cursor
+    assert [word.word for word in words] == ["sorted c", "sorted a", "sorted b"]
+    keys = [wordSortKey(word, "resource") for word in words]
+    assert keys == sorted(keys)
+
+
+def test_wordsChangedSignal():
+    # changes are emitted by the writer thread and queued to the main thread
+    app = QCoreApplication.instance() or QCoreApplication([])
+    db = WordsBookDatabase(DATABASENAME)
+    changes = []
+
+    def onChanged(kind, words):
+        changes.append((kind, words))
+
+    signalBus.words_changed_signal.connect(onChanged)
+    try:
+        db.addWord("changed", "改变", "Things changed.", "test.pdf")
+        db.flush()
+        db.addWord("changed", "变化", "Things changed.", "test.pdf")
+        db.flush()
+        assert db.deleteWords(["changed", "not-a-word"]) == 1
+        db.flush()
+        app.processEvents()
+    finally:
+        signalBus.words_changed_signal.disconnect(onChanged)
+
+    assert changes == [
+        ("insert", ["changed"]),
+        ("update", ["changed"]),
+        ("delete", ["changed"]),
+    ]
+    assert db.getWord("changed") is None and "changed" not in db.getAllWords()
+    assert [word.word for word in db.getWords(["hello", "changed"])] == ["hello"]
+
+
+class FailingConnection:
+    """A words book connection whose next `failures` transactions fail."""
+
+    def __init__(self, db_path: str, failures: int):
+        self.conn = sqlite3.connect(db_path)
+        self.failures = failures
+
+    def __enter__(self):
+        return self.conn.__enter__()
+
+    def __exit__(self, *args):
+        return self.conn.__exit__(*args)
+
+    def execute(self, sql, params=()):
+        if self.failures > 0:
+            self.failures -= 1
+            raise sqlite3.OperationalError("disk I/O error")
+        return self.conn.execute(sql, params)
+
+    def close(self):
+        self.conn.close()
+
+
+def test_failedGroupCommit(monkeypatch):
+    conn = sqlite3.connect(DATABASENAME)
+    conn.execute("CREATE TABLE IF NOT EXISTS failed_commit (word TEXT)")
+    conn.commit()
+    conn.close()
+
+    def write(failures: int):
+        monkeypatch.setattr(
+            writer_module,
+            "connectWordsBook",
+            lambda db_path: FailingConnection(db_path, failures),
+        )
+        committed, dropped = [], []
+        writer = writer_module.WordsBookWriter(
+            DATABASENAME, 10, committed.extend, dropped.extend
+        )
+        writer.submit(
+            "first",
+            "INSERT INTO failed_commit VALUES (?)",
+            (f"failed {failures}",),
+            ("insert", [f"failed {failures}"]),
+        )
+        assert writer.flush(10)
+        assert not writer.hasPending()
+        writer.close()
+        return committed, dropped
+
+    # the batch is kept and committed by a retry
+    committed, dropped = write(writer_module.MAX_COMMIT_RETRIES)
+    assert committed == [("insert", ["failed 3"])] and dropped == []
+    # dropped after its retries, the changes are passed to the caller
+    committed, dropped = write(writer_module.MAX_COMMIT_RETRIES + 1)
+    assert committed == [] and dropped == [("insert", ["failed 4"])]
+
+    conn = sqlite3.connect(DATABASENAME)
+    rows = conn.execute("SELECT word FROM failed_commit").fetchall()
+    conn.close()
+    assert rows == [("failed 3",)]
+
+    # the words of the dropped batch are not in the index anymore
+    db = WordsBookDatabase(DATABASENAME)
+    db.word_index["failed 4"] = db.word_index["hello"]
+    db.onWriteFailed(dropped)
+    assert "failed 4" not in db.word_index and "hello" in db.word_index
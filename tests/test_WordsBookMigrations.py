@@ -0,0 +1,93 @@
+import os
+import sqlite3
+
+from verbiverse.Functions.WordsBookMigrations import (
+    SCHEMA_VERSION,
+    formatResource,
+    migrate,
+    parseResource,
+)
+
+DATABASENAME = "./test_migrations.db"
+
+
+def cleanDatabase():
+    for path in (DATABASENAME, DATABASENAME + "-wal", DATABASENAME + "-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def setup_module():
+    cleanDatabase()
+
+
+def teardown_module():
+    cleanDatabase()
+
+
+def test_parseResource():
+    assert parseResource("/books/a -> b.pdf -> 37") == ("/books/a -> b.pdf", "pdf", 37)
+    assert parseResource("/videos/v.mp4 -> 01:02:03,456") == (
+        "/videos/v.mp4",
+        "video",
+        3723456,
+    )
+    assert parseResource("Chat with LLM message") == (
+        "Chat with LLM message",
+        "text",
+        None,
+    )
+    assert parseResource("None") == (None, "text", None)
+    assert parseResource(None) == (None, "text", None)
+
+    for resource in (
+        "/books/b.pdf -> 37",
+        "/videos/v.mp4 -> 01:02:03,456",
+        "Chat with LLM message",
+        "",
+    ):
+        assert formatResource(*parseResource(resource)) == resource
+
+
+def test_migrateFirstReleaseDatabase():
+    cleanDatabase()
+    conn = sqlite3.connect(DATABASENAME)
+    conn.execute("""
+        CREATE TABLE words (
+            word TEXT PRIMARY KEY,
+            explain TEXT,
+            example TEXT,
+            added_on DATETIME,
+            next_review_on DATETIME,
+            review_times INTEGER DEFAULT 0,
+            resource TEXT
+        )
+        """)
+    conn.executemany(
+        "INSERT INTO words (word, resource) VALUES (?, ?)",
+        [
+            ("hello", "/books/b.pdf -> 3"),
+            ("world", "/books/b.pdf -> 1"),
+            ("video", "/videos/v.mp4 -> 00:00:01,500"),
+            ("chat", "None"),
+        ],
+    )
+    conn.commit()
+
+    assert migrate(conn) == 0
+    assert migrate(conn) == SCHEMA_VERSION
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+    assert conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0] == 2
+    rows = conn.execute("""
+        SELECT word, position FROM words
+        WHERE document_id = (SELECT id FROM documents WHERE path = '/books/b.pdf')
+        ORDER BY position
+        """).fetchall()
+    assert rows == [("world", 1), ("hello", 3)]
+    assert conn.execute(
+        "SELECT resource FROM words_search WHERE word = 'video'"
+    ).fetchone() == ("/videos/v.mp4",)
+    assert conn.execute(
+        "SELECT document_id FROM words WHERE word = 'chat'"
+    ).fetchone() == (None,)
+    conn.close()
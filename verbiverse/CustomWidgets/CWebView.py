@@ -3,12 +3,13 @@ import sys
 import urllib.parse
 
 from CContexMenu import CContexMenu
-from ExplainWindow import ExplainWindow
+from ExplainSession import ExplainSession
+from Functions.Config import cfg
 from Functions.LanguageType import ExplainLanguage
 from Functions.LoadPdfText import PdfReader
 from Functions.SignalBus import signalBus
 from Functions.WebChannelBridge import BridgeClass
-from LLM.ExplainWorkerThread import ExplainWorkerThread
+from LLM.ExplainContext import context_builder
 from ModuleLogger import logger
 from PySide6.QtCore import QMutex, QPoint, Qt, QUrl, Slot
 from PySide6.QtWebChannel import QWebChannel
@@ -185,71 +186,18 @@ class CWebView(FramelessWebEngineView):
     def explainSelectText(
         self, explain_flyout: Flyout, selected_text: str, type: ExplainLanguage
     ):
-        if hasattr(self, "worker") and self.worker is not None:
-            logger.warning("flyout explain thread is not done")
-            return
-        self.explain_flyout = explain_flyout
-        self.explain_flyout.view.setTextResource(
-            self.pdf_path.toLocalFile() + " -> " + str(self.pdf_current_page)
+        # the sentences of the selected text and its neighbours instead of the page
+        all_text = context_builder.build(
+            (self.pdf_path.toLocalFile(), self.pdf_current_page),
+            self.pdf_reader.getTextByPageNum(self.pdf_current_page - 1),
+            selected_text,
+            cfg.get(cfg.explain_context_tokens),
         )
-        self.explain_flyout.closed.connect(self.explainClose)
-        self.explain_flyout.view.pin_explain_signal.connect(self.pinFlyout)
-
-        self.explain_window = None
-
-        # TODO: 优化all text 为单词关联语句
-        self.worker = ExplainWorkerThread(
-            selected_text=selected_text,
-            all_text=self.pdf_reader.getTextByPageNum(self.pdf_current_page - 1),
-            language_type=type,
-        )
-        self.worker.messageCallBackSignal.connect(self.onExplainResultUpdate)
-        self.worker.finished.connect(self.finishedExplain)
-        self.worker.start()
-
-    @Slot()
-    def finishedExplain(self):
-        self.explain_flyout = None
-        self.explain_window = None
-        self.worker = None
-
-    @Slot(str)
-    def onExplainResultUpdate(self, explain: str):
-        if self.explain_flyout is not None:
-            self.explain_flyout.view.setContent(
-                self.explain_flyout.view.getContent() + explain
-            )
-        elif self.explain_window is not None:
-            self.explain_window.setContent(self.explain_window.getContent() + explain)
-
-    def explainClose(self):
-        logger.debug("flyout close")
-        self.explain_flyout = None
-        if self.explain_window is None:
-            self.stopWorker()
-
-    @Slot(str, str, bool)
-    def pinFlyout(self, title: str, content: str, already_add: bool):
-        logger.debug(f"pin flyout {title} \n content{content}")
-        self.explain_window = ExplainWindow(
-            title,
-            content,
+        ExplainSession(
+            explain_flyout,
+            selected_text,
+            all_text,
+            type,
             self.pdf_path.toLocalFile() + " -> " + str(self.pdf_current_page),
-            already_add,
+            parent=self,
         )
-        self.explain_window.show()
-        self.explain_window.close_signal.connect(self.pinWindowClose)
-
-    @Slot()
-    def pinWindowClose(self):
-        logger.debug("webview window close")
-        self.explain_window = None
-        if self.explain_flyout is None:
-            self.stopWorker()
-
-    def stopWorker(self):
-        if self.worker is not None:
-            logger.debug("close webview explain thread ... ")
-            self.worker.stop()
-            self.worker.wait()
-            logger.debug("close webview explain thread done !!! ")
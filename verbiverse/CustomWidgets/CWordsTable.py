@@ -1,21 +1,30 @@
 import os
+from typing import List, Optional, Tuple
 
-from Functions.WordBookDatabase import Word, WordsBookDatabase
-from PySide6.QtCore import QModelIndex, Qt
+from Functions.SignalBus import signalBus
+from Functions.WordBookDatabase import (
+    WORD_SORT_COLUMNS,
+    Word,
+    WordsBookDatabase,
+    wordSortKey,
+)
+from ModuleLogger import logger
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt
 from PySide6.QtGui import QPalette
 from PySide6.QtWidgets import (
     QHBoxLayout,
     QHeaderView,
     QStyleOptionViewItem,
-    QTableWidgetItem,
     QWidget,
 )
 from qfluentwidgets import (
     TableItemDelegate,
-    TableWidget,
+    TableView,
     isDarkTheme,
 )
 
+WORDS_PAGE_SIZE = 200
+
 
 class CustomTableItemDelegate(TableItemDelegate):
     """Custom table item delegate"""
@@ -33,62 +42,172 @@ class CustomTableItemDelegate(TableItemDelegate):
             option.palette.setColor(QPalette.HighlightedText, Qt.red)
 
 
+class WordsTableModel(QAbstractTableModel):
+    """
+    Words book model which loads the rows page by page from SQL.
+
+    Sorting and filtering are done by `WordsBookDatabase.getWordsPage`, only the rows
+    scrolled into view are loaded. Changes of the words book are applied to the loaded rows
+    by `signalBus.words_changed_signal`.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.headers = [
+            self.tr("Word"),
+            self.tr("Explain"),
+            self.tr("Examples"),
+            self.tr("AddTime"),
+            self.tr("Review"),
+            self.tr("Resource"),
+        ]
+        self.words: List[Word] = []
+        self.cursor: Optional[Tuple[str, str]] = None
+        self.at_end = True
+        self.order_by = "added_on"
+        self.descending = False
+        self.query = ""
+        signalBus.words_changed_signal.connect(self.applyChanges)
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.words)
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(WORD_SORT_COLUMNS)
+
+    def data(self, index: QModelIndex, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.ToolTipRole):
+            return None
+        value = getattr(self.words[index.row()], WORD_SORT_COLUMNS[index.column()])
+        if value is None:
+            return ""
+        if role == Qt.DisplayRole and WORD_SORT_COLUMNS[index.column()] == "resource":
+            return os.path.basename(value)
+        return str(value)
+
+    def headerData(self, section: int, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.headers[section]
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()) -> bool:
+        return not parent.isValid() and not self.at_end
+
+    def fetchMore(self, parent=QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+        words, self.cursor = WordsBookDatabase().getWordsPage(
+            WORDS_PAGE_SIZE, self.cursor, self.order_by, self.descending, self.query
+        )
+        self.at_end = self.cursor is None
+        if not words:
+            return
+        self.beginInsertRows(
+            QModelIndex(), len(self.words), len(self.words) + len(words) - 1
+        )
+        self.words.extend(words)
+        self.endInsertRows()
+
+    def sort(self, column: int, order=Qt.AscendingOrder):
+        self.order_by = WORD_SORT_COLUMNS[column]
+        self.descending = order == Qt.DescendingOrder
+        self.reload()
+
+    def setFilter(self, query: str):
+        self.query = query.strip()
+        self.reload()
+
+    def applyChanges(self, kind: str, words: list):
+        """
+        Applies the changed words to the loaded rows without reloading the table.
+        """
+        if kind == "reset":
+            self.reload()
+            return
+        changed = set(words)
+        for row in range(len(self.words) - 1, -1, -1):
+            if self.words[row].word in changed:
+                self.beginRemoveRows(QModelIndex(), row, row)
+                del self.words[row]
+                self.endRemoveRows()
+        if kind == "delete":
+            return
+        try:
+            words = WordsBookDatabase().getWords(words, self.query)
+        except Exception as e:
+            logger.error("load changed words error: %s" % e)
+            return
+        for word in words:
+            self.insertWord(word)
+
+    def sortKey(self, word: Word) -> tuple:
+        # the same key as the cursor of the pages
+        return wordSortKey(word, self.order_by)
+
+    def isAfter(self, key: tuple, other: tuple) -> bool:
+        return key < other if self.descending else key > other
+
+    def insertWord(self, word: Word):
+        key = self.sortKey(word)
+        if not self.at_end and (self.cursor is None or self.isAfter(key, self.cursor)):
+            # not loaded yet, it comes with a later page
+            return
+        low, high = 0, len(self.words)
+        while low < high:
+            middle = (low + high) // 2
+            if self.isAfter(key, self.sortKey(self.words[middle])):
+                low = middle + 1
+            else:
+                high = middle
+        self.beginInsertRows(QModelIndex(), low, low)
+        self.words.insert(low, word)
+        self.endInsertRows()
+
+    def reload(self):
+        """
+        Drops the loaded rows and loads the first page again.
+        """
+        self.beginResetModel()
+        self.words = []
+        self.cursor = None
+        self.at_end = False
+        self.endResetModel()
+        try:
+            self.fetchMore()
+        except Exception as e:
+            logger.error("load words page error: %s" % e)
+            self.at_end = True
+
+
 class WordsTable(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
 
         self.hBoxLayout = QHBoxLayout(self)
-        self.tableView = TableWidget(self)
+        self.model = WordsTableModel(self)
+        self.tableView = TableView(self)
         self.tableView.setBorderVisible(True)
         self.tableView.setBorderRadius(8)
 
         self.tableView.setWordWrap(False)
-        # self.tableView.setRowCount(1000000)
-        self.tableView.setColumnCount(6)
+        self.tableView.setModel(self.model)
 
         self.tableView.verticalHeader().hide()
-        self.tableView.setHorizontalHeaderLabels(
-            [
-                self.tr("Word"),
-                self.tr("Explain"),
-                self.tr("Examples"),
-                self.tr("AddTime"),
-                self.tr("Review"),
-                self.tr("Resource"),
-            ]
-        )
-        self.tableView.resizeColumnsToContents()
-        self.tableView.horizontalHeader().setSectionResizeMode(
-            QHeaderView.ResizeToContents
-        )
-        # self.tableView.setSortingEnabled(True)
+        # size the columns once, ResizeToContents measures every loaded row
+        header = self.tableView.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.Interactive)
+        header.setStretchLastSection(True)
+        for column, width in enumerate((120, 320, 320, 170, 170)):
+            self.tableView.setColumnWidth(column, width)
+        header.setSortIndicator(3, Qt.AscendingOrder)
+        self.tableView.setSortingEnabled(True)
 
         # self.setStyleSheet("Demo{background: rgb(255, 255, 255)} ")
         self.hBoxLayout.setContentsMargins(10, 10, 10, 10)
         self.hBoxLayout.addWidget(self.tableView)
 
-    def addWord(self, word, explain, example, added_on, next_review_on, resource):
-        rowPosition = self.tableView.rowCount()
-        self.tableView.insertRow(rowPosition)
-
-        self.tableView.setItem(rowPosition, 0, QTableWidgetItem(word))
-        self.tableView.setItem(rowPosition, 1, QTableWidgetItem(explain))
-        self.tableView.setItem(rowPosition, 2, QTableWidgetItem(example))
-        self.tableView.setItem(rowPosition, 3, QTableWidgetItem(added_on))
-        self.tableView.setItem(rowPosition, 4, QTableWidgetItem(next_review_on))
-        self.tableView.setItem(rowPosition, 5, QTableWidgetItem(resource))
-
     def updateTable(self):
-        db = WordsBookDatabase()
-        words: map[Word] = db.updateWordsMap()
-        self.tableView.setRowCount(0)
-        for word in words:
-            wordobj = words[word]
-            self.addWord(
-                wordobj.word,
-                wordobj.explain,
-                wordobj.example,
-                wordobj.added_on,
-                wordobj.next_review_on,
-                os.path.basename(wordobj.resource),
-            )
+        self.model.setFilter("")
+
+    def searchWords(self, text: str):
+        self.model.setFilter(text)
@@ -35,6 +35,8 @@ class IconWidget(QWidget):
 
 class ExplainFlyoutView(FlyoutViewBase):
     pin_explain_signal = Signal(str, str, bool)
+    # the cached explanation is replaced by a new one
+    regenerate_signal = Signal()
 
     def __init__(self, title: str, parent=None):
         super().__init__(parent)
@@ -53,6 +55,9 @@ class ExplainFlyoutView(FlyoutViewBase):
         # self.contentLabel.setWordWrap(True)
         self.iconWidget = IconWidget(self.icon, self)
         self.pin_button = TransparentToolButton(FluentIcon.PIN, self)
+        self.regenerate_button = TransparentToolButton(FluentIcon.SYNC, self)
+        self.regenerate_button.setToolTip(self.tr("Regenerate"))
+        self.regenerate_button.setVisible(False)
 
         self.add_button = PrimaryToolButton(FIF.ADD, self)
         self.add_button.clicked.connect(self.addWord)
@@ -66,10 +71,13 @@ class ExplainFlyoutView(FlyoutViewBase):
     def __initWidgets(self):
         self.pin_button.setFixedSize(32, 32)
         self.pin_button.setIconSize(QSize(12, 12))
+        self.regenerate_button.setFixedSize(32, 32)
+        self.regenerate_button.setIconSize(QSize(12, 12))
         self.titleLabel.setVisible(bool(self.title))
         # self.contentLabel.setVisible(bool(self.content))
 
         self.pin_button.clicked.connect(self.pinWindow)
+        self.regenerate_button.clicked.connect(self.regenerate)
 
         self.titleLabel.setObjectName("titleLabel")
         self.contentLabel.setObjectName("contentLabel")
@@ -98,7 +106,10 @@ class ExplainFlyoutView(FlyoutViewBase):
         self.widgetLayout.addWidget(self.contentLabel)
         self.viewLayout.addLayout(self.widgetLayout)
 
-        # add pin button
+        # add regenerate and pin buttons
+        self.viewLayout.addWidget(
+            self.regenerate_button, 0, Qt.AlignRight | Qt.AlignTop
+        )
         self.viewLayout.addWidget(self.pin_button, 0, Qt.AlignRight | Qt.AlignTop)
 
         # adjust content margins
@@ -115,6 +126,15 @@ class ExplainFlyoutView(FlyoutViewBase):
         self.pin_explain_signal.emit(self.title, self.content, self.already_add)
         self.close()
 
+    def showRegenerate(self):
+        """Shows the regenerate button of an explanation replayed from the cache."""
+        self.regenerate_button.setVisible(True)
+
+    def regenerate(self):
+        self.regenerate_button.setVisible(False)
+        self.setContent("")
+        self.regenerate_signal.emit()
+
     def addWord(self):
         db = WordsBookDatabase()
         if not db.parseExplainAndAddWords(self.title, self.content, self.resource):
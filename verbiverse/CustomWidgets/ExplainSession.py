@@ -0,0 +1,107 @@
+from ExplainWindow import ExplainWindow
+from Functions.LanguageType import ExplainLanguage
+from LLM.ExplainService import explain_service
+from ModuleLogger import logger
+from PySide6.QtCore import QObject, Slot
+from qfluentwidgets import Flyout
+
+
+class ExplainSession(QObject):
+    """
+    The explanation of a selected text, shown in its flyout and then in the window it is
+    pinned to.
+
+    The explanation is cancelled at once when both the flyout and the window are closed,
+    the session is deleted then. Every session has its own explanation, so the sessions of
+    one widget run concurrently.
+    """
+
+    def __init__(
+        self,
+        explain_flyout: Flyout,
+        selected_text: str,
+        all_text: str,
+        language_type: ExplainLanguage,
+        resource: str,
+        parent: QObject = None,
+    ):
+        """
+        Args:
+            explain_flyout (Flyout): The flyout of an `ExplainFlyoutView`.
+            selected_text (str): The selected text to be explained.
+            all_text (str): The entire text context.
+            language_type (ExplainLanguage): The language of the explanation.
+            resource (str): The location of the selected text in the words book.
+            parent (QObject, optional): The widget of the selected text.
+        """
+        super().__init__(parent)
+        self.explain_flyout = explain_flyout
+        self.explain_window = None
+        self.request = (selected_text, all_text, language_type)
+        self.resource = resource
+        self.task = None
+
+        self.explain_flyout.view.setTextResource(resource)
+        self.explain_flyout.closed.connect(self.explainClose)
+        self.explain_flyout.view.pin_explain_signal.connect(self.pinFlyout)
+        self.explain_flyout.view.regenerate_signal.connect(self.regenerateExplain)
+        self.startExplain()
+
+    def startExplain(self, regenerate: bool = False) -> None:
+        self.task = explain_service.explain(*self.request, regenerate=regenerate)
+        self.task.messageCallBackSignal.connect(self.onExplainResultUpdate)
+        self.task.cacheHitSignal.connect(self.onExplainCacheHit)
+
+    def stopExplain(self) -> None:
+        if self.task is not None:
+            # the cancelled explanation must not update the new one
+            self.task.messageCallBackSignal.disconnect(self.onExplainResultUpdate)
+            self.task.cacheHitSignal.disconnect(self.onExplainCacheHit)
+            self.task.stop()
+            self.task = None
+
+    @Slot(str)
+    def onExplainResultUpdate(self, explain: str):
+        if self.explain_flyout is not None:
+            self.explain_flyout.view.setContent(
+                self.explain_flyout.view.getContent() + explain
+            )
+        elif self.explain_window is not None:
+            self.explain_window.setContent(self.explain_window.getContent() + explain)
+
+    @Slot()
+    def onExplainCacheHit(self):
+        if self.explain_flyout is not None:
+            self.explain_flyout.view.showRegenerate()
+
+    @Slot()
+    def regenerateExplain(self):
+        self.stopExplain()
+        self.startExplain(regenerate=True)
+
+    @Slot()
+    def explainClose(self):
+        logger.debug("flyout close")
+        self.explain_flyout = None
+        if self.explain_window is None:
+            self.close()
+
+    @Slot(str, str, bool)
+    def pinFlyout(self, title: str, content: str, already_add: bool):
+        logger.debug(f"pin flyout {title} \n content{content}")
+        # the rest of the explanation goes to the window
+        self.explain_flyout = None
+        self.explain_window = ExplainWindow(title, content, self.resource, already_add)
+        self.explain_window.show()
+        self.explain_window.close_signal.connect(self.pinWindowClose)
+
+    @Slot()
+    def pinWindowClose(self):
+        logger.debug("explain window close")
+        self.explain_window = None
+        if self.explain_flyout is None:
+            self.close()
+
+    def close(self) -> None:
+        self.stopExplain()
+        self.deleteLater()
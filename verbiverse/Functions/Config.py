@@ -73,6 +73,27 @@ class Config(QConfig):
     user_key = ConfigItem("LLM", "UserKey", "", ConfigValidator())
     provider_url = ConfigItem("LLM", "URL", "Default", ProviderUrlValidator())
     database_folder = ConfigItem("LLM", "Database", "app/database", FolderValidator())
+    # "float16" and "int8" keep the vectors in memory-mapped NumPy matrices
+    vector_store_backend = OptionsConfigItem(
+        "LLM",
+        "VectorStore",
+        "chroma",
+        OptionsValidator(["chroma", "float16", "int8"]),
+    )
+    # megabytes of the vector stores, the least recently used books are removed over it
+    database_budget = RangeConfigItem(
+        "LLM", "DatabaseBudget", 2048, RangeValidator(256, 20480)
+    )
+    # explanations of the same selection, context, language and model are replayed from disk
+    explain_cache = ConfigItem("LLM", "ExplainCache", True, BoolValidator())
+    # explanations streaming at once, the others wait for them
+    explain_concurrency = RangeConfigItem(
+        "LLM", "ExplainConcurrency", 3, RangeValidator(1, 8)
+    )
+    # about the tokens of the sentences around the selection sent with an explanation
+    explain_context_tokens = RangeConfigItem(
+        "LLM", "ExplainContextTokens", 256, RangeValidator(64, 2048)
+    )
     target_language = OptionsConfigItem(
         "LLM",
         "TargetLanguage",
@@ -86,6 +107,32 @@ class Config(QConfig):
         OptionsValidator(["chinese", "english", "japanese"]),
     )
 
+    # chat with the PDF, chunks within the window of the reading page are preferred
+    chat_page_window = RangeConfigItem("Chat", "PageWindow", 10, RangeValidator(0, 100))
+    # percent of the boost kept for every page away from the reading page
+    chat_page_decay = RangeConfigItem("Chat", "PageDecay", 80, RangeValidator(10, 100))
+    chat_read_pages_only = ConfigItem("Chat", "ReadPagesOnly", False, BoolValidator())
+    chat_answer_cache = ConfigItem("Chat", "AnswerCache", True, BoolValidator())
+    # percent of cosine similarity of a cached question to reuse its answer, 100 for the same text only
+    chat_cache_similarity = RangeConfigItem(
+        "Chat", "CacheSimilarity", 95, RangeValidator(80, 100)
+    )
+
+    # words book
+    words_write_behind = ConfigItem(
+        "WordsBook", "WriteBehind", True, BoolValidator(), restart=True
+    )
+    words_commit_interval = RangeConfigItem(
+        "WordsBook", "CommitInterval", 200, RangeValidator(10, 5000), restart=True
+    )
+    review_scheduler = OptionsConfigItem(
+        "WordsBook", "ReviewScheduler", "sm2", OptionsValidator(["sm2", "fsrs"])
+    )
+    # percent of words expected to be remembered at their review time
+    desired_retention = RangeConfigItem(
+        "WordsBook", "DesiredRetention", 90, RangeValidator(70, 99)
+    )
+
     # main window
     mica_enabled = ConfigItem("MainWindow", "MicaEnabled", isWin11(), BoolValidator())
     dpiScale = OptionsConfigItem(
@@ -2,7 +2,8 @@ import logging
 import os
 from logging.handlers import RotatingFileHandler
 
-LOG_PATH = "./app/log/"
+# the tests write their logs to a temporary folder, see tests/conftest.py
+LOG_PATH = os.environ.get("VERBIVERSE_LOG_PATH", "./app/log/")
 if not os.path.exists(LOG_PATH):
     os.makedirs(LOG_PATH)
 
@@ -0,0 +1,359 @@
+import datetime
+import math
+from abc import ABC, abstractmethod
+from enum import IntEnum
+from typing import Dict
+
+import numpy as np
+from Functions.Config import cfg
+from qfluentwidgets import qconfig
+
+# Julian day of 1970-01-01 00:00:00, SQLite julianday() uses the same epoch
+UNIX_EPOCH_JULIAN_DAY = 2440587.5
+
+
+class ReviewGrade(IntEnum):
+    """The answer of a review, same scale as Anki and FSRS"""
+
+    AGAIN = 1
+    HARD = 2
+    GOOD = 3
+    EASY = 4
+
+
+class CardState:
+    """The review state of one word"""
+
+    __slots__ = (
+        "word",
+        "review_times",
+        "ease",
+        "interval",
+        "stability",
+        "difficulty",
+        "last_review_on",
+        "next_review_on",
+    )
+
+    def __init__(
+        self,
+        word: str,
+        review_times: int = 0,
+        ease: float = 2.5,
+        interval: float = 0.0,
+        stability: float = 0.0,
+        difficulty: float = 0.0,
+        last_review_on: datetime.datetime = None,
+        next_review_on: datetime.datetime = None,
+    ):
+        self.word = word
+        self.review_times = review_times
+        self.ease = ease
+        self.interval = interval
+        self.stability = stability
+        self.difficulty = difficulty
+        self.last_review_on = last_review_on
+        self.next_review_on = next_review_on
+
+    def __str__(self):
+        return f"word: {self.word}, review_times: {self.review_times}, ease: {self.ease}, interval: {self.interval}, stability: {self.stability}, difficulty: {self.difficulty}, last_review_on: {self.last_review_on}, next_review_on: {self.next_review_on}"
+
+
+def toJulianDay(time: datetime.datetime) -> float:
+    """
+    Same as SQLite julianday() of the stored text, the naive local time is read as it is.
+    """
+    seconds = (time - datetime.datetime(1970, 1, 1)).total_seconds()
+    return seconds / 86400 + UNIX_EPOCH_JULIAN_DAY
+
+
+def julianDaysToDbTime(days: np.ndarray) -> np.ndarray:
+    """
+    Converts an array of julian days to the text format of the words table, see `toDbTime`.
+    """
+    seconds = (days - UNIX_EPOCH_JULIAN_DAY) * 86400
+    # a julian day float is only precise to about 0.1 ms, same as SQLite
+    times = np.round(seconds * 1e3).astype("datetime64[ms]")
+    return np.char.replace(np.datetime_as_string(times, unit="us"), "T", " ")
+
+
+class ReviewScheduler(ABC):
+    """
+    Interface of the spaced repetition algorithms.
+
+    `review` schedules one card after a review. `reschedule` and `forecast` work on the whole
+    book at once, they take a dict of numpy arrays with the keys "review_times", "ease",
+    "interval", "stability", "difficulty", "last_review" and "due", times are julian days and
+    "last_review" is NaN for cards never reviewed.
+    """
+
+    name = ""
+
+    def __init__(self, desired_retention: float = 0.9):
+        self.desired_retention = desired_retention
+
+    def firstReview(self, now: datetime.datetime) -> datetime.datetime:
+        """The first review time of a new word"""
+        return now + datetime.timedelta(days=1)
+
+    @abstractmethod
+    def review(
+        self, card: CardState, grade: ReviewGrade, now: datetime.datetime
+    ) -> CardState:
+        """Updates the card after a review and schedules its next review"""
+
+    @abstractmethod
+    def intervals(self, cards: Dict[str, np.ndarray]) -> np.ndarray:
+        """The current interval in days of every reviewed card with the current parameters"""
+
+    @abstractmethod
+    def advance(self, cards: Dict[str, np.ndarray], mask: np.ndarray) -> None:
+        """Updates the state of the masked cards in place as if they were answered GOOD on time"""
+
+    def reschedule(self, cards: Dict[str, np.ndarray]) -> np.ndarray:
+        """
+        Recomputes the due julian day of every card, cards never reviewed keep their due day.
+        """
+        reviewed = ~np.isnan(cards["last_review"])
+        due = cards["due"].copy()
+        due[reviewed] = cards["last_review"][reviewed] + self.intervals(cards)[reviewed]
+        return due
+
+    def forecast(
+        self, cards: Dict[str, np.ndarray], today: float, days: int = 365
+    ) -> np.ndarray:
+        """
+        Simulates the reviews of the following days, assuming every answer is GOOD.
+
+        Args:
+            cards (dict): The cards arrays, see the class description.
+            today (float): The julian day of the start of today.
+            days (int): The number of days to forecast.
+
+        Returns:
+            np.ndarray: The number of reviews of every day, overdue cards are counted on the first day.
+        """
+        counts = np.zeros(days, dtype=np.int64)
+        cards = {key: value.astype(np.float64) for key, value in cards.items()}
+        day = np.floor(cards["due"] - today)
+        active = day < days
+        # intervals grow exponentially, the limit only guards against bad parameters
+        for _ in range(days):
+            if not active.any():
+                break
+            counts += np.bincount(
+                np.clip(day[active], 0, None).astype(np.int64), minlength=days
+            )[:days]
+            review_day = np.maximum(cards["due"][active], today)
+            self.advance(cards, active)
+            cards["last_review"][active] = review_day
+            cards["due"][active] = review_day + np.maximum(
+                self.intervals(cards)[active], 1
+            )
+            day = np.floor(cards["due"] - today)
+            active &= day < days
+        return counts
+
+
+class SM2Scheduler(ReviewScheduler):
+    """
+    SuperMemo 2 algorithm.
+
+    The interval is scaled by log(desired_retention) / log(0.9) like the interval modifier of Anki.
+    """
+
+    name = "sm2"
+    QUALITY = {
+        ReviewGrade.AGAIN: 1,
+        ReviewGrade.HARD: 3,
+        ReviewGrade.GOOD: 4,
+        ReviewGrade.EASY: 5,
+    }
+
+    def modifier(self) -> float:
+        return math.log(self.desired_retention) / math.log(0.9)
+
+    def review(
+        self, card: CardState, grade: ReviewGrade, now: datetime.datetime
+    ) -> CardState:
+        quality = self.QUALITY[ReviewGrade(grade)]
+        if quality < 3:
+            card.review_times = 0
+            card.interval = 1
+        else:
+            card.review_times += 1
+            if card.review_times == 1:
+                card.interval = 1
+            elif card.review_times == 2:
+                card.interval = 6
+            else:
+                card.interval = round(card.interval * card.ease)
+        card.ease = max(
+            1.3, card.ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)
+        )
+        card.last_review_on = now
+        card.next_review_on = now + datetime.timedelta(
+            days=max(1, round(card.interval * self.modifier()))
+        )
+        return card
+
+    def intervals(self, cards: Dict[str, np.ndarray]) -> np.ndarray:
+        return np.maximum(np.round(cards["interval"] * self.modifier()), 1)
+
+    def advance(self, cards: Dict[str, np.ndarray], mask: np.ndarray) -> None:
+        review_times = cards["review_times"][mask] + 1
+        interval = np.where(
+            review_times == 1,
+            1,
+            np.where(
+                review_times == 2,
+                6,
+                np.round(cards["interval"][mask] * cards["ease"][mask]),
+            ),
+        )
+        cards["review_times"][mask] = review_times
+        cards["interval"][mask] = interval
+
+
+class FSRSScheduler(ReviewScheduler):
+    """
+    Free Spaced Repetition Scheduler v4.5 with the default weights.
+    """
+
+    name = "fsrs"
+    DECAY = -0.5
+    FACTOR = 19 / 81
+    WEIGHTS = (
+        0.4872,
+        1.4003,
+        3.7145,
+        13.8206,
+        5.1618,
+        1.2298,
+        0.8975,
+        0.031,
+        1.6474,
+        0.1367,
+        1.0461,
+        2.1072,
+        0.0793,
+        0.3246,
+        1.587,
+        0.2272,
+        2.8755,
+    )
+
+    def __init__(self, desired_retention: float = 0.9, weights: tuple = None):
+        super().__init__(desired_retention)
+        self.w = weights or self.WEIGHTS
+
+    def intervalFactor(self) -> float:
+        """interval = stability * factor, the factor is 1 for a retention of 90%"""
+        return (self.desired_retention ** (1 / self.DECAY) - 1) / self.FACTOR
+
+    def initDifficulty(self, grade):
+        return self.w[4] - (grade - 3) * self.w[5]
+
+    def nextDifficulty(self, difficulty, grade):
+        difficulty = difficulty - self.w[6] * (grade - 3)
+        difficulty = (
+            self.w[7] * self.initDifficulty(ReviewGrade.GOOD)
+            + (1 - self.w[7]) * difficulty
+        )
+        return np.clip(difficulty, 1, 10)
+
+    def recallStability(self, difficulty, stability, retrievability, grade):
+        hard_penalty = np.where(grade == ReviewGrade.HARD, self.w[15], 1)
+        easy_bonus = np.where(grade == ReviewGrade.EASY, self.w[16], 1)
+        return stability * (
+            1
+            + np.exp(self.w[8])
+            * (11 - difficulty)
+            * np.power(stability, -self.w[9])
+            * (np.exp(self.w[10] * (1 - retrievability)) - 1)
+            * hard_penalty
+            * easy_bonus
+        )
+
+    def forgetStability(self, difficulty, stability, retrievability):
+        return (
+            self.w[11]
+            * np.power(difficulty, -self.w[12])
+            * (np.power(stability + 1, self.w[13]) - 1)
+            * np.exp(self.w[14] * (1 - retrievability))
+        )
+
+    def review(
+        self, card: CardState, grade: ReviewGrade, now: datetime.datetime
+    ) -> CardState:
+        grade = ReviewGrade(grade)
+        if card.stability <= 0 and card.interval > 0:
+            # scheduled by SM-2 before, the interval is close to the stability at 90%
+            card.stability = card.interval
+        # review_times is reset by a lapse, only a card without stability is new, like `advance`
+        if card.stability <= 0:
+            card.stability = self.w[grade - 1]
+            card.difficulty = float(np.clip(self.initDifficulty(grade), 1, 10))
+        else:
+            elapsed = 0.0
+            if card.last_review_on is not None:
+                elapsed = max(0.0, (now - card.last_review_on).total_seconds() / 86400)
+            retrievability = (1 + self.FACTOR * elapsed / card.stability) ** self.DECAY
+            # the stability is updated with the difficulty before the review, like `advance`
+            difficulty = card.difficulty
+            card.difficulty = float(self.nextDifficulty(difficulty, grade))
+            if grade == ReviewGrade.AGAIN:
+                card.stability = float(
+                    self.forgetStability(difficulty, card.stability, retrievability)
+                )
+            else:
+                card.stability = float(
+                    self.recallStability(
+                        difficulty, card.stability, retrievability, grade
+                    )
+                )
+        card.review_times = 0 if grade == ReviewGrade.AGAIN else card.review_times + 1
+        card.interval = max(1, round(card.stability * self.intervalFactor()))
+        card.last_review_on = now
+        card.next_review_on = now + datetime.timedelta(days=card.interval)
+        return card
+
+    def intervals(self, cards: Dict[str, np.ndarray]) -> np.ndarray:
+        stability = np.where(
+            cards["stability"] > 0, cards["stability"], cards["interval"]
+        )
+        return np.maximum(np.round(stability * self.intervalFactor()), 1)
+
+    def advance(self, cards: Dict[str, np.ndarray], mask: np.ndarray) -> None:
+        stability = cards["stability"][mask]
+        interval = cards["interval"][mask]
+        stability = np.where(stability > 0, stability, interval)
+        difficulty = cards["difficulty"][mask]
+        new = stability <= 0
+        stability = np.where(new, self.w[ReviewGrade.GOOD - 1], stability)
+        difficulty = np.where(
+            new | (difficulty <= 0), self.initDifficulty(ReviewGrade.GOOD), difficulty
+        )
+        # reviewed on time, so the retrievability is the desired retention
+        recalled = self.recallStability(
+            difficulty, stability, self.desired_retention, ReviewGrade.GOOD
+        )
+        cards["stability"][mask] = np.where(new, stability, recalled)
+        cards["difficulty"][mask] = np.where(
+            new, difficulty, self.nextDifficulty(difficulty, ReviewGrade.GOOD)
+        )
+        cards["review_times"][mask] += 1
+
+
+SCHEDULERS = {
+    SM2Scheduler.name: SM2Scheduler,
+    FSRSScheduler.name: FSRSScheduler,
+}
+
+
+def getSchedulerByCfg() -> ReviewScheduler:
+    """
+    Creates the review scheduler selected in the configuration.
+    """
+    scheduler = SCHEDULERS.get(qconfig.get(cfg.review_scheduler), SM2Scheduler)
+    return scheduler(qconfig.get(cfg.desired_retention) / 100)
@@ -0,0 +1,112 @@
+import datetime
+from typing import Dict, List, Optional, Tuple
+
+from Functions.ReviewScheduler import CardState, ReviewGrade
+from Functions.WordBookDatabase import Word, WordsBookDatabase
+from ModuleLogger import logger
+
+
+class ReviewSession:
+    """
+    A review of the due words of the words book.
+
+    The due words are loaded by one query when the session starts and answered in memory,
+    the answers are saved in one transaction every `flush_every` words and when the session ends.
+    """
+
+    def __init__(
+        self,
+        db: WordsBookDatabase = None,
+        limit: int = 200,
+        flush_every: int = 50,
+        until: datetime.datetime = None,
+    ):
+        """
+        Args:
+            db (WordsBookDatabase, optional): The words book. Defaults to the shared instance.
+            limit (int): The max number of words of the session.
+            flush_every (int): Save the answers after this number of words, 0 to save only at the end.
+            until (datetime, optional): Review the words due before this time. Defaults to now.
+        """
+        self.db = db or WordsBookDatabase()
+        self.flush_every = flush_every
+        self.cards: List[Tuple[Word, CardState]] = self.db.getDueCards(limit, until)
+        self.position = 0
+        self.pending: List[Tuple[CardState, ReviewGrade]] = []
+        self.grades: Dict[ReviewGrade, int] = {grade: 0 for grade in ReviewGrade}
+        self.finished = False
+        logger.info("start review session: %d words" % len(self.cards))
+
+    def __len__(self) -> int:
+        return len(self.cards)
+
+    @property
+    def remaining(self) -> int:
+        return len(self.cards) - self.position
+
+    @property
+    def reviewed(self) -> int:
+        return self.position
+
+    def current(self) -> Optional[Word]:
+        """
+        The word to answer, None when all words are reviewed.
+        """
+        if self.finished or self.position >= len(self.cards):
+            return None
+        return self.cards[self.position][0]
+
+    def answer(
+        self, grade: ReviewGrade, now: datetime.datetime = None
+    ) -> Optional[CardState]:
+        """
+        Answer the current word and move to the next one.
+
+        Args:
+            grade (ReviewGrade): The answer of the current word.
+            now (datetime, optional): The review time. Defaults to now.
+
+        Returns:
+            CardState: The new review state of the answered word, None if no word is left.
+        """
+        if self.current() is None:
+            return None
+        grade = ReviewGrade(grade)
+        if now is None:
+            now = datetime.datetime.now()
+        state = self.db.scheduler.review(self.cards[self.position][1], grade, now)
+        self.pending.append((state, grade))
+        self.grades[grade] += 1
+        self.position += 1
+        if self.flush_every > 0 and len(self.pending) >= self.flush_every:
+            self.flush()
+        return state
+
+    def flush(self) -> int:
+        """
+        Save the pending answers in one transaction.
+
+        Returns:
+            int: The number of saved answers.
+        """
+        if not self.pending:
+            return 0
+        pending = self.pending
+        self.pending = []
+        return self.db.recordReviews(pending)
+
+    def finish(self) -> Dict[ReviewGrade, int]:
+        """
+        Save the pending answers and end the session, the words not answered stay due.
+
+        Returns:
+            dict: The number of answers of every grade.
+        """
+        if not self.finished:
+            self.flush()
+            self.finished = True
+            logger.info(
+                "finish review session: %d of %d words reviewed"
+                % (self.position, len(self.cards))
+            )
+        return self.grades
@@ -18,10 +18,17 @@ class SignalBus(QObject):
     warning_signal = Signal(str)
     error_signal = Signal(str)
     status_signal = Signal(str, str)
+    # update the content of the status opened by status_signal without closing it
+    status_progress_signal = Signal(str, str)
+
+    # words book signal
+    # (kind, words) after the change is saved, kind is insert, update, delete or reset
+    words_changed_signal = Signal(str, list)
 
     # setting signal
     mica_enable_change_signal = Signal(bool)
     llm_config_change_signal = Signal()
+    review_config_change_signal = Signal()
 
 
 signalBus = SignalBus()
@@ -1,12 +1,100 @@
+import atexit
 import datetime
+import re
 import sqlite3
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
+import numpy as np
 from Functions.Config import cfg
+from Functions.ReviewScheduler import (
+    CardState,
+    ReviewGrade,
+    ReviewScheduler,
+    getSchedulerByCfg,
+    julianDaysToDbTime,
+    toJulianDay,
+)
+from Functions.SignalBus import signalBus
+from Functions.WordsBookMigrations import formatResource, migrate, parseResource
+from Functions.WordsBookWriter import WordsBookWriter, connectWordsBook
 from ModuleLogger import logger
 from qfluentwidgets import qconfig
 
+# the columns of a `Word`, the resource is built from the last three by `toWord`
+WORD_COLUMNS = (
+    "words.word, words.explain, words.example, words.added_on, words.next_review_on, "
+    "words.review_times, documents.path, documents.kind, words.position"
+)
+WORD_TABLES = "words LEFT JOIN documents ON documents.id = words.document_id"
+CARD_COLUMNS = "word, review_times, ease, interval, stability, difficulty, last_review_on, next_review_on"
+WORD_CACHE_SIZE = 512
+# changes of more words are published as one "reset"
+WORDS_CHANGED_LIMIT = 1000
+# bm25 weights of the words_fts columns: word, explain, example, resource
+SEARCH_WEIGHTS = (10.0, 2.0, 1.0, 0.5)
+SEARCH_TOKEN = re.compile(r"\w+")
+# columns the words page could be sorted by
+WORD_SORT_COLUMNS = (
+    "word",
+    "explain",
+    "example",
+    "added_on",
+    "next_review_on",
+    "resource",
+)
+# the SQL expression of every sort column
+WORD_SORT_EXPRESSIONS = {
+    "word": "words.word",
+    "explain": "words.explain",
+    "example": "words.example",
+    "added_on": "words.added_on",
+    "next_review_on": "words.next_review_on",
+    "resource": "IFNULL(documents.path, '')",
+}
+
+
+def toDbTime(time: datetime.datetime) -> str:
+    """
+    Converts a datetime to the text format stored in the words table.
+
+    The format matches sqlite3's default datetime adapter, so values written by
+    older versions compare correctly with new ones as plain strings.
+    """
+    return time.isoformat(" ")
+
+
+def toSearchMatch(query: str) -> str:
+    """
+    Converts the user input to a FTS5 match expression, empty if nothing could be searched.
+
+    The last term is matched as a prefix so it could be used while typing,
+    a query in double quotes is matched as a phrase.
+    """
+    query = query.strip()
+    if query.startswith('"') and query.endswith('"') and len(query) > 1:
+        phrase = query[1:-1].replace('"', " ").strip()
+        return f'"{phrase}"' if phrase else ""
+    terms = SEARCH_TOKEN.findall(query)
+    match = " ".join(f'"{term}"' for term in terms)
+    if terms:
+        match += "*"
+    return match
+
 
 class Word:
+    __slots__ = (
+        "word",
+        "explain",
+        "example",
+        "added_on",
+        "next_review_on",
+        "review_times",
+        "resource",
+    )
+
     def __init__(
         self,
         word: str,
@@ -29,6 +117,94 @@ class Word:
         return f"word: {self.word}, explain: {self.explain}, example: {self.example}, added_on: {self.added_on}, next_review_on: {self.next_review_on}, review_times: {self.review_times}, resource: {self.resource}"
 
 
+def wordSortKey(word: Word, order_by: str) -> tuple:
+    """
+    The key of a word in the order of `getWordsPage`, comparable with its cursors.
+
+    The words are sorted by the SQL expression of `WORD_SORT_EXPRESSIONS`, a resource only
+    by its document path, then by word.
+    """
+    if order_by == "resource":
+        value = parseResource(word.resource)[0] or ""
+    else:
+        value = getattr(word, order_by)
+    return value, word.word
+
+
+def toWord(row: tuple) -> Word:
+    """
+    Builds a word from a row of `WORD_COLUMNS`.
+    """
+    return Word(*row[:6], formatResource(*row[6:9]))
+
+
+class WordKey:
+    """The review state of a word kept in memory for every word of the book."""
+
+    __slots__ = ("next_review_on", "review_times")
+
+    def __init__(self, next_review_on: str, review_times: int):
+        self.next_review_on = next_review_on
+        self.review_times = review_times
+
+
+class WordCache:
+    """A thread safe LRU cache of fully loaded words."""
+
+    def __init__(self, max_size: int = WORD_CACHE_SIZE):
+        self.max_size = max_size
+        self.words = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, word: str) -> Optional[Word]:
+        with self.lock:
+            value = self.words.get(word)
+            if value is not None:
+                self.words.move_to_end(word)
+            return value
+
+    def put(self, value: Word) -> None:
+        with self.lock:
+            self.words[value.word] = value
+            self.words.move_to_end(value.word)
+            if len(self.words) > self.max_size:
+                self.words.popitem(last=False)
+
+    def pop(self, word: str) -> None:
+        with self.lock:
+            self.words.pop(word, None)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.words.clear()
+
+
+class WordsMap(Mapping):
+    """
+    A read only map of word -> `Word` over the whole words book.
+
+    Keys come from the in memory index, values are loaded on demand through `WordsBookDatabase.getWord`.
+    """
+
+    def __init__(self, db: "WordsBookDatabase"):
+        self.db = db
+
+    def __getitem__(self, word: str) -> Word:
+        value = self.db.getWord(word)
+        if value is None:
+            raise KeyError(word)
+        return value
+
+    def __contains__(self, word) -> bool:
+        return word in self.db.word_index
+
+    def __iter__(self):
+        return iter(list(self.db.word_index))
+
+    def __len__(self) -> int:
+        return len(self.db.word_index)
+
+
 class WordsBookDatabase:
     _instance = None
 
@@ -38,7 +214,7 @@ class WordsBookDatabase:
             cls._instance.alreadyInit = False
         return cls._instance
 
-    def __init__(self, db_path=None):
+    def __init__(self, db_path=None, write_behind: bool = None):
         if self.alreadyInit:
             return
         if db_path is None:
@@ -46,84 +222,466 @@ class WordsBookDatabase:
             self.db_path += "/WordsDataBase.db"
         else:
             self.db_path = db_path
-        logger.info("init words book database: %s" % self.db_path)
-        self.conn = sqlite3.connect(self.db_path)
-        self.cursor = self.conn.cursor()
+        if write_behind is None:
+            write_behind = qconfig.get(cfg.words_write_behind)
+        logger.info(
+            "init words book database: %s write behind: %s"
+            % (self.db_path, write_behind)
+        )
+        # every thread reads with its own connection, see `conn`
+        self.local = threading.local()
+        self.connections = []
+        self.connections_lock = threading.Lock()
+        # document path -> id, see `documentId`
+        self.document_ids = {}
 
         self.initTable()
 
-        self.word_map = self.updateWordsMap()
+        self.writer = None
+        if write_behind:
+            self.writer = WordsBookWriter(
+                self.db_path,
+                qconfig.get(cfg.words_commit_interval),
+                self.notifyChanges,
+                self.onWriteFailed,
+            )
+        # loaded on first use, see `word_index`
+        self.__word_index = None
+        self.word_cache = WordCache()
+        self.scheduler = getSchedulerByCfg()
+        signalBus.review_config_change_signal.connect(self.onReviewConfigChanged)
         self.alreadyInit = True
+        atexit.register(self.close)
 
     def __del__(self):
-        self.conn.commit()
-        self.conn.close()
+        self.close()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """The connection of the current thread, created on first use."""
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = connectWordsBook(self.db_path)
+            self.local.conn = conn
+            self.local.cursor = conn.cursor()
+            with self.connections_lock:
+                self.connections.append(conn)
+        return conn
+
+    @property
+    def cursor(self) -> sqlite3.Cursor:
+        """The cursor of the current thread's connection."""
+        self.conn  # make sure the connection of this thread is created
+        return self.local.cursor
+
+    def close(self):
+        """
+        Flushes pending writes and closes all connections.
+        """
+        if not getattr(self, "alreadyInit", False):
+            return
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        with self.connections_lock:
+            for conn in self.connections:
+                try:
+                    conn.commit()
+                    conn.close()
+                except sqlite3.ProgrammingError:
+                    # already closed or owned by a finished thread
+                    pass
+            self.connections = []
+        self.local = threading.local()
+
+    def flush(self) -> None:
+        """
+        Blocks until all words added in write behind mode are saved.
+        """
+        if self.writer is not None and self.writer.hasPending():
+            self.writer.flush()
+
+    def notifyChanges(self, changes: List[Tuple[str, List[str]]]) -> None:
+        """
+        Publishes saved changes by `signalBus.words_changed_signal`, called after commit.
+
+        Consecutive changes of the same kind are merged, too many words become one "reset".
+        """
+        merged = []
+        for kind, words in changes:
+            if merged and merged[-1][0] == kind:
+                merged[-1][1].extend(words)
+            else:
+                merged.append((kind, list(words)))
+        for kind, words in merged:
+            if kind == "reset" or len(words) > WORDS_CHANGED_LIMIT:
+                signalBus.words_changed_signal.emit("reset", [])
+            else:
+                signalBus.words_changed_signal.emit(kind, words)
+
+    def onWriteFailed(self, changes: List[Tuple[str, List[str]]]) -> None:
+        """
+        Reloads the words from the database after the writer dropped a failed group commit,
+        the word index and the cache could list words which are not saved.
+        """
+        self.__word_index = None
+        self.word_cache.clear()
+        if changes:
+            self.notifyChanges([("reset", [])])
+
+    def __execute(self, key, sql: str, params: tuple, change: tuple = None) -> None:
+        if self.writer is not None:
+            self.writer.submit(key, sql, params, change)
+        else:
+            self.cursor.execute(sql, params)
+            self.conn.commit()
+            if change is not None:
+                self.notifyChanges([change])
+
+    def __executeTransaction(
+        self, statements: List[Tuple[str, list]], change: tuple = None
+    ) -> None:
+        if self.writer is not None:
+            self.writer.submitTransaction(statements, change)
+            return
+        try:
+            for sql, rows in statements:
+                self.cursor.executemany(sql, rows)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        if change is not None:
+            self.notifyChanges([change])
 
     def initTable(self):
-        create_table_sql = """
-            CREATE TABLE IF NOT EXISTS words (
-                word TEXT PRIMARY KEY,
-                explain TEXT,
-                example TEXT,
-                added_on DATETIME,
-                next_review_on DATETIME,
-                review_times INTEGER DEFAULT 0,
-                resource TEXT
-            );
-        """
-        self.cursor.execute(create_table_sql)
+        migrate(self.conn)
+        self.fts_enabled = self.initSearchTable()
         self.conn.commit()
 
-    def updateWordsMap(self):
-        self.cursor.execute("SELECT * FROM words")
-        rows = self.cursor.fetchall()
-        word_map = {}
-        for row in rows:
-            word_map[row[0]] = Word(*row)
-        return word_map
+    def initSearchTable(self) -> bool:
+        """
+        Creates the FTS5 index of the words_search view, kept in sync by triggers.
 
-    def getAllWords(self):
-        return self.word_map
+        Returns:
+            bool: False if the SQLite library is built without FTS5.
+        """
+        self.cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'words_fts'"
+        )
+        if self.cursor.fetchone() is not None:
+            return True
+        try:
+            self.cursor.execute("""
+                CREATE VIRTUAL TABLE words_fts USING fts5(
+                    word, explain, example, resource,
+                    content = 'words_search', tokenize = 'unicode61 remove_diacritics 2'
+                )
+                """)
+        except sqlite3.OperationalError as e:
+            logger.warning("FTS5 is not supported, search words by LIKE: %s" % e)
+            return False
+
+        self.cursor.executescript("""
+            CREATE TRIGGER IF NOT EXISTS words_fts_insert AFTER INSERT ON words BEGIN
+                INSERT INTO words_fts (rowid, word, explain, example, resource)
+                VALUES (
+                    new.rowid, new.word, new.explain, new.example,
+                    (SELECT path FROM documents WHERE id = new.document_id)
+                );
+            END;
+            CREATE TRIGGER IF NOT EXISTS words_fts_delete AFTER DELETE ON words BEGIN
+                INSERT INTO words_fts (words_fts, rowid, word, explain, example, resource)
+                VALUES (
+                    'delete', old.rowid, old.word, old.explain, old.example,
+                    (SELECT path FROM documents WHERE id = old.document_id)
+                );
+            END;
+            CREATE TRIGGER IF NOT EXISTS words_fts_update
+            AFTER UPDATE OF word, explain, example, document_id ON words BEGIN
+                INSERT INTO words_fts (words_fts, rowid, word, explain, example, resource)
+                VALUES (
+                    'delete', old.rowid, old.word, old.explain, old.example,
+                    (SELECT path FROM documents WHERE id = old.document_id)
+                );
+                INSERT INTO words_fts (rowid, word, explain, example, resource)
+                VALUES (
+                    new.rowid, new.word, new.explain, new.example,
+                    (SELECT path FROM documents WHERE id = new.document_id)
+                );
+            END;
+            INSERT INTO words_fts (words_fts) VALUES ('rebuild');
+            """)
+        logger.info("create words full text search index")
+        return True
+
+    @property
+    def word_index(self) -> Dict[str, WordKey]:
+        """The compact index of all words, loaded on first use."""
+        if self.__word_index is None:
+            self.__word_index = self.__loadWordIndex()
+        return self.__word_index
+
+    def __loadWordIndex(self) -> Dict[str, WordKey]:
+        self.flush()
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute("SELECT word, next_review_on, review_times FROM words")
+            return {row[0]: WordKey(row[1], row[2]) for row in cursor}
+        finally:
+            cursor.close()
+
+    def updateWordsMap(self) -> WordsMap:
+        """
+        Reloads the words index from the database and drops the cached words.
+        """
+        self.__word_index = self.__loadWordIndex()
+        self.word_cache.clear()
+        return self.getAllWords()
+
+    def getAllWords(self) -> WordsMap:
+        return WordsMap(self)
 
     def addWord(self, word: str, explain: str, example: str, resource: str = ""):
         word = word.lower()
+        path, document_kind, position = parseResource(resource)
+        document_id = self.documentId(path, document_kind)
+        if self.conn.in_transaction:
+            # the writer thread only sees a committed document
+            self.conn.commit()
+        resource = formatResource(path, document_kind, position)
         current_time = datetime.datetime.now()
-        next_review_on = self.calculateNextReview(current_time)
+        next_review_on = self.scheduler.firstReview(current_time)
         logger.info("add word: %s" % word)
+        added_on = toDbTime(current_time)
+        next_review_on = toDbTime(next_review_on)
         # 检查单词是否在词表中
-        if word in self.word_map:
+        key = self.word_index.get(word)
+        if key is not None:
             logger.info("word already in database: %s" % word)
-            update_sql = """
-                UPDATE words
-                SET explain = ?, example = ?, added_on = ?, next_review_on = ?, resource = ?
-                WHERE word = ?
-            """
-            self.cursor.execute(
-                update_sql,
-                (explain, example, current_time, next_review_on, resource, word),
+            key.next_review_on = next_review_on
+            kind = "update"
+        else:
+            logger.info("add new word: %s" % word)
+            key = WordKey(next_review_on, 0)
+            self.word_index[word] = key
+            kind = "insert"
+        self.word_cache.put(
+            Word(
+                word,
+                explain,
+                example,
+                added_on,
+                next_review_on,
+                key.review_times,
+                resource,
+            )
+        )
+
+        upsert_sql = """
+            INSERT INTO words (word, explain, example, added_on, next_review_on, document_id, position)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(word) DO UPDATE SET
+                explain = excluded.explain,
+                example = excluded.example,
+                added_on = excluded.added_on,
+                next_review_on = excluded.next_review_on,
+                document_id = excluded.document_id,
+                position = excluded.position
+        """
+        self.__execute(
+            ("word", word),
+            upsert_sql,
+            (
+                word,
+                explain,
+                example,
+                added_on,
+                next_review_on,
+                document_id,
+                position,
+            ),
+            (kind, [word]),
+        )
+
+    def addWords(
+        self,
+        words: Iterable[dict],
+        batch_size: int = 5000,
+        progress: Callable[[int], None] = None,
+    ) -> int:
+        """
+        Add or update many words in one transaction.
+
+        Every item is a dict with a "word" key and optionally "explain", "example", "added_on",
+        "next_review_on", "review_times" and "resource". Missing times are filled like `addWord`,
+        and an existing word never loses its review times.
+
+        Args:
+            words (Iterable[dict]): The words to add, consumed lazily.
+            batch_size (int): The number of words sent to SQLite per `executemany`.
+            progress (Callable[[int], None], optional): Called with the number of words written after every batch.
+
+        Returns:
+            int: The number of words written.
+        """
+        upsert_sql = """
+            INSERT INTO words (
+                word, explain, example, added_on, next_review_on, review_times,
+                document_id, position
             )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(word) DO UPDATE SET
+                explain = excluded.explain,
+                example = excluded.example,
+                added_on = excluded.added_on,
+                next_review_on = excluded.next_review_on,
+                review_times = MAX(words.review_times, excluded.review_times),
+                document_id = excluded.document_id,
+                position = excluded.position
+        """
+        current_time = datetime.datetime.now()
+        default_added_on = toDbTime(current_time)
+        default_next_review_on = toDbTime(self.scheduler.firstReview(current_time))
+
+        # keep the order of words queued by the writer thread
+        self.flush()
+        total = 0
+        batch = []
+        changes = [("insert", []), ("update", [])]
+        try:
+            for item in words:
+                word = str(item["word"]).strip().lower()
+                if not word:
+                    continue
+                path, document_kind, position = parseResource(item.get("resource"))
+                batch.append(
+                    (
+                        word,
+                        item.get("explain") or "",
+                        item.get("example") or "",
+                        item.get("added_on") or default_added_on,
+                        item.get("next_review_on") or default_next_review_on,
+                        int(item.get("review_times") or 0),
+                        self.documentId(path, document_kind),
+                        position,
+                    )
+                )
+                if len(batch) >= batch_size:
+                    total += self.__writeWordsBatch(upsert_sql, batch, changes)
+                    batch = []
+                    if progress is not None:
+                        progress(total)
+            if batch:
+                total += self.__writeWordsBatch(upsert_sql, batch, changes)
+                if progress is not None:
+                    progress(total)
             self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            self.document_ids.clear()
+            self.updateWordsMap()
+            raise
+        logger.info("add %d words in one transaction" % total)
+        self.notifyChanges([change for change in changes if change[1]])
+        return total
 
-            self.word_map[word].explain = explain
-            self.word_map[word].example = example
-            self.word_map[word].added_on = current_time
-            self.word_map[word].next_review_on = next_review_on
-            self.word_map[word].resource = resource
-        else:
-            logger.info("add new word: %s" % word)
-            insert_sql = """
-                INSERT INTO words (word, explain, example, added_on, next_review_on, resource)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """
+    def __writeWordsBatch(self, upsert_sql: str, batch: list, changes: list) -> int:
+        self.cursor.executemany(upsert_sql, batch)
+        word_index = self.word_index
+        for row in batch:
+            key = word_index.get(row[0])
+            if key is None:
+                word_index[row[0]] = WordKey(row[4], row[5])
+                changes[0][1].append(row[0])
+            else:
+                changes[1][1].append(row[0])
+                key.next_review_on = row[4]
+                key.review_times = max(key.review_times, row[5])
+            self.word_cache.pop(row[0])
+        return len(batch)
+
+    def documentId(self, path: Optional[str], kind: str = "text") -> Optional[int]:
+        """
+        Get the id of a document, the document is added if it is not in the database.
+
+        The insert is not committed, it is saved with the words referring to the document.
+        """
+        if path is None:
+            return None
+        document_id = self.document_ids.get(path)
+        if document_id is None:
             self.cursor.execute(
-                insert_sql,
-                (word, explain, example, current_time, next_review_on, resource),
+                "INSERT OR IGNORE INTO documents (path, kind) VALUES (?, ?)",
+                (path, kind),
             )
-            self.conn.commit()
+            self.cursor.execute("SELECT id FROM documents WHERE path = ?", (path,))
+            document_id = self.cursor.fetchone()[0]
+            self.document_ids[path] = document_id
+        return document_id
 
-            self.word_map[word] = Word(
-                word, explain, example, current_time, next_review_on, 0, resource
+    def getWordsByDocument(self, path: str) -> List[Word]:
+        """
+        Get all words added from a document, in the order of their position in the document.
+        """
+        self.flush()
+        self.cursor.execute(
+            f"""
+            SELECT {WORD_COLUMNS} FROM {WORD_TABLES}
+            WHERE words.document_id = (SELECT id FROM documents WHERE path = ?)
+            ORDER BY words.position, words.word
+            """,
+            (path,),
+        )
+        return [toWord(row) for row in self.cursor.fetchall()]
+
+    def deleteWords(self, words: Iterable[str]) -> int:
+        """
+        Delete words and their review history.
+
+        Returns:
+            int: The number of deleted words.
+        """
+        words = [word.lower() for word in words if word.lower() in self.word_index]
+        if not words:
+            return 0
+        for word in words:
+            self.word_index.pop(word, None)
+            self.word_cache.pop(word)
+        rows = [(word,) for word in words]
+        self.__executeTransaction(
+            [
+                ("DELETE FROM words WHERE word = ?", rows),
+                ("DELETE FROM review_log WHERE word = ?", rows),
+            ],
+            ("delete", words),
+        )
+        logger.info("delete %d words" % len(words))
+        return len(words)
+
+    def iterWords(self, batch_size: int = 5000) -> Iterator[Word]:
+        """
+        Iterate over all words in the database without loading them all at once.
+        """
+        self.flush()
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(
+                f"SELECT {WORD_COLUMNS} FROM {WORD_TABLES} ORDER BY words.word"
             )
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield toWord(row)
+        finally:
+            cursor.close()
+
+    def countWords(self) -> int:
+        self.flush()
+        self.cursor.execute("SELECT COUNT(*) FROM words")
+        return self.cursor.fetchone()[0]
 
     def parseExplainInfo(self, info: str, out: list) -> bool:
         if "Explain:" not in info or "Analysis:" not in info or "Example:" not in info:
@@ -141,24 +699,511 @@ class WordsBookDatabase:
         self.addWord(word.strip(), out[0], out[1], resource)
         return True
 
-    def getWord(self, word) -> Word:
-        return self.word_map.get(word)
+    def getWord(self, word) -> Optional[Word]:
+        """
+        Get a fully loaded word, recently used words are served from memory.
+        """
+        value = self.word_cache.get(word)
+        if value is not None:
+            return value
+        if word not in self.word_index:
+            return None
+        self.flush()
+        self.cursor.execute(
+            f"SELECT {WORD_COLUMNS} FROM {WORD_TABLES} WHERE words.word = ?", (word,)
+        )
+        row = self.cursor.fetchone()
+        if row is None:
+            return None
+        value = toWord(row)
+        self.word_cache.put(value)
+        return value
+
+    def searchWords(self, query: str, limit: int = 50) -> List[Word]:
+        """
+        Full text search over words, explanations, examples and resources, see `toSearchMatch`.
+
+        Args:
+            query (str): The text to search.
+            limit (int): The max number of words returned.
+
+        Returns:
+            list: The matched words, best match first.
+        """
+        match = toSearchMatch(query)
+        if not match:
+            return []
+
+        self.flush()
+        if not self.fts_enabled:
+            like = "%" + " ".join(SEARCH_TOKEN.findall(query)) + "%"
+            self.cursor.execute(
+                f"""
+                SELECT {WORD_COLUMNS} FROM {WORD_TABLES}
+                WHERE words.word LIKE ? OR words.explain LIKE ? OR words.example LIKE ?
+                    OR documents.path LIKE ?
+                ORDER BY words.word LIMIT ?
+                """,
+                (like, like, like, like, limit),
+            )
+        else:
+            self.cursor.execute(
+                f"""
+                SELECT {WORD_COLUMNS} FROM words_fts
+                JOIN words ON words.rowid = words_fts.rowid
+                LEFT JOIN documents ON documents.id = words.document_id
+                WHERE words_fts MATCH ?
+                ORDER BY bm25(words_fts, ?, ?, ?, ?) LIMIT ?
+                """,
+                (match, *SEARCH_WEIGHTS, limit),
+            )
+        return [toWord(row) for row in self.cursor.fetchall()]
+
+    def getWordsPage(
+        self,
+        limit: int = 200,
+        cursor: Optional[Tuple[str, str]] = None,
+        order_by: str = "word",
+        descending: bool = False,
+        query: str = None,
+        words: List[str] = None,
+    ) -> Tuple[List[Word], Optional[Tuple[str, str]]]:
+        """
+        Get a page of words sorted and filtered by SQL, see `getDueWords` for the paging.
+
+        Args:
+            limit (int): The max number of words in the page.
+            cursor (tuple, optional): The cursor returned by the previous page, None to start from the beginning.
+            order_by (str): One of `WORD_SORT_COLUMNS`, words with the same value are sorted by word.
+            descending (bool): Sort in descending order.
+            query (str, optional): Only words matched by the full text search are returned.
+            words (list, optional): Only these words are returned.
+
+        Returns:
+            tuple: The words of this page and the cursor of the next page, the cursor is None at the end.
+        """
+        if order_by not in WORD_SORT_COLUMNS:
+            raise ValueError(f"Not supported sort column: {order_by}")
+        conditions = []
+        params = []
+        if query:
+            match = toSearchMatch(query)
+            if not match:
+                return [], None
+            if self.fts_enabled:
+                conditions.append(
+                    "words.rowid IN (SELECT rowid FROM words_fts WHERE words_fts MATCH ?)"
+                )
+                params.append(match)
+            else:
+                like = "%" + " ".join(SEARCH_TOKEN.findall(query)) + "%"
+                conditions.append(
+                    "(words.word LIKE ? OR words.explain LIKE ? OR words.example LIKE ?"
+                    " OR documents.path LIKE ?)"
+                )
+                params += [like] * 4
+        if words is not None:
+            conditions.append(f"words.word IN ({', '.join('?' * len(words))})")
+            params += words
+        sort = WORD_SORT_EXPRESSIONS[order_by]
+        if cursor is not None:
+            compare = "<" if descending else ">"
+            if order_by == "word":
+                conditions.append(f"words.word {compare} ?")
+                params.append(cursor[1])
+            else:
+                conditions.append(f"({sort}, words.word) {compare} (?, ?)")
+                params += list(cursor)
+        where = ("WHERE " + " AND ".join(conditions)) if conditions else ""
+        order = "DESC" if descending else "ASC"
+        if order_by == "word":
+            order_sql = f"words.word {order}"
+        else:
+            order_sql = f"{sort} {order}, words.word {order}"
+
+        self.flush()
+        self.cursor.execute(
+            f"""
+            SELECT {WORD_COLUMNS}, {sort} FROM {WORD_TABLES} {where}
+            ORDER BY {order_sql} LIMIT ?
+            """,
+            (*params, limit),
+        )
+        rows = self.cursor.fetchall()
+        words = [toWord(row) for row in rows]
+        if len(words) < limit:
+            return words, None
+        return words, (rows[-1][-1], words[-1].word)
+
+    def getWords(self, words: List[str], query: str = None) -> List[Word]:
+        """
+        Get the given words in one query, words not in the book are skipped.
+
+        Args:
+            words (list): The words to get.
+            query (str, optional): Only words matched by the full text search are returned, see `getWordsPage`.
+        """
+        if not words:
+            return []
+        result = []
+        # SQLite limits the number of parameters of a statement
+        for start in range(0, len(words), 500):
+            chunk = words[start : start + 500]
+            result += self.getWordsPage(
+                len(chunk), query=query, words=chunk, order_by="word"
+            )[0]
+        return result
 
     def getWordsReview(self) -> list:
-        today = datetime.datetime.now()
-        words_to_review = []
-        for word in self.word_map:
-            if self.word_map[word].next_review_on <= today:
-                words_to_review.append(word)
-        return words_to_review
+        self.flush()
+        today = toDbTime(datetime.datetime.now())
+        self.cursor.execute(
+            "SELECT word FROM words WHERE next_review_on <= ? ORDER BY next_review_on, word",
+            (today,),
+        )
+        return [row[0] for row in self.cursor.fetchall()]
+
+    def getDueWords(
+        self,
+        limit: int = 50,
+        cursor: Optional[Tuple[str, str]] = None,
+        until: datetime.datetime = None,
+    ) -> Tuple[List[Word], Optional[Tuple[str, str]]]:
+        """
+        Get a page of words which need to be reviewed, ordered by review date.
+
+        Args:
+            limit (int): The max number of words in the page.
+            cursor (tuple, optional): The cursor returned by the previous page, None to start from the beginning.
+            until (datetime, optional): Only words due before this time are returned. Defaults to now.
+
+        Returns:
+            tuple: The words of this page and the cursor of the next page, the cursor is None when no more words are due.
+        """
+        self.flush()
+        if until is None:
+            until = datetime.datetime.now()
+        if cursor is None:
+            self.cursor.execute(
+                f"""
+                SELECT {WORD_COLUMNS} FROM {WORD_TABLES}
+                WHERE words.next_review_on <= ?
+                ORDER BY words.next_review_on, words.word LIMIT ?
+                """,
+                (toDbTime(until), limit),
+            )
+        else:
+            self.cursor.execute(
+                f"""
+                SELECT {WORD_COLUMNS} FROM {WORD_TABLES}
+                WHERE words.next_review_on <= ?
+                    AND (words.next_review_on, words.word) > (?, ?)
+                ORDER BY words.next_review_on, words.word LIMIT ?
+                """,
+                (toDbTime(until), cursor[0], cursor[1], limit),
+            )
+        words = [toWord(row) for row in self.cursor.fetchall()]
+        if len(words) < limit:
+            return words, None
+        return words, (words[-1].next_review_on, words[-1].word)
+
+    def countDueWords(self, until: datetime.datetime = None) -> int:
+        """
+        Count the words which need to be reviewed before `until`, defaults to now.
+        """
+        self.flush()
+        if until is None:
+            until = datetime.datetime.now()
+        self.cursor.execute(
+            "SELECT COUNT(*) FROM words WHERE next_review_on <= ?", (toDbTime(until),)
+        )
+        return self.cursor.fetchone()[0]
+
+    def countDueWordsByDay(
+        self, days: int = 7, start: datetime.date = None
+    ) -> Dict[datetime.date, int]:
+        """
+        Count the words to review for each day from `start` (defaults to today).
+
+        Overdue words are counted on the first day, so the result shows the real workload of every day.
+
+        Args:
+            days (int): The number of days to count.
+            start (date, optional): The first day. Defaults to today.
+
+        Returns:
+            dict: A map of day -> number of words due on that day.
+        """
+        self.flush()
+        if start is None:
+            start = datetime.date.today()
+        first_day = datetime.datetime.combine(start, datetime.time())
+        end_day = first_day + datetime.timedelta(days=days)
+        counts = {start + datetime.timedelta(days=i): 0 for i in range(days)}
+        if days <= 0:
+            return counts
 
-    def calculateNextReview(self, current_time, review_times=1):
-        interval = 1
-        if review_times > 1:
-            interval = 6 ** (review_times - 1)
+        self.cursor.execute(
+            "SELECT COUNT(*) FROM words WHERE next_review_on < ?",
+            (toDbTime(first_day),),
+        )
+        counts[start] += self.cursor.fetchone()[0]
+        self.cursor.execute(
+            """
+            SELECT date(next_review_on), COUNT(*) FROM words
+            WHERE next_review_on >= ? AND next_review_on < ?
+            GROUP BY date(next_review_on)
+            """,
+            (toDbTime(first_day), toDbTime(end_day)),
+        )
+        for day, count in self.cursor.fetchall():
+            counts[datetime.date.fromisoformat(day)] += count
+        return counts
+
+    def getCardState(self, word: str) -> Optional[CardState]:
+        """
+        Get the review state of a word, None if the word is not in the book.
+        """
+        self.flush()
+        self.cursor.execute(f"SELECT {CARD_COLUMNS} FROM words WHERE word = ?", (word,))
+        row = self.cursor.fetchone()
+        if row is None:
+            return None
+        return self.__toCardState(*row)
+
+    def __toCardState(
+        self,
+        word,
+        review_times,
+        ease,
+        interval,
+        stability,
+        difficulty,
+        last_review_on,
+        next_review_on,
+    ) -> CardState:
+        return CardState(
+            word,
+            review_times or 0,
+            ease or 2.5,
+            interval or 0,
+            stability or 0,
+            difficulty or 0,
+            datetime.datetime.fromisoformat(last_review_on) if last_review_on else None,
+            datetime.datetime.fromisoformat(next_review_on) if next_review_on else None,
+        )
+
+    def recordReview(
+        self, word: str, grade: ReviewGrade, now: datetime.datetime = None
+    ) -> Optional[CardState]:
+        """
+        Record the answer of a review and schedule the next one with the current scheduler.
+
+        Args:
+            word (str): The reviewed word.
+            grade (ReviewGrade): The answer of the review.
+            now (datetime, optional): The review time. Defaults to now.
+
+        Returns:
+            CardState: The new review state, None if the word is not in the book.
+        """
+        word = word.lower()
+        state = self.getCardState(word)
+        if state is None:
+            logger.warning("review word not in database: %s" % word)
+            return None
+        if now is None:
+            now = datetime.datetime.now()
+        state = self.scheduler.review(state, grade, now)
+        self.recordReviews([(state, grade)])
+        return state
+
+    def recordReviews(self, reviews: Iterable[Tuple[CardState, ReviewGrade]]) -> int:
+        """
+        Save the states scheduled by `ReviewScheduler.review` and their grades in one transaction.
+
+        Args:
+            reviews (Iterable[tuple]): Pairs of the new review state and the grade of the review.
+
+        Returns:
+            int: The number of saved reviews.
+        """
+        updates = []
+        logs = []
+        for state, grade in reviews:
+            reviewed_on = toDbTime(state.last_review_on)
+            updates.append(
+                (
+                    state.review_times,
+                    state.ease,
+                    state.interval,
+                    state.stability,
+                    state.difficulty,
+                    reviewed_on,
+                    toDbTime(state.next_review_on),
+                    state.word,
+                )
+            )
+            logs.append((state.word, reviewed_on, int(grade), state.interval))
+        if not updates:
+            return 0
+
+        statements = [
+            (
+                """
+                UPDATE words SET review_times = ?, ease = ?, interval = ?, stability = ?,
+                    difficulty = ?, last_review_on = ?, next_review_on = ?
+                WHERE word = ?
+                """,
+                updates,
+            ),
+            (
+                "INSERT INTO review_log (word, reviewed_on, grade, interval) VALUES (?, ?, ?, ?)",
+                logs,
+            ),
+        ]
+        self.__executeTransaction(statements, ("update", [row[-1] for row in updates]))
+
+        word_index = self.word_index
+        for row in updates:
+            key = word_index.get(row[-1])
+            if key is not None:
+                key.next_review_on = row[6]
+                key.review_times = row[0]
+            self.word_cache.pop(row[-1])
+        logger.info("record %d reviews" % len(updates))
+        return len(updates)
+
+    def getDueCards(
+        self, limit: int = 200, until: datetime.datetime = None
+    ) -> List[Tuple[Word, CardState]]:
+        """
+        Get the words to review with their review state in one query, ordered by review date.
+
+        Args:
+            limit (int): The max number of words.
+            until (datetime, optional): Only words due before this time are returned. Defaults to now.
+
+        Returns:
+            list: Pairs of the word and its review state.
+        """
+        self.flush()
+        if until is None:
+            until = datetime.datetime.now()
+        self.cursor.execute(
+            f"""
+            SELECT {WORD_COLUMNS}, words.ease, words.interval, words.stability,
+                words.difficulty, words.last_review_on
+            FROM {WORD_TABLES} WHERE words.next_review_on <= ?
+            ORDER BY words.next_review_on, words.word LIMIT ?
+            """,
+            (toDbTime(until), limit),
+        )
+        cards = []
+        for row in self.cursor.fetchall():
+            word = toWord(row[:9])
+            cards.append(
+                (
+                    word,
+                    self.__toCardState(
+                        word.word, word.review_times, *row[9:], word.next_review_on
+                    ),
+                )
+            )
+        return cards
+
+    def __loadCards(self) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """
+        Load the review state of the whole book as numpy arrays, see `ReviewScheduler`.
+
+        Returns:
+            tuple: The rowid of every word and the arrays of the review state.
+        """
+        self.flush()
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute("""
+                SELECT rowid, review_times, ease, interval, stability, difficulty,
+                    julianday(last_review_on), julianday(next_review_on)
+                FROM words
+                """)
+            # NULL becomes NaN
+            table = np.array(cursor.fetchall(), dtype=np.float64).reshape(-1, 8)
+        finally:
+            cursor.close()
+        cards = {
+            "review_times": np.nan_to_num(table[:, 1]),
+            "ease": np.nan_to_num(table[:, 2], nan=2.5),
+            "interval": np.nan_to_num(table[:, 3]),
+            "stability": np.nan_to_num(table[:, 4]),
+            "difficulty": np.nan_to_num(table[:, 5]),
+            "last_review": table[:, 6],
+            "due": table[:, 7],
+        }
+        return table[:, 0].astype(np.int64), cards
+
+    def rescheduleAll(self, scheduler: ReviewScheduler = None) -> int:
+        """
+        Recompute the next review time of every reviewed word in one vectorized pass.
+
+        Args:
+            scheduler (ReviewScheduler, optional): The scheduler to use. Defaults to the current scheduler.
+
+        Returns:
+            int: The number of words whose review time changed.
+        """
+        scheduler = scheduler or self.scheduler
+        rowids, cards = self.__loadCards()
+        due = scheduler.reschedule(cards)
+        # ignore the rounding error of julianday
+        changed = ~np.isnan(due) & ~np.isclose(due, cards["due"], rtol=0, atol=1e-6)
+        if not changed.any():
+            return 0
+        rows = list(
+            zip(julianDaysToDbTime(due[changed]).tolist(), rowids[changed].tolist())
+        )
+        try:
+            self.cursor.executemany(
+                "UPDATE words SET next_review_on = ? WHERE rowid = ?", rows
+            )
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        # reloaded on next use
+        self.__word_index = None
+        self.word_cache.clear()
+        logger.info("reschedule %d words by %s" % (len(rows), scheduler.name))
+        self.notifyChanges([("reset", [])])
+        return len(rows)
+
+    def forecastWorkload(self, days: int = 365) -> np.ndarray:
+        """
+        Forecast the number of reviews of every day from today, assuming every answer is GOOD.
+
+        Returns:
+            np.ndarray: The number of reviews of the following `days` days, overdue words are counted today.
+        """
+        _, cards = self.__loadCards()
+        today = toJulianDay(
+            datetime.datetime.combine(datetime.date.today(), datetime.time())
+        )
+        if cards["due"].size == 0:
+            return np.zeros(days, dtype=np.int64)
+        cards["due"] = np.nan_to_num(cards["due"], nan=today)
+        return self.scheduler.forecast(cards, today, days)
 
-        review_on = current_time + datetime.timedelta(days=interval)
-        return review_on
+    def onReviewConfigChanged(self):
+        self.scheduler = getSchedulerByCfg()
+        logger.info(
+            "review scheduler changed: %s retention: %s"
+            % (self.scheduler.name, self.scheduler.desired_retention)
+        )
+        try:
+            self.rescheduleAll()
+        except Exception as e:
+            logger.error("reschedule words error: %s" % e)
+            signalBus.error_signal.emit("reschedule words failed: %s" % e)
 
 
 if __name__ == "__main__":
@@ -178,5 +1223,6 @@ if __name__ == "__main__":
         "The world is a beautiful place.",
     )
 
-    for word in db.word_map:
-        print(word, db.word_map[word])
+    words = db.getAllWords()
+    for word in words:
+        print(word, words[word])
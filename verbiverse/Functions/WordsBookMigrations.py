@@ -0,0 +1,219 @@
+import re
+import sqlite3
+from typing import Optional, Tuple
+
+from ModuleLogger import logger
+
+# subtitle start time of pysrt, e.g. 00:01:02,345
+SUBTITLE_TIME = re.compile(r"(\d+):(\d{2}):(\d{2})[,.](\d{3})")
+RESOURCE_SEPARATOR = " -> "
+# resource strings without a document
+NO_RESOURCE = ("", "None")
+
+
+def parseResource(resource: str) -> Tuple[Optional[str], str, Optional[int]]:
+    """
+    Splits a resource string like "book.pdf -> 37" or "video.mp4 -> 00:01:02,345".
+
+    Returns:
+        tuple: The document path (None if no document), the document kind ("pdf", "video" or "text")
+        and the position, a page number or a subtitle time in milliseconds.
+    """
+    resource = (resource or "").strip()
+    if resource in NO_RESOURCE:
+        return None, "text", None
+    path, separator, position = resource.rpartition(RESOURCE_SEPARATOR)
+    if not separator:
+        return resource, "text", None
+    position = position.strip()
+    if position.isdigit():
+        return path, "pdf", int(position)
+    match = SUBTITLE_TIME.fullmatch(position)
+    if match is not None:
+        hours, minutes, seconds, milliseconds = map(int, match.groups())
+        return (
+            path,
+            "video",
+            ((hours * 60 + minutes) * 60 + seconds) * 1000 + milliseconds,
+        )
+    return resource, "text", None
+
+
+def formatResource(path: Optional[str], kind: str, position: Optional[int]) -> str:
+    """
+    The reverse of `parseResource`.
+    """
+    if path is None:
+        return ""
+    if position is None:
+        return path
+    if kind == "video":
+        seconds, milliseconds = divmod(position, 1000)
+        minutes, seconds = divmod(seconds, 60)
+        hours, minutes = divmod(minutes, 60)
+        return f"{path}{RESOURCE_SEPARATOR}{hours:02d}:{minutes:02d}:{seconds:02d},{milliseconds:03d}"
+    return f"{path}{RESOURCE_SEPARATOR}{position}"
+
+
+def __columns(cursor: sqlite3.Cursor, table: str) -> set:
+    cursor.execute(f"PRAGMA table_info({table})")
+    return {row[1] for row in cursor.fetchall()}
+
+
+def __createWords(cursor: sqlite3.Cursor) -> bool:
+    """Version 1: the words table of the first release."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS words (
+            word TEXT PRIMARY KEY,
+            explain TEXT,
+            example TEXT,
+            added_on DATETIME,
+            next_review_on DATETIME,
+            review_times INTEGER DEFAULT 0,
+            resource TEXT
+        );
+        """)
+    # review queue is always read in (next_review_on, word) order
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS words_next_review_idx ON words (next_review_on, word)"
+    )
+    return False
+
+
+def __addReviewState(cursor: sqlite3.Cursor) -> bool:
+    """Version 2: the state of the review scheduler and the review history."""
+    columns = __columns(cursor, "words")
+    for column, definition in (
+        ("ease", "REAL DEFAULT 2.5"),
+        ("interval", "REAL DEFAULT 0"),
+        ("stability", "REAL DEFAULT 0"),
+        ("difficulty", "REAL DEFAULT 0"),
+        ("last_review_on", "DATETIME"),
+    ):
+        if column not in columns:
+            cursor.execute(f"ALTER TABLE words ADD COLUMN {column} {definition}")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS review_log (
+            id INTEGER PRIMARY KEY,
+            word TEXT,
+            reviewed_on DATETIME,
+            grade INTEGER,
+            interval REAL
+        );
+        """)
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS review_log_word_idx ON review_log (word, reviewed_on)"
+    )
+    # the words page is sorted by added time by default
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS words_added_on_idx ON words (added_on, word)"
+    )
+    return False
+
+
+def __addDocuments(cursor: sqlite3.Cursor) -> bool:
+    """Version 3: move the resource strings into the documents table."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS documents (
+            id INTEGER PRIMARY KEY,
+            path TEXT NOT NULL UNIQUE,
+            kind TEXT NOT NULL DEFAULT 'text'
+        );
+        """)
+    columns = __columns(cursor, "words")
+    if "document_id" not in columns:
+        cursor.execute(
+            "ALTER TABLE words ADD COLUMN document_id INTEGER REFERENCES documents (id)"
+        )
+    if "position" not in columns:
+        cursor.execute("ALTER TABLE words ADD COLUMN position INTEGER")
+
+    vacuum = False
+    if "resource" in columns:
+        cursor.execute("SELECT rowid, resource FROM words")
+        rows = cursor.fetchall()
+        document_ids = {}
+        updates = []
+        for rowid, resource in rows:
+            path, kind, position = parseResource(resource)
+            if path is None:
+                continue
+            if path not in document_ids:
+                cursor.execute(
+                    "INSERT OR IGNORE INTO documents (path, kind) VALUES (?, ?)",
+                    (path, kind),
+                )
+                cursor.execute("SELECT id FROM documents WHERE path = ?", (path,))
+                document_ids[path] = cursor.fetchone()[0]
+            updates.append((document_ids[path], position, rowid))
+        cursor.executemany(
+            "UPDATE words SET document_id = ?, position = ? WHERE rowid = ?", updates
+        )
+        logger.info(
+            "move %d resources into %d documents" % (len(updates), len(document_ids))
+        )
+
+        # the old full text index reads the resource column, see `initSearchTable`
+        for trigger in ("words_fts_insert", "words_fts_delete", "words_fts_update"):
+            cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        cursor.execute("DROP TABLE IF EXISTS words_fts")
+        if sqlite3.sqlite_version_info >= (3, 35, 0):
+            cursor.execute("ALTER TABLE words DROP COLUMN resource")
+        else:
+            cursor.execute("UPDATE words SET resource = NULL")
+        vacuum = bool(rows)
+
+    # all words of a document in reading order
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS words_document_idx ON words (document_id, position)"
+    )
+    cursor.execute("""
+        CREATE VIEW IF NOT EXISTS words_search AS
+        SELECT words.rowid AS rowid, words.word AS word, words.explain AS explain,
+            words.example AS example, documents.path AS resource
+        FROM words LEFT JOIN documents ON documents.id = words.document_id
+        """)
+    return vacuum
+
+
+# every migration upgrades the schema by one version and returns True to vacuum the database,
+# they also work on databases created before the version was recorded
+MIGRATIONS = [__createWords, __addReviewState, __addDocuments]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """
+    Upgrades the words book schema to `SCHEMA_VERSION`, the version is kept in PRAGMA user_version.
+
+    Every migration runs in its own transaction.
+
+    Returns:
+        int: The schema version before the upgrade.
+    """
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA user_version")
+    version = cursor.fetchone()[0]
+    if version > SCHEMA_VERSION:
+        raise RuntimeError(
+            f"words book schema version {version} is newer than {SCHEMA_VERSION}"
+        )
+
+    vacuum = False
+    for index in range(version, SCHEMA_VERSION):
+        if conn.in_transaction:
+            conn.commit()
+        try:
+            cursor.execute("BEGIN")
+            vacuum |= MIGRATIONS[index](cursor)
+            cursor.execute(f"PRAGMA user_version = {index + 1}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            logger.error("words book migration to version %d failed" % (index + 1))
+            raise
+        logger.info("words book schema upgraded to version %d" % (index + 1))
+    if vacuum:
+        cursor.execute("VACUUM")
+    cursor.close()
+    return version
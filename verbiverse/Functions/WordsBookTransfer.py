@@ -0,0 +1,206 @@
+import csv
+import json
+import os
+import re
+from typing import Iterable, Iterator
+
+from Functions.SignalBus import signalBus
+from Functions.WordBookDatabase import Word, WordsBookDatabase
+from ModuleLogger import logger
+
+WORDS_BOOK_FORMATS = ("csv", "tsv", "jsonl", "anki")
+WORD_FIELDS = [
+    "word",
+    "explain",
+    "example",
+    "added_on",
+    "next_review_on",
+    "review_times",
+    "resource",
+]
+PROGRESS_STEP = 5000
+
+__HTML_TAG = re.compile(r"<[^>]+>")
+
+
+def guessFormat(path: str) -> str:
+    """
+    Guess the words book file format by the file extension.
+
+    Returns:
+        str: One of `WORDS_BOOK_FORMATS`, plain ".txt" files are treated as Anki notes export.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        return "csv"
+    if ext in (".tsv", ".tab"):
+        return "tsv"
+    if ext in (".jsonl", ".ndjson", ".json"):
+        return "jsonl"
+    if ext == ".txt":
+        return "anki"
+    raise ValueError(f"Not supported words book file: {path}")
+
+
+def __readDelimited(file, delimiter: str) -> Iterator[dict]:
+    reader = csv.reader(file, delimiter=delimiter)
+    fields = WORD_FIELDS
+    for index, row in enumerate(reader):
+        if not row:
+            continue
+        if index == 0 and "word" in [cell.strip().lower() for cell in row]:
+            fields = [cell.strip().lower() for cell in row]
+            continue
+        yield dict(zip(fields, row))
+
+
+def __readJsonLines(file) -> Iterator[dict]:
+    for line in file:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def __readAnki(file) -> Iterator[dict]:
+    """Read Anki "Notes in Plain Text" export: front, back and optional extra fields."""
+    delimiter = "\t"
+    html = False
+    for line in file:
+        line = line.rstrip("\r\n")
+        if line.startswith("#"):
+            key, _, value = line[1:].partition(":")
+            if key == "separator":
+                delimiter = {"tab": "\t", "comma": ",", "semicolon": ";"}.get(
+                    value, value
+                )
+            elif key == "html":
+                html = value == "true"
+            continue
+        if not line:
+            continue
+        row = next(csv.reader([line], delimiter=delimiter))
+        if html:
+            row = [__HTML_TAG.sub(" ", cell).strip() for cell in row]
+        yield dict(zip(["word", "explain", "example"], row))
+
+
+def readWords(path: str, fmt: str = None) -> Iterator[dict]:
+    """
+    Stream words from a CSV/TSV/JSONL/Anki text file.
+
+    Args:
+        path (str): The file to read.
+        fmt (str, optional): One of `WORDS_BOOK_FORMATS`, guessed by the extension when None.
+
+    Yields:
+        dict: A word item which could be passed to `WordsBookDatabase.addWords`.
+    """
+    fmt = fmt or guessFormat(path)
+    with open(path, "r", encoding="utf-8-sig", newline="") as file:
+        if fmt == "csv":
+            yield from __readDelimited(file, ",")
+        elif fmt == "tsv":
+            yield from __readDelimited(file, "\t")
+        elif fmt == "jsonl":
+            yield from __readJsonLines(file)
+        elif fmt == "anki":
+            yield from __readAnki(file)
+        else:
+            raise ValueError(f"Not supported words book format: {fmt}")
+
+
+def writeWords(path: str, words: Iterable[Word], fmt: str = None) -> Iterator[int]:
+    """
+    Stream words to a CSV/TSV/JSONL/Anki text file.
+
+    Yields:
+        int: The number of words written, every `PROGRESS_STEP` words and once at the end.
+    """
+    fmt = fmt or guessFormat(path)
+    if fmt not in WORDS_BOOK_FORMATS:
+        raise ValueError(f"Not supported words book format: {fmt}")
+
+    count = 0
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        writer = None
+        if fmt in ("csv", "tsv"):
+            writer = csv.writer(file, delimiter="," if fmt == "csv" else "\t")
+            writer.writerow(WORD_FIELDS)
+        elif fmt == "anki":
+            file.write("#separator:tab\n#html:false\n")
+            writer = csv.writer(file, delimiter="\t", lineterminator="\n")
+
+        for word in words:
+            values = [
+                "" if getattr(word, field) is None else str(getattr(word, field))
+                for field in WORD_FIELDS
+            ]
+            if fmt == "jsonl":
+                item = dict(zip(WORD_FIELDS, values))
+                item["review_times"] = word.review_times
+                file.write(json.dumps(item, ensure_ascii=False) + "\n")
+            elif fmt == "anki":
+                writer.writerow([word.word, word.explain, word.example])
+            else:
+                writer.writerow(values)
+            count += 1
+            if count % PROGRESS_STEP == 0:
+                yield count
+    yield count
+
+
+def importWordsBook(path: str, fmt: str = None, db: WordsBookDatabase = None) -> int:
+    """
+    Import a words book file into the database in a single transaction.
+
+    Progress is reported through `signalBus.status_signal` and `signalBus.status_progress_signal`.
+
+    Returns:
+        int: The number of imported words.
+    """
+    db = db or WordsBookDatabase()
+    title = "Importing words"
+    signalBus.status_signal.emit(title, os.path.basename(path))
+    try:
+        count = db.addWords(
+            readWords(path, fmt),
+            batch_size=PROGRESS_STEP,
+            progress=lambda count: signalBus.status_progress_signal.emit(
+                title, f"{count} words imported"
+            ),
+        )
+    except Exception as e:
+        logger.error(f"import words book [{path}] error: {e}")
+        signalBus.status_signal.emit(title, "Import failed!!")
+        raise
+    logger.info(f"import {count} words from [{path}]")
+    signalBus.status_signal.emit(title, f"Import finished: {count} words")
+    return count
+
+
+def exportWordsBook(path: str, fmt: str = None, db: WordsBookDatabase = None) -> int:
+    """
+    Export all words of the database to a file without loading them all at once.
+
+    Progress is reported through `signalBus.status_signal` and `signalBus.status_progress_signal`.
+
+    Returns:
+        int: The number of exported words.
+    """
+    db = db or WordsBookDatabase()
+    title = "Exporting words"
+    total = max(db.countWords(), 1)
+    count = 0
+    signalBus.status_signal.emit(title, os.path.basename(path))
+    try:
+        for count in writeWords(path, db.iterWords(PROGRESS_STEP), fmt):
+            signalBus.status_progress_signal.emit(
+                title, f"{count * 100 // total}% ({count} words)"
+            )
+    except Exception as e:
+        logger.error(f"export words book [{path}] error: {e}")
+        signalBus.status_signal.emit(title, "Export failed!!")
+        raise
+    logger.info(f"export {count} words to [{path}]")
+    signalBus.status_signal.emit(title, f"Export finished: {count} words")
+    return count
@@ -0,0 +1,190 @@
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Callable, Iterable, List, Tuple
+
+from Functions.SignalBus import signalBus
+from ModuleLogger import logger
+
+# failed group commits retried before the statements are dropped
+MAX_COMMIT_RETRIES = 3
+
+
+def connectWordsBook(db_path: str) -> sqlite3.Connection:
+    """
+    Opens a connection to the words book in WAL mode, so readers never wait for the writer.
+    """
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class WordsBookWriter(threading.Thread):
+    """
+    Write-behind thread of the words book.
+
+    Statements are queued by `submit` and executed by this thread with its own connection,
+    all statements queued during `interval_ms` are committed in one transaction. Statements
+    submitted with the same key are coalesced, only the last one is executed.
+
+    Every statement could carry a change, a (kind, words) tuple passed to `on_commit` after
+    the transaction is committed. A failed transaction is queued again before the newer
+    statements and retried after `interval_ms`, it is dropped after `MAX_COMMIT_RETRIES`
+    retries and its changes are passed to `on_error`, so the caller could reload its state.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        interval_ms: int = 200,
+        on_commit: Callable[[List[Tuple[str, List[str]]]], None] = None,
+        on_error: Callable[[List[Tuple[str, List[str]]]], None] = None,
+    ):
+        super().__init__(name="WordsBookWriter", daemon=True)
+        self.db_path = db_path
+        self.interval = interval_ms / 1000
+        self.on_commit = on_commit
+        self.on_error = on_error
+        self.retries = 0
+        self.condition = threading.Condition()
+        self.pending = OrderedDict()
+        self.batch_id = 0
+        self.submitted = 0
+        self.committed = 0
+        self.flush_requested = False
+        self.quit = False
+        self.start()
+
+    def submit(self, key, sql: str, params: tuple = (), change: tuple = None) -> None:
+        """
+        Queues a statement, a pending statement with the same key is replaced.
+        """
+        with self.condition:
+            self.submitted += 1
+            self.pending.pop(key, None)
+            self.pending[key] = (sql, params, False, change)
+
+    def submitMany(self, sql: str, rows: Iterable[tuple], change: tuple = None) -> None:
+        """
+        Queues an `executemany` statement which is never coalesced.
+        """
+        with self.condition:
+            self.submitted += 1
+            self.batch_id += 1
+            self.pending[("batch", self.batch_id)] = (sql, list(rows), True, change)
+
+    def submitTransaction(
+        self, statements: Iterable[Tuple[str, list]], change: tuple = None
+    ) -> None:
+        """
+        Queues several `executemany` statements which are always committed together.
+        """
+        statements = list(statements)
+        with self.condition:
+            for index, (sql, rows) in enumerate(statements):
+                last = index == len(statements) - 1
+                self.submitMany(sql, rows, change if last else None)
+
+    def hasPending(self) -> bool:
+        with self.condition:
+            return self.committed < self.submitted
+
+    def flush(self, timeout: float = None) -> bool:
+        """
+        Blocks until every statement submitted before this call is committed, or dropped
+        after its retries.
+
+        Returns:
+            bool: False if the timeout expired before the statements were committed.
+        """
+        with self.condition:
+            target = self.submitted
+            if self.committed >= target:
+                return True
+            self.flush_requested = True
+            self.condition.notify_all()
+            return (
+                self.condition.wait_for(
+                    lambda: self.committed >= target or not self.is_alive(), timeout
+                )
+                and self.committed >= target
+            )
+
+    def close(self) -> None:
+        """
+        Commits all pending statements and stops the thread.
+        """
+        with self.condition:
+            self.quit = True
+            self.condition.notify_all()
+        self.join()
+
+    def run(self):
+        conn = connectWordsBook(self.db_path)
+        logger.info("words book writer started: %s" % self.db_path)
+        try:
+            while True:
+                with self.condition:
+                    self.condition.wait_for(
+                        lambda: self.quit or self.flush_requested, self.interval
+                    )
+                    self.flush_requested = False
+                    pending = self.pending
+                    count = self.submitted
+                    self.pending = OrderedDict()
+                    quit = self.quit
+
+                failed = bool(pending) and not self.__commit(conn, pending)
+                if failed and self.retries < MAX_COMMIT_RETRIES:
+                    self.retries += 1
+                    logger.warning(
+                        "words book group commit retry %d of %d"
+                        % (self.retries, MAX_COMMIT_RETRIES)
+                    )
+                    with self.condition:
+                        # the newer statement of a key replaces the failed one
+                        for key in self.pending:
+                            pending.pop(key, None)
+                        pending.update(self.pending)
+                        self.pending = pending
+                    continue
+                if failed:
+                    self.__drop(pending)
+                self.retries = 0
+
+                with self.condition:
+                    self.committed = count
+                    self.condition.notify_all()
+                if quit:
+                    break
+        finally:
+            conn.close()
+
+    def __commit(self, conn: sqlite3.Connection, pending: OrderedDict) -> bool:
+        """
+        Returns:
+            bool: Whether the transaction is committed, it is rolled back otherwise.
+        """
+        try:
+            with conn:
+                for sql, params, many, _ in pending.values():
+                    if many:
+                        conn.executemany(sql, params)
+                    else:
+                        conn.execute(sql, params)
+        except Exception as e:
+            logger.error("words book group commit failed: %s" % e)
+            return False
+        logger.debug("words book group commit: %d statements" % len(pending))
+        if self.on_commit is not None:
+            changes = [item[3] for item in pending.values() if item[3] is not None]
+            if changes:
+                self.on_commit(changes)
+        return True
+
+    def __drop(self, pending: OrderedDict):
+        logger.error("words book group commit dropped: %d statements" % len(pending))
+        signalBus.error_signal.emit("save words failed, %d changes lost" % len(pending))
+        if self.on_error is not None:
+            self.on_error([item[3] for item in pending.values() if item[3] is not None])
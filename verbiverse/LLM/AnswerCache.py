@@ -0,0 +1,164 @@
+import json
+import sqlite3
+import threading
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+from ModuleLogger import logger
+
+ANSWER_CACHE_NAME = "answer_cache.db"
+# rows kept in each table, the least recently used are removed over it
+ANSWER_CACHE_MAX_ROWS = 2000
+
+
+class AnswerCache:
+    """
+    Cache of the chat about one document, it lives in the folder of the document store so it
+    is removed with the store.
+
+    `retrievals` maps a standalone question and the search parameters to the ids of the
+    retrieved chunks, `answers` maps the chat model, the question and the chunk ids to the
+    answer. A question missing in `retrievals` could match a cached question whose vector is
+    similar enough, the answer of the cached question is used then.
+    """
+
+    def __init__(self, db_path: str, max_rows: int = ANSWER_CACHE_MAX_ROWS):
+        self.db_path = db_path
+        self.max_rows = max_rows
+        self.lock = threading.Lock()
+        # used by the chat threads, every access holds the lock
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS retrievals (
+                context TEXT NOT NULL,
+                question TEXT NOT NULL,
+                vector BLOB,
+                chunk_ids TEXT NOT NULL,
+                used_on REAL NOT NULL,
+                PRIMARY KEY (context, question)
+            );
+            CREATE TABLE IF NOT EXISTS answers (
+                model TEXT NOT NULL,
+                question TEXT NOT NULL,
+                chunk_ids TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                used_on REAL NOT NULL,
+                PRIMARY KEY (model, question, chunk_ids)
+            );
+            """)
+        self.conn.commit()
+
+    def getRetrieval(
+        self,
+        context: str,
+        question: str,
+        vector: List[float] = None,
+        threshold: float = 1.0,
+    ) -> Optional[Tuple[str, List[int]]]:
+        """
+        Args:
+            context (str): The search parameters, see `HybridRetriever.cacheKey`.
+            question (str): The standalone question.
+            vector (List[float], optional): The embedding of the question for the similar lookup.
+            threshold (float): The min cosine similarity of a similar question.
+
+        Returns:
+            tuple: The cached question and its chunk ids, None if no question matches.
+        """
+        with self.lock, self.conn:
+            row = self.conn.execute(
+                "SELECT chunk_ids FROM retrievals WHERE context = ? AND question = ?",
+                (context, question),
+            ).fetchone()
+            if row is None and vector is not None and threshold < 1.0:
+                row = self.__similarRetrieval(context, vector, threshold)
+                if row is not None:
+                    question, row = row[0], row[1:]
+            if row is None:
+                return None
+            self.conn.execute(
+                "UPDATE retrievals SET used_on = ? WHERE context = ? AND question = ?",
+                (time.time(), context, question),
+            )
+        return question, json.loads(row[0])
+
+    def __similarRetrieval(
+        self, context: str, vector: List[float], threshold: float
+    ) -> Optional[tuple]:
+        rows = self.conn.execute(
+            "SELECT question, chunk_ids, vector FROM retrievals WHERE context = ? AND vector IS NOT NULL",
+            (context,),
+        ).fetchall()
+        if not rows:
+            return None
+        query = np.asarray(vector, dtype=np.float32)
+        vectors = np.stack([np.frombuffer(row[2], dtype=np.float32) for row in rows])
+        similarities = (vectors @ query) / np.maximum(
+            np.linalg.norm(vectors, axis=1) * np.linalg.norm(query), 1e-12
+        )
+        best = int(np.argmax(similarities))
+        if similarities[best] < threshold:
+            return None
+        logger.info(
+            f"similar cached question ({similarities[best]:.3f}): {rows[best][0]}"
+        )
+        return rows[best][0], rows[best][1]
+
+    def putRetrieval(
+        self,
+        context: str,
+        question: str,
+        chunk_ids: List[int],
+        vector: List[float] = None,
+    ) -> None:
+        blob = None if vector is None else np.asarray(vector, np.float32).tobytes()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO retrievals (context, question, vector, chunk_ids, used_on) VALUES (?, ?, ?, ?, ?)",
+                (context, question, blob, json.dumps(chunk_ids), time.time()),
+            )
+            self.__trim("retrievals")
+
+    def getAnswer(
+        self, model: str, question: str, chunk_ids: List[int]
+    ) -> Optional[str]:
+        key = (model, question, json.dumps(chunk_ids))
+        with self.lock, self.conn:
+            row = self.conn.execute(
+                "SELECT answer FROM answers WHERE model = ? AND question = ? AND chunk_ids = ?",
+                key,
+            ).fetchone()
+            if row is None:
+                return None
+            self.conn.execute(
+                "UPDATE answers SET used_on = ? WHERE model = ? AND question = ? AND chunk_ids = ?",
+                (time.time(), *key),
+            )
+        return row[0]
+
+    def putAnswer(
+        self, model: str, question: str, chunk_ids: List[int], answer: str
+    ) -> None:
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO answers (model, question, chunk_ids, answer, used_on) VALUES (?, ?, ?, ?, ?)",
+                (model, question, json.dumps(chunk_ids), answer, time.time()),
+            )
+            self.__trim("answers")
+
+    def __trim(self, table: str) -> None:
+        self.conn.execute(
+            f"""
+            DELETE FROM {table} WHERE rowid IN (
+                SELECT rowid FROM {table} ORDER BY used_on DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_rows,),
+        )
+
+    def close(self) -> None:
+        with self.lock:
+            self.conn.close()
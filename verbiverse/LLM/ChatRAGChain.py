@@ -1,72 +1,214 @@
+import asyncio
 import hashlib
+import json
 import os
-import asyncio
+from typing import Iterator, List, Tuple
 
+from AnswerCache import ANSWER_CACHE_NAME, AnswerCache
+from EmbeddingStore import EmbeddingStore
 from Functions.Config import cfg
 from Functions.LoadPdfText import PdfReader
 from Functions.SignalBus import signalBus
-from langchain.chains import create_history_aware_retriever, create_retrieval_chain
+from IncrementalIndexer import IncrementalIndexer
 from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain_chroma import Chroma
 from langchain_community.chat_message_histories import ChatMessageHistory
 from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.runnables import RunnablePassthrough
-from langchain_core.runnables.history import RunnableWithMessageHistory
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from LexicalIndex import LEXICAL_ONLY_EMBEDDING, HybridRetriever, openLexicalIndex
 from LLMServerInfo import (
     getChatModelByCfg,
     getEmbedModelByCfg,
     getTargetLanguage,
+    hasEmbedModel,
 )
 from ModuleLogger import logger
+from StoreManager import storeManager
 
 
-def loadDatabase(database_path, pdf_reader, embed):
-    if not os.path.exists(database_path):
-        logger.info(f"create embed db [{database_path}]")
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000, chunk_overlap=200
-        )
-        splits = text_splitter.split_documents(pdf_reader.pages)
-        return Chroma.from_documents(
-            documents=splits,
-            embedding=embed,
-            persist_directory=database_path,
-        )
-    else:
-        logger.info(f"load embed db [{database_path}]")
-        return Chroma(persist_directory=database_path, embedding_function=embed)
+def embeddingProgress(done: int, total: int):
+    signalBus.status_progress_signal.emit(
+        "Embedding PDF", f"{done * 100 // max(total, 1)}% ({done}/{total} chunks)"
+    )
 
 
 class ChatRAGChain:
-    def __init__(self, pdf_reader: PdfReader):
-        logger.info(f"database path {cfg.get(cfg.database_folder)}")
-        filename_md5 = (
-            str(hashlib.md5(pdf_reader.pdf_path.encode("utf-8")).hexdigest()) + "_db"
-        )
-        logger.info(f"pdf database name: [{pdf_reader.pdf_path}] -> [{filename_md5}]")
-        self.database_path = cfg.get(cfg.database_folder) + "/" + filename_md5
+    RETRIEVER_CONFIG_ITEMS = (
+        cfg.chat_page_window,
+        cfg.chat_page_decay,
+        cfg.chat_read_pages_only,
+    )
 
+    def __init__(self, pdf_reader: PdfReader, page: int = 1):
+        """
+        Args:
+            pdf_reader (PdfReader): The loaded PDF.
+            page (int): The reading page, 1 based like the PDF viewer. Its pages are indexed first.
+        """
+        logger.info(f"database path {cfg.get(cfg.database_folder)}")
         self.pdf_reader = pdf_reader
+        self.page = page
+        self.indexer: IncrementalIndexer = None
+        # the status stays open while the PDF is indexed in the background
+        self.indexing_status = False
+        self.db = None
+        self.retriever: HybridRetriever = None
+        self.store_path: str = None
+        self.answer_cache: AnswerCache = None
+        self.question_answer_chain = None
         self.stored_messages = {}
-        signalBus.llm_config_change_signal.connect(self.createChatChain)
+        signalBus.llm_config_change_signal.connect(self.onLLMConfigChanged)
+        signalBus.update_file_schedule_signal.connect(self.updateReadingPage)
+        for item in self.RETRIEVER_CONFIG_ITEMS:
+            item.valueChanged.connect(self.updateRetrieverConfig)
+
+    def updateReadingPage(self, file_path: str, page: int):
+        if file_path != self.pdf_reader.pdf_path:
+            return
+        self.page = page
+        if self.indexer is not None:
+            self.indexer.setPage(page - 1)
+        if self.retriever is not None:
+            self.retriever.page = page - 1
 
-    async def embedding(self):
-        self.embed = getEmbedModelByCfg()
-        return await asyncio.to_thread(
-            loadDatabase, self.database_path, self.pdf_reader, self.embed
+    def updateRetrieverConfig(self, _=None):
+        if self.retriever is None:
+            return
+        self.retriever.page_window = cfg.get(cfg.chat_page_window)
+        self.retriever.page_decay = cfg.get(cfg.chat_page_decay) / 100
+        self.retriever.read_pages_only = cfg.get(cfg.chat_read_pages_only)
+
+    async def embedding(self) -> HybridRetriever:
+        """
+        Loads the search indexes of the PDF. A new vector store is indexed from the reading page,
+        it is searched after the first pages are indexed while the rest is indexed in the background.
+        Without embedding model, only the BM25 index is built.
+        """
+        self.stopIndexing()
+        self.closeVectorStore()
+        self.closeAnswerCache()
+        self.embed = getEmbedModelByCfg() if hasEmbedModel() else None
+        store = await asyncio.to_thread(
+            EmbeddingStore,
+            self.pdf_reader.pdf_path,
+            embedding=None if self.embed is not None else LEXICAL_ONLY_EMBEDDING,
         )
+        self.useStore(store.path)
+        splits = store.split(self.pdf_reader.pages)
+        if self.embed is None:
+            logger.info("no embedding model, chat with the lexical index only")
+        elif store.exists():
+            self.db = await asyncio.to_thread(store.load, self.embed)
+        else:
+            self.indexer = IncrementalIndexer(
+                store, splits, self.embed, self.page - 1, progress=embeddingProgress
+            )
+            self.db = await self.indexer.start()
+        # built after the vector store, which removes the files of an unfinished store
+        index = await asyncio.to_thread(openLexicalIndex, store.path, splits)
+        if self.embed is None:
+            # the manifest accounts the lexical store in the store manager
+            if store.exists():
+                await asyncio.to_thread(store.touch)
+            else:
+                await asyncio.to_thread(store.finish, len(splits))
+        await asyncio.to_thread(storeManager.collect)
+        self.answer_cache = await asyncio.to_thread(
+            AnswerCache, os.path.join(store.path, ANSWER_CACHE_NAME)
+        )
+        self.retriever = HybridRetriever(
+            splits=splits, index=index, vector_store=self.db, k=2, page=self.page - 1
+        )
+        self.updateRetrieverConfig()
+        return self.retriever
+
+    def closeVectorStore(self):
+        # the numpy stores hold a SQLite connection and memory maps, Chroma has no close
+        if self.db is not None and hasattr(self.db, "close"):
+            self.db.close()
+        self.db = None
+
+    def closeAnswerCache(self):
+        if self.answer_cache is not None:
+            self.answer_cache.close()
+            self.answer_cache = None
+
+    def useStore(self, path: str = None):
+        """
+        Keeps the store of the chat from being removed by the store manager, None releases it.
+        """
+        if self.store_path is not None:
+            storeManager.release(self.store_path)
+        self.store_path = path
+        if path is not None:
+            storeManager.acquire(path)
+
+    def stopIndexing(self):
+        """
+        Stops indexing the PDF in the background. The status opened by `createChatChain` is
+        closed here, the done callback of a cancelled indexing does not emit any status.
+        """
+        if self.indexing_status:
+            self.indexing_status = False
+            signalBus.status_signal.emit("Embedding PDF", "Embedding stopped!!")
+        if self.indexer is not None:
+            self.indexer.stop()
+            # the vector store is closed next, the running round is saved before
+            self.indexer.join()
+            self.indexer = None
+
+    def indexingFinished(self, task: asyncio.Task):
+        if task.cancelled():
+            # stopped by `stopIndexing`, which closed the status
+            return
+        self.indexing_status = False
+        if task.exception() is not None:
+            logger.error("embedding pdf error: %s", task.exception())
+            signalBus.status_signal.emit("Embedding PDF", "Embedding failed!!")
+        else:
+            signalBus.status_signal.emit("Embedding PDF", "Embedding finished!!")
+            # the finished store could exceed the budget
+            asyncio.ensure_future(asyncio.to_thread(storeManager.collect))
+
+    def close(self):
+        """
+        Stops indexing the PDF, the chain is not used anymore.
+        """
+        signalBus.llm_config_change_signal.disconnect(self.onLLMConfigChanged)
+        signalBus.update_file_schedule_signal.disconnect(self.updateReadingPage)
+        for item in self.RETRIEVER_CONFIG_ITEMS:
+            item.valueChanged.disconnect(self.updateRetrieverConfig)
+        self.stopIndexing()
+        self.closeVectorStore()
+        self.closeAnswerCache()
+        self.useStore(None)
+
+    def onLLMConfigChanged(self):
+        # a coroutine connected to the signal would never be awaited
+        asyncio.ensure_future(self.createChatChain())
 
     async def createChatChain(self) -> None:
+        # the status of the previous indexing is closed before this one is opened
+        self.stopIndexing()
         signalBus.status_signal.emit("Embedding PDF", "Please wait!!")
-        self.db = await self.embedding()
-        if self.db is None:
+        try:
+            retriever = await self.embedding()
+        except Exception as e:
+            logger.error("embedding pdf error: %s", e)
+            retriever = None
+        if retriever is None:
             signalBus.status_signal.emit("Embedding PDF", "Embedding failed!!")
             return
-        else:
+        elif self.indexer is None or self.indexer.finished():
             signalBus.status_signal.emit("Embedding PDF", "Embedding finished!!")
-        self.rag_chain = None
+        else:
+            # the status is closed when the whole PDF is indexed
+            signalBus.info_signal.emit(
+                "Chat is ready, the rest of the PDF is indexed in the background"
+            )
+            self.indexing_status = True
+            self.indexer.task.add_done_callback(self.indexingFinished)
+        self.question_answer_chain = None
         try:
             self.chat = getChatModelByCfg()
         except Exception as e:
@@ -89,48 +231,39 @@ class ChatRAGChain:
                 ("human", "{input}"),
             ]
         )
+        self.contextualize_chain = (
+            contextualize_q_prompt | self.chat | StrOutputParser()
+        )
 
-        retriever = self.db.as_retriever(search_kwargs={"k": 2})
-        history_aware_retriever = create_history_aware_retriever(
-            self.chat, retriever, contextualize_q_prompt
+        answer_system_prompt = (
+            "You are an assistant for question-answering tasks. "
+            "Use the following pieces of retrieved context to answer "
+            "the question. If you don't know the answer, say that you "
+            "don't know. Use three sentences maximum and keep the "
+            "answer concise."
         )
         self.prompt = ChatPromptTemplate.from_messages(
             [
-                (
-                    "system",
-                    "You are an assistant for question-answering tasks. "
-                    "Use the following pieces of retrieved context to answer "
-                    "the question. If you don't know the answer, say that you "
-                    "don't know. Use three sentences maximum and keep the "
-                    "answer concise."
-                    "\n\n"
-                    "{context}",
-                ),
+                ("system", answer_system_prompt + "\n\n{context}"),
                 MessagesPlaceholder(variable_name="chat_history"),
                 ("human", "{input}"),
             ]
         )
-
-        question_answer_chain = create_stuff_documents_chain(self.chat, self.prompt)
-
-        self.rag_chain = create_retrieval_chain(
-            history_aware_retriever, question_answer_chain
+        # cached answers are only reused with the same model and prompt
+        self.model_key = json.dumps(
+            {
+                "provider": cfg.get(cfg.provider),
+                "model": cfg.get(cfg.model_name),
+                "prompt": hashlib.sha256(answer_system_prompt.encode()).hexdigest(),
+            },
+            sort_keys=True,
         )
 
-        self.demo_ephemeral_chat_history_for_chain = ChatMessageHistory()
-
-        self.chain_with_message_history = RunnableWithMessageHistory(
-            self.rag_chain,
-            lambda session_id: self.demo_ephemeral_chat_history_for_chain,
-            input_messages_key="input",
-            history_messages_key="chat_history",
-            output_messages_key="answer",
+        self.question_answer_chain = create_stuff_documents_chain(
+            self.chat, self.prompt
         )
 
-        self.chain_with_trimming = (
-            RunnablePassthrough.assign(messages_trimmed=self.trim_messages)
-            | self.chain_with_message_history
-        )
+        self.demo_ephemeral_chat_history_for_chain = ChatMessageHistory()
 
     def get_session_history(self, session_id: str) -> BaseChatMessageHistory:
         if session_id not in self.stored_messages:
@@ -148,24 +281,77 @@ class ChatRAGChain:
 
         return True
 
+    def retrieve(self, question: str) -> Tuple[str, List[int]]:
+        """
+        Retrieves the chunks of the standalone question, a cached retrieval of the same or a
+        similar question is reused.
+
+        Returns:
+            tuple: The question of the retrieval, the cached one if reused, and the chunk ids.
+        """
+        # the results change while the store is being built
+        cacheable = self.answer_cache is not None and (
+            self.indexer is None or self.indexer.finished()
+        )
+        if not cacheable:
+            return question, self.retriever.retrieveIds(question)
+
+        context = self.retriever.cacheKey()
+        threshold = cfg.get(cfg.chat_cache_similarity) / 100
+        vector = None
+        if self.db is not None and threshold < 1.0:
+            # embedded by the vector search anyway, the second time is an embedding cache hit
+            vector = self.embed.embed_query(question)
+        cached = self.answer_cache.getRetrieval(context, question, vector, threshold)
+        if cached is not None:
+            logger.info(f"retrieval cache hit: {cached[0]} -> {cached[1]}")
+            return cached
+        chunk_ids = self.retriever.retrieveIds(question)
+        self.answer_cache.putRetrieval(context, question, chunk_ids, vector)
+        return question, chunk_ids
+
+    def streamAnswer(self, message: str) -> Iterator[dict]:
+        history = self.demo_ephemeral_chat_history_for_chain
+        self.trim_messages(None)
+        question = message
+        if history.messages:
+            question = self.contextualize_chain.invoke(
+                {"input": message, "chat_history": history.messages}
+            )
+        question, chunk_ids = self.retrieve(question)
+        use_cache = self.answer_cache is not None and cfg.get(cfg.chat_answer_cache)
+
+        answer = None
+        if use_cache:
+            answer = self.answer_cache.getAnswer(self.model_key, question, chunk_ids)
+        if answer is not None:
+            logger.info(f"answer cache hit: {question}")
+            yield {"answer": answer}
+        else:
+            parts = []
+            for chunk in self.question_answer_chain.stream(
+                {
+                    "input": message,
+                    "chat_history": history.messages,
+                    "context": [self.retriever.splits[i] for i in chunk_ids],
+                }
+            ):
+                parts.append(chunk)
+                yield {"answer": chunk}
+            answer = "".join(parts)
+            if use_cache:
+                self.answer_cache.putAnswer(self.model_key, question, chunk_ids, answer)
+        history.add_user_message(message)
+        history.add_ai_message(answer)
+
     def invoke(self, message):
-        if self.chain_with_trimming is None:
+        if self.question_answer_chain is None:
             logger.warn("chat chain is not ready")
             return None
-        msg = {"input": message}
-        return self.chain_with_trimming.invoke(
-            msg,
-            {"configurable": {"session_id": "unused"}},
-        ).content
+        return "".join(chunk["answer"] for chunk in self.streamAnswer(message))
 
     def stream(self, message):
-        if self.chain_with_message_history is None:
+        if self.question_answer_chain is None:
             logger.warn("chat chain is not ready")
             return None
-
-        msg = {"input": message, "language": self.language}
-        print(msg)
-        return self.chain_with_message_history.stream(
-            msg,
-            {"configurable": {"session_id": "unused"}},
-        )
+        return self.streamAnswer(message)
@@ -1,8 +1,7 @@
 from Functions.SignalBus import signalBus
-from langchain_core.prompts import PromptTemplate
 from LLMServerInfo import (
     getChatModelByCfg,
-    getCheckPrompt,
+    getCheckPromptTemplate,
     getMotherTongue,
     getTargetLanguage,
 )
@@ -28,7 +27,7 @@ class ChatLLMWithCustomHistory:
 
     def createChain(self):
         """
-        A function that creates a chain by initializing various attributes such as 
+        A function that creates a chain by initializing various attributes such as
         chat, target_language, answer_language, content, prompt, chain, and chat_history_for_chain.
         """
         try:
@@ -40,9 +39,10 @@ class ChatLLMWithCustomHistory:
         self.target_language = getTargetLanguage()
         self.answer_language = getMotherTongue()
 
-        self.content = getCheckPrompt()
+        check_prompt = getCheckPromptTemplate()
+        self.content = check_prompt.template.template
 
-        self.prompt = PromptTemplate.from_template(self.content)
+        self.prompt = check_prompt.template
 
         self.chain = self.prompt | self.chat
         self.chat_history_for_chain = None
@@ -0,0 +1,159 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import Dict, List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from ModuleLogger import logger
+
+EMBEDDING_CACHE_NAME = "embedding_cache.db"
+# max number of host parameters of one SQLite statement is 999 before 3.32
+CACHE_QUERY_CHUNK = 500
+
+
+def textDigest(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """
+    On-disk cache of embedding vectors keyed by (provider, model, kind, sha256 of the text).
+
+    Vectors are stored as float32 blobs, the kind separates document and query embeddings
+    because some providers embed them differently. One cache file is shared by all documents.
+    """
+
+    def __init__(self, db_path: str):
+        folder = os.path.dirname(db_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        # used by the embedding threads, every access holds the lock
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                provider TEXT NOT NULL,
+                model TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                hash BLOB NOT NULL,
+                vector BLOB NOT NULL,
+                PRIMARY KEY (provider, model, kind, hash)
+            ) WITHOUT ROWID
+            """)
+        self.conn.commit()
+
+    def get(
+        self, provider: str, model: str, kind: str, digests: List[bytes]
+    ) -> Dict[bytes, np.ndarray]:
+        """
+        Returns:
+            dict: The cached vectors of the digests, missing digests are not in the dict.
+        """
+        vectors = {}
+        with self.lock:
+            for start in range(0, len(digests), CACHE_QUERY_CHUNK):
+                chunk = digests[start : start + CACHE_QUERY_CHUNK]
+                rows = self.conn.execute(
+                    f"""
+                    SELECT hash, vector FROM embeddings
+                    WHERE provider = ? AND model = ? AND kind = ?
+                    AND hash IN ({", ".join("?" * len(chunk))})
+                    """,
+                    (provider, model, kind, *chunk),
+                ).fetchall()
+                for digest, vector in rows:
+                    vectors[digest] = np.frombuffer(vector, dtype=np.float32)
+        return vectors
+
+    def put(
+        self, provider: str, model: str, kind: str, vectors: Dict[bytes, np.ndarray]
+    ) -> None:
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (provider, model, kind, hash, vector) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (provider, model, kind, digest, vector.astype(np.float32).tobytes())
+                    for digest, vector in vectors.items()
+                ],
+            )
+
+    def close(self) -> None:
+        with self.lock:
+            self.conn.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings in front of a remote embedding model, only the texts missing in the cache are sent.
+
+    The vectors are returned as float32 values whether they come from the cache or the model,
+    so a document gets the same vectors every time it is embedded.
+    """
+
+    def __init__(
+        self, embed: Embeddings, provider: str, model: str, cache: EmbeddingCache
+    ):
+        self.embed = embed
+        self.provider = provider
+        self.model = model
+        self.cache = cache
+        self.hits = 0
+        self.misses = 0
+
+    def hitRate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __embed(self, texts: List[str], kind: str) -> List[List[float]]:
+        digests = [textDigest(text) for text in texts]
+        vectors = self.cache.get(self.provider, self.model, kind, list(set(digests)))
+        missing = {}
+        for digest, text in zip(digests, texts):
+            if digest not in vectors:
+                missing.setdefault(digest, text)
+
+        if missing:
+            if kind == "query":
+                embedded = [self.embed.embed_query(text) for text in missing.values()]
+            else:
+                embedded = self.embed.embed_documents(list(missing.values()))
+            new_vectors = {
+                digest: np.asarray(vector, dtype=np.float32)
+                for digest, vector in zip(missing.keys(), embedded)
+            }
+            self.cache.put(self.provider, self.model, kind, new_vectors)
+            vectors.update(new_vectors)
+
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        logger.info(
+            "embedding cache %s: %d of %d texts cached, hit rate %.1f%%"
+            % (kind, len(texts) - len(missing), len(texts), self.hitRate() * 100)
+        )
+        return [vectors[digest].tolist() for digest in digests]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.__embed(texts, "document")
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.__embed([text], "query")[0]
+
+
+__caches: Dict[str, EmbeddingCache] = {}
+__caches_lock = threading.Lock()
+
+
+def getEmbeddingCache(database_folder: str) -> EmbeddingCache:
+    """
+    The shared cache of the database folder, the connection is opened once.
+    """
+    db_path = os.path.join(database_folder, EMBEDDING_CACHE_NAME)
+    with __caches_lock:
+        if db_path not in __caches:
+            __caches[db_path] = EmbeddingCache(db_path)
+        return __caches[db_path]
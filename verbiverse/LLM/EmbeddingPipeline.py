@@ -0,0 +1,198 @@
+import asyncio
+import random
+import time
+from typing import Callable, Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+from ModuleLogger import logger
+
+EMBED_BATCH_SIZE = 32
+EMBED_MAX_RETRIES = 6
+
+
+def isRateLimitError(error: Exception) -> bool:
+    """
+    Whether the error is a rate limit of the provider, OpenAI raises RateLimitError with
+    status 429 and DashScope reports the status code or "Throttling" in the message.
+    """
+    response = getattr(error, "response", None)
+    for status in (
+        getattr(error, "status_code", None),
+        getattr(response, "status_code", None),
+    ):
+        if status == 429:
+            return True
+    message = str(error).lower()
+    return "429" in message or "rate limit" in message or "throttl" in message
+
+
+def getRetryAfter(error: Exception) -> Optional[float]:
+    """The seconds to wait from the Retry-After header of the error response, if any."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveLimiter:
+    """
+    Limits the number of concurrent requests with additive increase, multiplicative decrease.
+
+    The limit grows by one after `limit` successful requests in a row, it is halved and all
+    requests wait an exponential backoff after a failed or rate limited request. Requests
+    slower than `slow_seconds` halve the limit without backoff.
+    """
+
+    def __init__(
+        self,
+        initial: int = 4,
+        minimum: int = 1,
+        maximum: int = 8,
+        slow_seconds: float = 20.0,
+        base_backoff: float = 1.0,
+        max_backoff: float = 60.0,
+    ):
+        self.limit = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.slow_seconds = slow_seconds
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.active = 0
+        self.successes = 0
+        self.failures = 0
+        self.resume_at = 0.0
+        self.condition = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.active < self.limit)
+            self.active += 1
+        delay = self.resume_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def release(
+        self, latency: float, failed: bool = False, retry_after: float = None
+    ) -> None:
+        async with self.condition:
+            self.active -= 1
+            if failed:
+                self.limit = max(self.minimum, self.limit // 2)
+                backoff = min(self.max_backoff, self.base_backoff * 2**self.failures)
+                backoff = max(backoff, retry_after or 0) * random.uniform(1.0, 1.5)
+                self.resume_at = max(self.resume_at, time.monotonic() + backoff)
+                self.failures += 1
+                self.successes = 0
+            elif latency > self.slow_seconds:
+                self.limit = max(self.minimum, self.limit // 2)
+                self.successes = 0
+            else:
+                self.failures = 0
+                self.successes += 1
+                if self.successes >= self.limit:
+                    self.limit = min(self.maximum, self.limit + 1)
+                    self.successes = 0
+            self.condition.notify_all()
+
+
+async def embedDocuments(
+    texts: List[str],
+    embed: Embeddings,
+    batch_size: int = EMBED_BATCH_SIZE,
+    limiter: AdaptiveLimiter = None,
+    progress: Callable[[int, int], None] = None,
+    max_retries: int = EMBED_MAX_RETRIES,
+) -> List[List[float]]:
+    """
+    Embeds the texts in batches running concurrently on the event loop.
+
+    Every batch is embedded in a worker thread, the number of batches in flight follows the
+    `limiter`. A failed batch is retried after a backoff up to `max_retries` times.
+
+    Args:
+        texts (List[str]): The texts to embed.
+        embed (Embeddings): The embedding model.
+        batch_size (int): The number of texts of one request.
+        limiter (AdaptiveLimiter, optional): The concurrency limiter. Defaults to a new one.
+        progress (Callable[[int, int], None], optional): Called with the number of embedded
+            texts and the total after every batch.
+        max_retries (int): The max number of retries of one batch.
+
+    Returns:
+        List[List[float]]: The vectors in the order of the texts.
+
+    Raises:
+        Exception: The error of a batch which failed after all retries.
+    """
+    limiter = limiter or AdaptiveLimiter()
+    batches = [texts[i : i + batch_size] for i in range(0, len(texts), batch_size)]
+    results: List[Optional[List[List[float]]]] = [None] * len(batches)
+    done = 0
+
+    async def embedBatch(index: int):
+        nonlocal done
+        for attempt in range(max_retries + 1):
+            await limiter.acquire()
+            start = time.monotonic()
+            try:
+                vectors = await asyncio.to_thread(embed.embed_documents, batches[index])
+            except Exception as e:
+                await limiter.release(
+                    time.monotonic() - start, failed=True, retry_after=getRetryAfter(e)
+                )
+                if attempt == max_retries:
+                    raise
+                logger.warning(
+                    "embed batch %d failed (%s), retry %d, concurrency %d: %s"
+                    % (
+                        index,
+                        "rate limited" if isRateLimitError(e) else "error",
+                        attempt + 1,
+                        limiter.limit,
+                        e,
+                    )
+                )
+                continue
+            await limiter.release(time.monotonic() - start)
+            results[index] = vectors
+            done += len(batches[index])
+            if progress is not None:
+                progress(done, len(texts))
+            return
+
+    tasks = [asyncio.ensure_future(embedBatch(index)) for index in range(len(batches))]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+    logger.info(
+        "embedded %d texts in %d batches, concurrency %d"
+        % (len(texts), len(batches), limiter.limit)
+    )
+    return [vector for batch in results for vector in batch]
+
+
+class PrecomputedEmbeddings(Embeddings):
+    """
+    Returns the vectors embedded by `embedDocuments`, texts not embedded before and queries
+    are passed to the embedding model.
+    """
+
+    def __init__(self, vectors: Dict[str, List[float]], embed: Embeddings):
+        self.vectors = vectors
+        self.embed = embed
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        missing = [text for text in texts if text not in self.vectors]
+        if missing:
+            self.vectors.update(zip(missing, self.embed.embed_documents(missing)))
+        return [self.vectors[text] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed.embed_query(text)
@@ -0,0 +1,284 @@
+import datetime
+import hashlib
+import json
+import os
+import shutil
+from typing import Iterable, List, Optional, Set, Tuple
+
+from Functions.Config import cfg
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from ModuleLogger import logger
+from NumpyVectorStore import NumpyVectorStore
+from qfluentwidgets import qconfig
+
+# bump it when the layout of the stores changes, all stores are built again
+STORE_FORMAT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+# ids of the chunks saved in an unfinished store, one line per checkpoint
+JOURNAL_NAME = "journal.txt"
+STATUS_BUILDING = "building"
+STATUS_READY = "ready"
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+# the vector store of the chunks, "float16" and "int8" are `NumpyVectorStore` matrices
+VECTOR_STORE_CHROMA = "chroma"
+
+
+def fileDigest(path: str, block_size: int = 1 << 20) -> str:
+    """
+    Computes the sha256 of the file content, the name and location of the file are ignored.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def getSplitterParams() -> dict:
+    return {
+        "splitter": RecursiveCharacterTextSplitter.__name__,
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+    }
+
+
+def getEmbeddingIdentity() -> dict:
+    """
+    The embedding provider and model of the configuration, vectors of different models are not comparable.
+    """
+    return {
+        "provider": qconfig.get(cfg.provider),
+        "model": qconfig.get(cfg.embed_model_name),
+    }
+
+
+def storeKey(
+    content_digest: str,
+    splitter: dict,
+    embedding: dict,
+    backend: str = VECTOR_STORE_CHROMA,
+) -> str:
+    """
+    The name of the store of a document, it changes with anything the vectors depend on.
+    """
+    identity = {
+        "format": STORE_FORMAT_VERSION,
+        "content": content_digest,
+        "splitter": splitter,
+        "embedding": embedding,
+    }
+    # Chroma stores keep the keys they had before the backend was configurable
+    if backend != VECTOR_STORE_CHROMA:
+        identity["backend"] = backend
+    identity = json.dumps(identity, sort_keys=True)
+    return hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """
+    A vector store of one document, addressed by the content of the document.
+
+    The store lives in `database_folder/<key>` with a `manifest.json` describing the source
+    file, the splitter, the embedding model and the vector store backend. The status of the
+    manifest is "building" until every chunk is saved, the ids of the saved chunks are appended
+    to `journal.txt` so an interrupted build resumes from the last checkpoint. Only "ready"
+    stores are loaded.
+    """
+
+    def __init__(
+        self,
+        source_path: str,
+        database_folder: str = None,
+        embedding: dict = None,
+        content_digest: str = None,
+        backend: str = None,
+    ):
+        """
+        Args:
+            source_path (str): The path of the document.
+            database_folder (str, optional): The folder of all stores. Defaults to the configuration.
+            embedding (dict, optional): The embedding provider and model. Defaults to the configuration.
+            content_digest (str, optional): The sha256 of the document, computed if not given.
+            backend (str, optional): "chroma", "float16" or "int8". Defaults to the configuration.
+        """
+        self.source_path = os.path.abspath(source_path)
+        self.database_folder = database_folder or cfg.get(cfg.database_folder)
+        self.splitter = getSplitterParams()
+        self.embedding = embedding or getEmbeddingIdentity()
+        self.content_digest = content_digest or fileDigest(self.source_path)
+        self.backend = backend or cfg.get(cfg.vector_store_backend)
+        self.key = storeKey(
+            self.content_digest, self.splitter, self.embedding, self.backend
+        )
+        self.path = os.path.join(self.database_folder, self.key)
+        self.manifest_path = os.path.join(self.path, MANIFEST_NAME)
+        self.journal_path = os.path.join(self.path, JOURNAL_NAME)
+
+    def readManifest(self) -> Optional[dict]:
+        """
+        Returns:
+            dict: The manifest of the store, None if the store was never started.
+        """
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as file:
+                manifest = json.load(file)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"invalid embed db manifest [{self.manifest_path}]: {e}")
+            return None
+        if manifest.get("key") != self.key:
+            return None
+        return manifest
+
+    def writeManifest(self, manifest: dict) -> None:
+        # replace the file at once, a half written manifest would look like a broken store
+        temp_path = self.manifest_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(manifest, file, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.manifest_path)
+
+    def newManifest(self, status: str, chunks: int) -> dict:
+        return {
+            "key": self.key,
+            "format": STORE_FORMAT_VERSION,
+            "status": status,
+            "content_sha256": self.content_digest,
+            "sources": [self.source_path],
+            "splitter": self.splitter,
+            "embedding": self.embedding,
+            "backend": self.backend,
+            "chunks": chunks,
+            "created_on": datetime.datetime.now().isoformat(" "),
+        }
+
+    def exists(self) -> bool:
+        """Whether the store is completely built"""
+        manifest = self.readManifest()
+        # stores of the first format were only given a manifest when they were complete
+        return (
+            manifest is not None
+            and manifest.get("status", STATUS_READY) == STATUS_READY
+        )
+
+    def readJournal(self) -> Set[int]:
+        """
+        Returns:
+            set: The ids of the chunks saved before the last checkpoint.
+        """
+        saved = set()
+        try:
+            with open(self.journal_path, "r", encoding="utf-8") as file:
+                for line in file:
+                    # a line without newline is a checkpoint interrupted while writing
+                    if line.endswith("\n"):
+                        saved.update(int(chunk_id) for chunk_id in line.split())
+        except FileNotFoundError:
+            pass
+        return saved
+
+    def checkpoint(self, chunk_ids: Iterable[int]) -> None:
+        """
+        Records the chunks saved in the store, call it after the chunks are added.
+        """
+        with open(self.journal_path, "a", encoding="utf-8") as file:
+            file.write(" ".join(str(chunk_id) for chunk_id in chunk_ids) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+
+    def touch(self) -> None:
+        """
+        Records the use of the store for `StoreManager`, the path of the document is remembered
+        if it was renamed or moved.
+        """
+        manifest = self.readManifest()
+        if manifest is None:
+            return
+        if self.source_path not in manifest.get("sources", []):
+            manifest.setdefault("sources", []).append(self.source_path)
+        manifest["last_used_on"] = datetime.datetime.now().isoformat(" ")
+        self.writeManifest(manifest)
+
+    def openVectorStore(self, embed: Embeddings, chunks: int = None) -> VectorStore:
+        """
+        Opens the vector store of the backend, `chunks` is the size of a new store.
+        """
+        if self.backend == VECTOR_STORE_CHROMA:
+            return Chroma(persist_directory=self.path, embedding_function=embed)
+        return NumpyVectorStore(self.path, embed, capacity=chunks, dtype=self.backend)
+
+    def load(self, embed: Embeddings) -> VectorStore:
+        """
+        Opens the built store.
+        """
+        logger.info(f"load embed db [{self.source_path}] -> [{self.path}]")
+        self.touch()
+        return self.openVectorStore(embed)
+
+    def split(self, pages: List[Document]) -> List[Document]:
+        """
+        Splits the pages of the document into the chunks of the store.
+        """
+        text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=self.splitter["chunk_size"],
+            chunk_overlap=self.splitter["chunk_overlap"],
+        )
+        return text_splitter.split_documents(pages)
+
+    def removeUnfinished(self) -> None:
+        """Removes the files of an interrupted build before building the store again."""
+        if os.path.exists(self.path):
+            logger.warning(f"remove unfinished embed db [{self.path}]")
+            shutil.rmtree(self.path)
+        logger.info(f"create embed db [{self.source_path}] -> [{self.path}]")
+
+    def create(self, embed: Embeddings, chunks: int) -> Tuple[VectorStore, Set[int]]:
+        """
+        Opens the store to build, an interrupted build of the same chunks is resumed.
+        The chunks are added by the caller with `checkpoint` after every step and `finish` at last.
+
+        Returns:
+            tuple: The store and the ids of the chunks saved before.
+        """
+        manifest = self.readManifest()
+        if (
+            manifest is not None
+            and manifest.get("status") == STATUS_BUILDING
+            and manifest.get("chunks") == chunks
+        ):
+            saved = self.readJournal()
+            # rewrite the journal without the interrupted checkpoint before appending to it
+            temp_path = self.journal_path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as file:
+                if saved:
+                    file.write(" ".join(str(chunk_id) for chunk_id in sorted(saved)))
+                    file.write("\n")
+            os.replace(temp_path, self.journal_path)
+            logger.info(
+                f"resume embed db [{self.path}]: {len(saved)} of {chunks} chunks saved"
+            )
+        else:
+            self.removeUnfinished()
+            os.makedirs(self.path)
+            self.writeManifest(self.newManifest(STATUS_BUILDING, chunks))
+            saved = set()
+        return self.openVectorStore(embed, chunks), saved
+
+    def finish(self, chunks: int) -> None:
+        """
+        Marks the store as ready, the journal is not needed anymore.
+        """
+        manifest = self.readManifest() or self.newManifest(STATUS_READY, chunks)
+        manifest["status"] = STATUS_READY
+        manifest["chunks"] = chunks
+        manifest["finished_on"] = datetime.datetime.now().isoformat(" ")
+        manifest["last_used_on"] = manifest["finished_on"]
+        self.writeManifest(manifest)
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        logger.info(f"finish embed db [{self.path}]: {chunks} chunks")
@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+from ModuleLogger import logger
+
+EXPLAIN_CACHE_NAME = "explain_cache.db"
+# explanations kept in the cache, the least recently used are removed over it
+EXPLAIN_CACHE_MAX_ROWS = 5000
+
+
+def normalizeSelection(text: str) -> str:
+    """The selection without its surrounding spaces and line breaks, case insensitive."""
+    return re.sub(r"\s+", " ", text).strip().casefold()
+
+
+def explainKey(
+    selection: str, context: str, language: str, prompt_version: str, model: str
+) -> str:
+    """
+    Returns:
+        str: The sha256 of the normalized selection, the sha256 of the context, the answer
+        language, the prompt version and the model.
+    """
+    return hashlib.sha256(
+        json.dumps(
+            [
+                normalizeSelection(selection),
+                hashlib.sha256(context.encode("utf-8")).hexdigest(),
+                language,
+                prompt_version,
+                model,
+            ]
+        ).encode("utf-8")
+    ).hexdigest()
+
+
+class ExplainCache:
+    """
+    On-disk cache of the explanations of selected words and sentences, see `explainKey`.
+
+    One cache file is shared by all books and videos. The least recently used explanations
+    are removed over `max_rows`, the hits and misses are counted from the start of the app.
+    """
+
+    def __init__(self, db_path: str, max_rows: int = EXPLAIN_CACHE_MAX_ROWS):
+        folder = os.path.dirname(db_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.db_path = db_path
+        self.max_rows = max_rows
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        # used by the explain threads, every access holds the lock
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS explains (
+                key TEXT PRIMARY KEY,
+                selection TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                used_on REAL NOT NULL
+            )
+            """)
+        self.conn.commit()
+
+    def hitRate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Returns:
+            str: The cached explanation of the key, None if it is not cached.
+        """
+        with self.lock, self.conn:
+            row = self.conn.execute(
+                "SELECT answer FROM explains WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.conn.execute(
+                    "UPDATE explains SET used_on = ? WHERE key = ?", (time.time(), key)
+                )
+        logger.info(
+            "explain cache %s: %s, hit rate %.1f%% of %d"
+            % (
+                "miss" if row is None else "hit",
+                key[:12],
+                self.hitRate() * 100,
+                self.hits + self.misses,
+            )
+        )
+        return None if row is None else row[0]
+
+    def put(self, key: str, selection: str, answer: str) -> None:
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO explains (key, selection, answer, used_on) VALUES (?, ?, ?, ?)",
+                (key, selection, answer, time.time()),
+            )
+            self.conn.execute(
+                """
+                DELETE FROM explains WHERE key IN (
+                    SELECT key FROM explains ORDER BY used_on DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_rows,),
+            )
+
+    def rows(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM explains").fetchone()[0]
+
+    def close(self) -> None:
+        with self.lock:
+            self.conn.close()
+
+
+__caches: Dict[str, ExplainCache] = {}
+__caches_lock = threading.Lock()
+
+
+def getExplainCache(database_folder: str) -> ExplainCache:
+    """
+    The shared cache of the database folder, the connection is opened once.
+    """
+    db_path = os.path.join(database_folder, EXPLAIN_CACHE_NAME)
+    with __caches_lock:
+        if db_path not in __caches:
+            __caches[db_path] = ExplainCache(db_path)
+        return __caches[db_path]
@@ -0,0 +1,275 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import Hashable, List, NamedTuple, Tuple
+
+from LexicalIndex import TOKEN_PATTERN
+
+# sentences of a paragraph, a Latin sentence end is followed by a space and no lowercase
+# letter, so "3.14" and "Come on!" she said are kept
+SENTENCE_PATTERN = re.compile(
+    r".+?(?:[.!?…]+[\"'”’)\]]*(?=\s(?![a-z])|$)|[。！？]+[」』”’）]*|$)"
+)
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+HYPHENATED_LINE_END = re.compile(r"(?<=\w)-\n(?=\w)")
+WHITESPACE = re.compile(r"\s+")
+# pages whose sentences are kept, the reading page and its neighbours are reused the most
+PAGE_CACHE_SIZE = 16
+ELLIPSIS = " ... "
+
+
+def estimateTokens(text: str) -> int:
+    """About the LLM tokens of the text, one per word and one per Chinese or Japanese character."""
+    return len(TOKEN_PATTERN.findall(text))
+
+
+def splitSentences(text: str, line_breaks: bool = False) -> List[Tuple[int, str]]:
+    """
+    Args:
+        text (str): The text of a page or of subtitle lines.
+        line_breaks (bool): Whether every line ends a sentence, the lines of a PDF page are
+            joined otherwise.
+
+    Returns:
+        list: The sentences of the text without their extra spaces, with the index of their
+        paragraph, or of their line with `line_breaks`.
+    """
+    if line_breaks:
+        paragraphs = text.split("\n")
+    else:
+        paragraphs = PARAGRAPH_BREAK.split(HYPHENATED_LINE_END.sub("", text))
+    sentences = []
+    for index, paragraph in enumerate(paragraphs):
+        paragraph = WHITESPACE.sub(" ", paragraph).strip()
+        for match in SENTENCE_PATTERN.finditer(paragraph):
+            sentence = match.group().strip()
+            if sentence:
+                sentences.append((index, sentence))
+    return sentences
+
+
+class PageSentences(NamedTuple):
+    """The sentences of a page with the case folded text to find the selections."""
+
+    sentences: List[str]
+    paragraphs: List[int]
+    tokens: List[int]
+    # the case folded sentences joined by spaces and the start of every sentence in it
+    folded: str
+    starts: List[int]
+
+    @classmethod
+    def fromText(cls, text: str, line_breaks: bool = False) -> "PageSentences":
+        paragraphs, sentences = [], []
+        for paragraph, sentence in splitSentences(text, line_breaks):
+            paragraphs.append(paragraph)
+            sentences.append(sentence)
+        starts = []
+        offset = 0
+        for sentence in sentences:
+            starts.append(offset)
+            offset += len(sentence.casefold()) + 1
+        return cls(
+            sentences,
+            paragraphs,
+            [estimateTokens(sentence) for sentence in sentences],
+            " ".join(sentence.casefold() for sentence in sentences),
+            starts,
+        )
+
+    def sentenceAt(self, offset: int) -> int:
+        """The index of the sentence of an offset of `folded`."""
+        low, high = 0, len(self.starts) - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.starts[middle] <= offset:
+                low = middle
+            else:
+                high = middle - 1
+        return low
+
+    def occurrences(self, selection: str) -> List[Tuple[int, int, int, int]]:
+        """
+        Returns:
+            list: The first and last sentence of every occurrence of the selection, with the
+            start and end of the occurrence in `folded`.
+        """
+        selection = WHITESPACE.sub(" ", HYPHENATED_LINE_END.sub("", selection)).strip()
+        selection = selection.casefold()
+        found = []
+        if not selection:
+            return found
+        start = self.folded.find(selection)
+        while start >= 0:
+            end = start + len(selection)
+            found.append((self.sentenceAt(start), self.sentenceAt(end - 1), start, end))
+            start = self.folded.find(selection, end)
+        return found
+
+
+def clipSentence(sentence: str, start: int, end: int, max_tokens: int) -> str:
+    """
+    The words of a sentence over the token budget around the occurrence from `start` to `end`.
+    """
+    words = list(TOKEN_PATTERN.finditer(sentence))
+    if len(words) <= max_tokens:
+        return sentence
+    first = next(
+        (index for index, word in enumerate(words) if word.end() > start),
+        len(words) - 1,
+    )
+    last = max(
+        (index for index, word in enumerate(words) if word.start() < end),
+        default=first,
+    )
+    last = max(last, first)
+    # the occurrence in the middle of the kept words
+    width = max(max_tokens, last - first + 1)
+    first = max(0, min(first - (width - (last - first + 1)) // 2, len(words) - width))
+    last = min(len(words) - 1, first + width - 1)
+    clipped = sentence[words[first].start() : words[last].end()]
+    if first > 0:
+        clipped = "..." + clipped
+    if last < len(words) - 1:
+        clipped += "..."
+    return clipped
+
+
+class ContextBuilder:
+    """
+    Builds the context of an explanation from the sentences of the selected text and its
+    neighbouring sentences, instead of the whole page.
+
+    The sentences of a page are split once and cached per page, the least recently used pages
+    are removed over `max_pages`.
+    """
+
+    def __init__(self, max_pages: int = PAGE_CACHE_SIZE):
+        self.max_pages = max_pages
+        self.pages: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+
+    def pageSentences(
+        self, page: Hashable, text: str, line_breaks: bool = False
+    ) -> PageSentences:
+        """
+        Args:
+            page (Hashable): The key of the page, like the document and the page number.
+            text (str): The text of the page, a changed text of a cached page is split again.
+            line_breaks (bool): Whether every line ends a sentence, see `splitSentences`.
+        """
+        key = (page, line_breaks)
+        with self.lock:
+            cached = self.pages.get(key)
+            if cached is not None and cached[0] == text:
+                self.pages.move_to_end(key)
+                return cached[1]
+        sentences = PageSentences.fromText(text, line_breaks)
+        with self.lock:
+            self.pages[key] = (text, sentences)
+            self.pages.move_to_end(key)
+            while len(self.pages) > self.max_pages:
+                self.pages.popitem(last=False)
+        return sentences
+
+    def build(
+        self,
+        page: Hashable,
+        text: str,
+        selection: str,
+        max_tokens: int,
+        line_breaks: bool = False,
+        focus: int = None,
+    ) -> str:
+        """
+        Builds the sentences of the occurrences of the selection, then adds the nearest
+        sentences before and after them while they fit in the token budget.
+
+        Args:
+            page (Hashable): The key of the page, see `pageSentences`.
+            text (str): The text of the page.
+            selection (str): The selected text to be explained.
+            max_tokens (int): About the max tokens of the context, see `estimateTokens`.
+            line_breaks (bool): Whether every line ends a sentence, see `splitSentences`.
+            focus (int, optional): The paragraph or line of the selection, the nearest
+                occurrences go first. Defaults to the order of the occurrences.
+
+        Returns:
+            str: The context, the sentences which are not next to each other are joined
+            by an ellipsis. The start of the page if the selection is not found in it.
+        """
+        if not text:
+            return ""
+        page_sentences = self.pageSentences(page, text, line_breaks)
+        sentences, tokens = page_sentences.sentences, page_sentences.tokens
+        if not sentences:
+            return ""
+
+        # subtitle lines are kept on their lines
+        separator = "\n" if line_breaks else " "
+        chosen = {}
+        used = 0
+        spans = []
+        occurrences = page_sentences.occurrences(selection)
+        if focus is not None:
+            paragraphs = page_sentences.paragraphs
+            occurrences.sort(key=lambda found: abs(paragraphs[found[0]] - focus))
+        for first, last, start, end in occurrences:
+            needed = sum(tokens[first : last + 1])
+            if used + needed > max_tokens:
+                if chosen:
+                    break
+                # the only sentence of a long selection, clipped around it
+                if first == last:
+                    offset = page_sentences.starts[first]
+                    return clipSentence(
+                        sentences[first], start - offset, end - offset, max_tokens
+                    )
+            for index in range(first, last + 1):
+                chosen[index] = sentences[index]
+            used += needed
+            spans.append((first, last))
+
+        if not spans:
+            # the selection is not in the text, like a selection over two pages
+            spans = [(0, -1)]
+
+        # the nearest sentences first, before then after every occurrence
+        distance = 1
+        while True:
+            candidates = []
+            for first, last in spans:
+                candidates.extend((first - distance, last + distance))
+            candidates = [
+                index
+                for index in candidates
+                if 0 <= index < len(sentences) and index not in chosen
+            ]
+            if not candidates and all(
+                first - distance < 0 and last + distance >= len(sentences)
+                for first, last in spans
+            ):
+                break
+            for index in candidates:
+                if index in chosen:
+                    continue
+                if used + tokens[index] > max_tokens:
+                    return self.join(chosen, separator)
+                chosen[index] = sentences[index]
+                used += tokens[index]
+            distance += 1
+        return self.join(chosen, separator)
+
+    @staticmethod
+    def join(chosen: dict, separator: str) -> str:
+        parts = []
+        previous = None
+        for index in sorted(chosen):
+            if previous is not None:
+                parts.append(separator if index == previous + 1 else ELLIPSIS)
+            parts.append(chosen[index])
+            previous = index
+        return "".join(parts)
+
+
+context_builder = ContextBuilder()
@@ -0,0 +1,262 @@
+import asyncio
+import json
+import re
+from typing import Optional, Set
+
+import translators as ts
+from ExplainCache import explainKey, getExplainCache
+from Functions.Config import cfg
+from Functions.ErrorString import error_string
+from Functions.LanguageType import ExplainLanguage
+from Functions.SignalBus import signalBus
+from LLMServerInfo import (
+    getChatModelByCfg,
+    getExplainPromptTemplate,
+    getMotherTongue,
+    getTargetLanguage,
+)
+from ModuleLogger import logger
+from PySide6.QtCore import QObject, Signal
+
+
+def translate(text: str) -> str:
+    return ts.translate_text(text, "bing", to_language="zh")
+
+
+def isSentenceString(selected_text: str) -> bool:
+    """
+    Check if the given `selected_text` is a sentence by counting the number of words in it.
+
+    Returns:
+        bool: True if the `selected_text` has more than one word, False otherwise.
+    """
+    return len(re.findall(r"\b\w+\b", selected_text)) > 1
+
+
+class ExplainTask(QObject):
+    """
+    One explanation requested from the `ExplainService`.
+
+    The signals are emitted on the thread of the event loop, the GUI thread with qasync.
+    `finished` is emitted once whether the explanation is complete, failed or cancelled.
+    """
+
+    messageCallBackSignal = Signal(str)
+    # the explanation is replayed from the explain cache
+    cacheHitSignal = Signal()
+    finished = Signal()
+
+    def __init__(
+        self,
+        selected_text: str,
+        all_text: str,
+        language_type: ExplainLanguage,
+        regenerate: bool = False,
+    ):
+        """
+        Args:
+            selected_text (str): The selected text to be explained.
+            all_text (str): The entire text context.
+            language_type (ExplainLanguage): The language of the explanation.
+            regenerate (bool): Whether the cached explanation is replaced by a new one.
+        """
+        super().__init__()
+        self.chain = None
+        self.cache = None
+        self.task: Optional[asyncio.Future] = None
+        self.regenerate = regenerate
+        self.type = language_type
+        selected_text = selected_text.replace("\n", " ")
+        self.is_sentence = isSentenceString(selected_text)
+        self.createExplainChain(selected_text, all_text)
+
+    def createExplainChain(self, selected_text: str, all_text: str) -> None:
+        """
+        Creates the explain chain of the shared chat model and the compiled explain prompt,
+        and the key of the explanation in the explain cache. The chain is None if there is
+        no valid chat model.
+
+        Args:
+            selected_text (str): The selected text to be explained.
+            all_text (str): The entire text context.
+        """
+        try:
+            self.chat = getChatModelByCfg()
+        except Exception as e:
+            logger.error("get chat model error: %s", e)
+            return
+        self.target_language = getTargetLanguage()
+        if self.type == ExplainLanguage.TARGET_LANGUAGE:
+            self.answer_language = self.target_language
+        else:
+            self.answer_language = getMotherTongue()
+
+        explain_prompt = getExplainPromptTemplate(self.type, self.is_sentence)
+        self.prompt = explain_prompt.template
+        self.prompt_version = explain_prompt.version
+        self.chain = self.prompt | self.chat
+
+        self.msg = {
+            "word": selected_text,
+            "data": all_text,
+            "language": self.target_language,
+            "answer_language": self.answer_language,
+        }
+
+        logger.info(
+            f"explain request msg with prompt {self.prompt_version} is:\n {self.msg}\n"
+        )
+
+        if cfg.get(cfg.explain_cache):
+            self.cache = getExplainCache(cfg.get(cfg.database_folder))
+            self.cache_key = explainKey(
+                selected_text,
+                all_text or "",
+                self.answer_language,
+                self.prompt_version,
+                json.dumps(
+                    {
+                        "provider": cfg.get(cfg.provider),
+                        "model": cfg.get(cfg.model_name),
+                    },
+                    sort_keys=True,
+                ),
+            )
+
+    def stop(self) -> None:
+        """
+        Cancels the explanation without waiting, the HTTP stream is closed by the cancellation.
+        """
+        if self.task is not None and not self.task.done():
+            logger.debug("cancel explanation")
+            self.task.cancel()
+
+    def isRunning(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    async def run(self) -> None:
+        """
+        Emits the cached explanation at once unless `regenerate` is set, otherwise streams the
+        explanation chunk by chunk and caches the complete explanation. The Bing translation
+        of the selected text is requested meanwhile and emitted last.
+        """
+        if self.chain is None:
+            logger.error("explain chain is not set")
+            return
+        translation = asyncio.ensure_future(
+            asyncio.to_thread(translate, self.msg["word"])
+        )
+        try:
+            answer = None
+            if self.cache is not None and not self.regenerate:
+                answer = await asyncio.to_thread(self.cache.get, self.cache_key)
+            if answer is not None:
+                self.cacheHitSignal.emit()
+                self.messageCallBackSignal.emit(answer)
+            else:
+                parts = []
+                async for chunk in self.chain.astream(self.msg):
+                    parts.append(chunk.content)
+                    self.messageCallBackSignal.emit(chunk.content)
+                answer = "".join(parts)
+                if self.cache is not None and answer:
+                    await asyncio.to_thread(
+                        self.cache.put, self.cache_key, self.msg["word"], answer
+                    )
+            self.messageCallBackSignal.emit("\n\nBing: " + await translation)
+        except asyncio.CancelledError:
+            translation.cancel()
+            raise
+        except Exception as e:
+            translation.cancel()
+            logger.error("explain error: %s", e)
+            signalBus.error_signal.emit(error_string.NO_VALID_LLM + str(e))
+
+
+class ExplainService:
+    """
+    Runs the explanations on the asyncio event loop of the app, so nothing blocks the GUI
+    thread while the explanations stream.
+
+    At most `limit` explanations run at once, the others wait in the order they are requested.
+    """
+
+    def __init__(self, limit: int = None):
+        """
+        Args:
+            limit (int, optional): The max explanations running at once. Defaults to the configuration.
+        """
+        self.limit = limit
+        self.active = 0
+        # created in the running loop, see `getCondition`
+        self.condition: Optional[asyncio.Condition] = None
+        self.tasks: Set[ExplainTask] = set()
+        if limit is None:
+            cfg.explain_concurrency.valueChanged.connect(self.onLimitChanged)
+
+    def getCondition(self) -> asyncio.Condition:
+        """
+        The condition of the limit. It is created on first use, since the service is created
+        at import before the app sets its event loop, and a condition of Python 3.9 is bound
+        to the loop of its creation.
+        """
+        if self.condition is None:
+            self.condition = asyncio.Condition()
+        return self.condition
+
+    def maxActive(self) -> int:
+        return self.limit or cfg.get(cfg.explain_concurrency)
+
+    def explain(
+        self,
+        selected_text: str,
+        all_text: str,
+        language_type: ExplainLanguage,
+        regenerate: bool = False,
+    ) -> ExplainTask:
+        """
+        Requests an explanation, it is scheduled on the running event loop.
+
+        Returns:
+            ExplainTask: The explanation, see its signals.
+        """
+        task = ExplainTask(selected_text, all_text, language_type, regenerate)
+        # kept until it is finished, the caller could drop it
+        self.tasks.add(task)
+        task.task = asyncio.ensure_future(self.run(task))
+        return task
+
+    async def run(self, task: ExplainTask) -> None:
+        try:
+            condition = self.getCondition()
+            async with condition:
+                await condition.wait_for(lambda: self.active < self.maxActive())
+                self.active += 1
+            try:
+                await task.run()
+            finally:
+                # released at once even if the task is cancelled again
+                self.active -= 1
+                asyncio.ensure_future(self.notify())
+        except asyncio.CancelledError:
+            logger.debug("explanation cancelled")
+        finally:
+            self.tasks.discard(task)
+            task.finished.emit()
+
+    def onLimitChanged(self, _=None) -> None:
+        # a raised limit starts the waiting explanations at once
+        asyncio.ensure_future(self.notify())
+
+    async def notify(self) -> None:
+        condition = self.getCondition()
+        async with condition:
+            condition.notify_all()
+
+    def stopAll(self) -> None:
+        """Cancels every explanation, called when the app is closed."""
+        for task in list(self.tasks):
+            task.stop()
+
+
+explain_service = ExplainService()
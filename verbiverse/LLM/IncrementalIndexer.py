@@ -0,0 +1,156 @@
+import asyncio
+import heapq
+import threading
+from typing import Callable, List, Optional
+
+from EmbeddingPipeline import (
+    EMBED_BATCH_SIZE,
+    AdaptiveLimiter,
+    PrecomputedEmbeddings,
+    embedDocuments,
+)
+from EmbeddingStore import EmbeddingStore
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from ModuleLogger import logger
+
+# chunks embedded between two checks of the reading position
+INDEX_ROUND_SIZE = EMBED_BATCH_SIZE * 4
+
+
+class IncrementalIndexer:
+    """
+    Builds the embedding store of a document in the background, nearest pages first.
+
+    Every round embeds the `round_size` chunks closest to the reading page and adds them to
+    the store, so the store could be searched after the first round. `setPage` moves the
+    reading page, the next round starts from there. Every round is a checkpoint of the store,
+    an interrupted build only embeds the chunks not saved yet.
+    """
+
+    def __init__(
+        self,
+        store: EmbeddingStore,
+        splits: List[Document],
+        embed: Embeddings,
+        page: int = 0,
+        round_size: int = INDEX_ROUND_SIZE,
+        progress: Callable[[int, int], None] = None,
+    ):
+        """
+        Args:
+            store (EmbeddingStore): The store to build.
+            splits (List[Document]): The chunks of the document, see `EmbeddingStore.split`.
+            embed (Embeddings): The embedding model.
+            page (int): The reading page, 0 based like the page metadata of the chunks.
+            round_size (int): The number of chunks of one round.
+            progress (Callable[[int, int], None], optional): Called with the number of indexed
+                chunks and the total.
+        """
+        self.store = store
+        self.splits = splits
+        self.pages = [split.metadata.get("page", 0) for split in splits]
+        self.embed = PrecomputedEmbeddings({}, embed)
+        self.page = page
+        self.round_size = round_size
+        self.progress = progress
+        self.pending = set(range(len(splits)))
+        self.db: Optional[VectorStore] = None
+        self.task: Optional[asyncio.Task] = None
+        self.first_round: Optional[asyncio.Event] = None
+        # held while the chunks of a round are added, a cancelled task leaves its thread running
+        self.write_lock = threading.Lock()
+
+    @property
+    def indexed(self) -> int:
+        return len(self.splits) - len(self.pending)
+
+    def finished(self) -> bool:
+        return self.task is not None and self.task.done()
+
+    def setPage(self, page: int) -> None:
+        if page != self.page:
+            logger.debug(f"index from page {page} of [{self.store.source_path}]")
+        self.page = page
+
+    def nextRound(self) -> List[int]:
+        """
+        The pending chunks nearest to the reading page, the following pages come before the
+        previous pages at the same distance.
+        """
+
+        def distance(index: int) -> tuple:
+            offset = self.pages[index] - self.page
+            return abs(offset), offset < 0, index
+
+        return heapq.nsmallest(self.round_size, self.pending, key=distance)
+
+    async def start(self) -> VectorStore:
+        """
+        Starts indexing and waits for the first round, the rest is indexed in `task`.
+
+        Returns:
+            VectorStore: The store, searchable while it is being built.
+
+        Raises:
+            Exception: The error of the first round.
+        """
+        self.first_round = asyncio.Event()
+        self.db, saved = await asyncio.to_thread(
+            self.store.create, self.embed, len(self.splits)
+        )
+        self.pending.difference_update(saved)
+        self.task = asyncio.ensure_future(self.run())
+        waiter = asyncio.ensure_future(self.first_round.wait())
+        await asyncio.wait({self.task, waiter}, return_when=asyncio.FIRST_COMPLETED)
+        waiter.cancel()
+        if self.task.done() and not self.task.cancelled():
+            # raises the error of the first round
+            self.task.result()
+        return self.db
+
+    def stop(self) -> None:
+        if self.task is not None and not self.task.done():
+            logger.info(f"stop indexing [{self.store.source_path}]")
+            self.task.cancel()
+
+    def join(self) -> None:
+        """
+        Blocks until the chunks being added to the store by a stopped task are saved, so the
+        store could be closed.
+        """
+        with self.write_lock:
+            pass
+
+    def addDocuments(self, indexes: List[int]) -> None:
+        with self.write_lock:
+            self.db.add_documents(
+                [self.splits[index] for index in indexes],
+                ids=[str(index) for index in indexes],
+            )
+
+    async def run(self) -> None:
+        limiter = AdaptiveLimiter()
+        total = len(self.splits)
+        while self.pending:
+            indexes = self.nextRound()
+            texts = [self.splits[index].page_content for index in indexes]
+            indexed = self.indexed
+            vectors = await embedDocuments(
+                texts,
+                self.embed.embed,
+                limiter=limiter,
+                progress=(
+                    None
+                    if self.progress is None
+                    else lambda done, _: self.progress(indexed + done, total)
+                ),
+            )
+            self.embed.vectors.update(zip(texts, vectors))
+            await asyncio.to_thread(self.addDocuments, indexes)
+            self.embed.vectors.clear()
+            await asyncio.to_thread(self.store.checkpoint, indexes)
+            self.pending.difference_update(indexes)
+            self.first_round.set()
+        await asyncio.to_thread(self.store.finish, total)
@@ -1,12 +1,172 @@
+import hashlib
+import threading
+from typing import Any, Callable, Dict, List, NamedTuple, Tuple
+
+import httpx
+from EmbeddingCache import CachedEmbeddings, getEmbeddingCache
 from Functions.Config import cfg
 from Functions.LanguageType import ExplainLanguage
 from Functions.SignalBus import signalBus
+from langchain_core.prompts import PromptTemplate
 from ModuleLogger import logger
 from OpenAI import getOpenAIChatModel, getOpenAIEmbedding
 from PySide6.QtCore import QFile, QIODevice
 from qfluentwidgets import qconfig
 from TongYiQWen import getTongYiChatModel, getDashScopeEmbedding
 
+# connections kept open to the provider between two requests
+HTTP_POOL_LIMITS = httpx.Limits(
+    max_connections=20, max_keepalive_connections=10, keepalive_expiry=120
+)
+HTTP_TIMEOUT = httpx.Timeout(60.0, connect=10.0)
+
+
+class ReleasingStream(httpx.SyncByteStream):
+    """The body of a response, `release` is called once when the response is closed."""
+
+    def __init__(self, stream: httpx.SyncByteStream, release: Callable[[], None]):
+        self.stream = stream
+        self.release = release
+
+    def __iter__(self):
+        yield from self.stream
+
+    def close(self) -> None:
+        try:
+            self.stream.close()
+        finally:
+            release, self.release = self.release, None
+            if release is not None:
+                release()
+
+
+class TrackedTransport(httpx.HTTPTransport):
+    """
+    An HTTP transport counting its requests in flight, a streamed request is finished once
+    its response is closed. `on_idle` is called when the last request in flight is finished.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.lock = threading.Lock()
+        self.active = 0
+        self.on_idle: Callable[[], None] = None
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        with self.lock:
+            self.active += 1
+        try:
+            response = super().handle_request(request)
+        except BaseException:
+            self.release()
+            raise
+        response.stream = ReleasingStream(response.stream, self.release)
+        return response
+
+    def release(self) -> None:
+        with self.lock:
+            self.active -= 1
+            on_idle = self.on_idle if self.active == 0 else None
+        if on_idle is not None:
+            on_idle()
+
+
+class PooledClient(NamedTuple):
+    client: httpx.Client
+    transport: TrackedTransport
+
+
+class ModelRegistry:
+    """
+    The chat and embedding models shared by all chains and explain workers of the process.
+
+    A model is built once per (kind, provider, url, model, key) and the OpenAI models of a
+    provider url share one keep-alive connection pool, so a request reuses the TCP and TLS
+    connection of the previous one. DashScope manages the connections of its SDK itself.
+    Everything is built again after `llm_config_change_signal`, requests in flight keep the
+    old models. The old connection pools are retired then, they are closed once their
+    requests in flight are finished, or by `close` when the app is closed.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.models: Dict[Tuple[str, ...], Any] = {}
+        self.http_clients: Dict[Tuple[str, str], PooledClient] = {}
+        self.retired: List[PooledClient] = []
+
+    def httpClient(self, provider: str, url: str) -> httpx.Client:
+        with self.lock:
+            key = (provider, url)
+            if key not in self.http_clients:
+                transport = TrackedTransport(limits=HTTP_POOL_LIMITS)
+                self.http_clients[key] = PooledClient(
+                    httpx.Client(transport=transport, timeout=HTTP_TIMEOUT), transport
+                )
+            return self.http_clients[key].client
+
+    def get(self, key: Tuple[str, ...], factory: Callable[[], Any]) -> Any:
+        """
+        Returns:
+            The model of the key, built by `factory` the first time.
+        """
+        with self.lock:
+            model = self.models.get(key)
+        if model is None:
+            model = factory()
+            with self.lock:
+                # another thread could build the same model meanwhile, the first one is kept
+                model = self.models.setdefault(key, model)
+                logger.info(f"model registry: {len(self.models)} models")
+        return model
+
+    def clear(self) -> None:
+        with self.lock:
+            self.models.clear()
+            retired = list(self.http_clients.values())
+            self.http_clients.clear()
+        for pooled in retired:
+            self.retire(pooled)
+        logger.info("model registry cleared")
+
+    def retire(self, pooled: PooledClient) -> None:
+        """Closes the pool when its requests in flight are finished."""
+        with pooled.transport.lock:
+            idle = pooled.transport.active == 0
+            if not idle:
+                pooled.transport.on_idle = lambda: self.closeRetired(pooled)
+        if idle:
+            pooled.client.close()
+            return
+        with self.lock:
+            self.retired.append(pooled)
+
+    def closeRetired(self, pooled: PooledClient) -> None:
+        with self.lock:
+            if pooled in self.retired:
+                self.retired.remove(pooled)
+        pooled.client.close()
+
+    def close(self) -> None:
+        """Closes every connection pool, called when the app is closed."""
+        with self.lock:
+            pools = list(self.http_clients.values()) + self.retired
+            self.models.clear()
+            self.http_clients.clear()
+            self.retired = []
+        for pooled in pools:
+            pooled.client.close()
+
+
+model_registry = ModelRegistry()
+signalBus.llm_config_change_signal.connect(model_registry.clear)
+
+
+def __modelKey(kind: str, model: str) -> Tuple[str, ...]:
+    provider = qconfig.get(cfg.provider)
+    # a changed key must not reuse the model of the old one
+    key_digest = hashlib.sha256(qconfig.get(cfg.user_key).encode("utf-8")).hexdigest()
+    return kind, provider, qconfig.get(cfg.provider_url), model, key_digest
+
 
 # Helper function to load a resource from the specified path with error handling
 def __getPromptResource(prompt_name: str) -> str:
@@ -38,67 +198,111 @@ def __getPromptResource(prompt_name: str) -> str:
     return content
 
 
-# Retrieves the chat prompt text from a resource
-def getChatPrompt() -> str:
-    return __getPromptResource(":/prompt/chat_prompt.txt")
+class CompiledPrompt(NamedTuple):
+    """A prompt resource parsed into a template."""
 
+    name: str
+    template: PromptTemplate
+    # sha256 prefix of the prompt text, changes whenever the prompt is edited
+    version: str
 
-# Retrieves the check prompt text from a resource
-def getCheckPrompt() -> str:
-    language = qconfig.get(cfg.mother_tongue)
 
-    logger.info(f"check prompt for {language} -> :/prompt/check_{language}.txt")
-    try:
-        return __getPromptResource(f":/prompt/check_{language}.txt")
-    except Exception:
-        logger.warning(
-            f"Not found explain prompt for {language} -> :/prompt/explain_{language}.txt. Used default prompt"
+class PromptRegistry:
+    """
+    The prompt templates of the process, every (task, language, is_sentence) is resolved to its
+    resource, read and parsed once. A missing language specific prompt falls back to the
+    default prompt once as well. Cleared on `llm_config_change_signal`.
+    """
+
+    def __init__(self, load: Callable[[str], str]):
+        """
+        Args:
+            load (Callable[[str], str]): Reads a prompt resource, raises FileNotFoundError if missing.
+        """
+        self.load = load
+        self.lock = threading.Lock()
+        self.prompts: Dict[Tuple, CompiledPrompt] = {}
+
+    def get(self, key: Tuple, names: List[str]) -> CompiledPrompt:
+        """
+        Args:
+            key (tuple): The task, language and sentence flag of the prompt.
+            names (List[str]): The resources to try in order, the last one is the default.
+
+        Returns:
+            CompiledPrompt: The template of the first resource found.
+
+        Raises:
+            FileNotFoundError: If no resource is found.
+        """
+        with self.lock:
+            prompt = self.prompts.get(key)
+        if prompt is not None:
+            return prompt
+        for name in names:
+            try:
+                text = self.load(name)
+                break
+            except FileNotFoundError:
+                if name == names[-1]:
+                    raise
+                logger.warning(f"Not found prompt {name}. Used default {names[-1]}")
+        prompt = CompiledPrompt(
+            name,
+            PromptTemplate.from_template(text),
+            hashlib.sha256(text.encode("utf-8")).hexdigest()[:12],
         )
-        return __getPromptResource(":/prompt/check_prompt.txt")
+        logger.info(f"prompt {key} -> {name} version {prompt.version}")
+        with self.lock:
+            return self.prompts.setdefault(key, prompt)
 
+    def clear(self) -> None:
+        with self.lock:
+            self.prompts.clear()
 
-# Retrieves the translate by English prompt text from a resource
 
+prompt_registry = PromptRegistry(__getPromptResource)
+signalBus.llm_config_change_signal.connect(prompt_registry.clear)
 
-def __getExplainPromptByLanguage(prompt: str, default_prompt: str) -> str:
-    """
-    Retrieves the explain prompt for a specific language based on the provided prompt name.
 
-    Args:
-        prompt (str): The prompt name to retrieve.
-        default_prompt (str): The default prompt to use if the specified prompt is not found.
+def getChatPromptTemplate() -> CompiledPrompt:
+    return prompt_registry.get(("chat",), [":/prompt/chat_prompt.txt"])
 
-    Returns:
-        str: The explain prompt text based on the provided prompt or the default prompt if not found.
-    """
-    try:
-        return __getPromptResource(prompt)
-    except Exception:
-        logger.warning(
-            f"Not found explain prompt for {prompt}. Used default {default_prompt}"
-        )
-        return __getPromptResource(default_prompt)
 
+# Retrieves the chat prompt text from a resource
+def getChatPrompt() -> str:
+    return getChatPromptTemplate().template.template
 
-def getExplainPrompt(
+
+def getCheckPromptTemplate() -> CompiledPrompt:
+    language = qconfig.get(cfg.mother_tongue)
+    return prompt_registry.get(
+        ("check", language),
+        [f":/prompt/check_{language}.txt", ":/prompt/check_prompt.txt"],
+    )
+
+
+# Retrieves the check prompt text from a resource
+def getCheckPrompt() -> str:
+    return getCheckPromptTemplate().template.template
+
+
+def getExplainPromptTemplate(
     answer_language: ExplainLanguage = None, is_sentence: bool = False
-) -> str:
+) -> CompiledPrompt:
     """
-    Retrieves the explain prompt based on the specified answer language and sentence type.
+    Retrieves the explain prompt template based on the specified answer language and sentence type.
 
     Args:
         answer_language (ExplainLanguage, optional): The language to use for the explain prompt. Defaults to None.
         is_sentence (bool, optional): Flag indicating whether the prompt is for a sentence. Defaults to False.
 
     Returns:
-        str: The explain prompt.
-
-    Raises:
-        None
+        CompiledPrompt: The explain prompt template and its version.
 
     Examples:
-        >>> getExplainPrompt(answer_language=ExplainLanguage.TARGET_LANGUAGE)
-        "/prompt/explain_en.txt"
+        >>> getExplainPromptTemplate(answer_language=ExplainLanguage.TARGET_LANGUAGE).name
+        ":/prompt/explain_english.txt"
     """
     explain_prefix = "explain"
     explain_default_prompt = ":/prompt/explain_prompt.txt"
@@ -108,25 +312,35 @@ def getExplainPrompt(
 
     if answer_language == ExplainLanguage.TARGET_LANGUAGE:
         language = qconfig.get(cfg.target_language)
-        prompt_name = f":/prompt/{explain_prefix}_{language}.txt"
-        logger.info(f"explain prompt for target {language} -> {prompt_name}")
-        return __getExplainPromptByLanguage(
-            prompt_name, default_prompt=explain_default_prompt
-        )
     elif answer_language == ExplainLanguage.MOTHER_TONGUE:
         language = qconfig.get(cfg.mother_tongue)
-        prompt_name = f":/prompt/{explain_prefix}_{language}.txt"
-        logger.info(f"explain prompt for target {language} -> {prompt_name}")
-        return __getExplainPromptByLanguage(
-            prompt_name, default_prompt=explain_default_prompt
-        )
     else:
-        return __getPromptResource(":/prompt/explain_prompt.txt")
+        return prompt_registry.get(("explain",), [":/prompt/explain_prompt.txt"])
+    return prompt_registry.get(
+        ("explain", language, is_sentence),
+        [f":/prompt/{explain_prefix}_{language}.txt", explain_default_prompt],
+    )
+
+
+def getExplainPrompt(
+    answer_language: ExplainLanguage = None, is_sentence: bool = False
+) -> str:
+    """
+    Retrieves the explain prompt based on the specified answer language and sentence type.
+
+    Args:
+        answer_language (ExplainLanguage, optional): The language to use for the explain prompt. Defaults to None.
+        is_sentence (bool, optional): Flag indicating whether the prompt is for a sentence. Defaults to False.
+
+    Returns:
+        str: The explain prompt.
+    """
+    return getExplainPromptTemplate(answer_language, is_sentence).template.template
 
 
 def getChatModelByCfg():
     """
-    Retrieves a chat model based on the configuration.
+    Retrieves the shared chat model of the configuration, see `ModelRegistry`.
 
     This function retrieves a chat model based on the provider specified in the configuration. The provider can be either "openai" or "tongyi". If the provider is "openai", it calls the `getOpenAIChatModel` function to get the chat model. If the provider is "tongyi", it calls the `getTongYiChatModel` function to get the chat model. If the provider is neither "openai" nor "tongyi", it raises an exception.
 
@@ -138,11 +352,13 @@ def getChatModelByCfg():
     """
     chat = None
     provider = qconfig.get(cfg.provider)
+    key = __modelKey("chat", qconfig.get(cfg.model_name))
     try:
         if provider == "openai":
-            chat = getOpenAIChatModel()
+            http_client = model_registry.httpClient(provider, key[2])
+            chat = model_registry.get(key, lambda: getOpenAIChatModel(http_client))
         elif provider == "tongyi":
-            chat = getTongYiChatModel()
+            chat = model_registry.get(key, getTongYiChatModel)
         else:
             raise Exception(f"Not supported {provider} for now")
     except Exception as e:
@@ -151,20 +367,43 @@ def getChatModelByCfg():
     return chat
 
 
-def getEmbedModelByCfg():
+def hasEmbedModel() -> bool:
+    """
+    Whether an embedding model is configured, the PDF chat is lexical only without it.
+    """
+    return qconfig.get(cfg.embed_model_name).strip() != ""
+
+
+def getEmbedModelByCfg() -> CachedEmbeddings:
+    """
+    Retrieves the shared embedding model of the configured provider behind the shared embedding cache.
+
+    Returns:
+        CachedEmbeddings: The embedding model, texts embedded before are read from the cache.
+
+    Raises:
+        Exception: If the provider specified in the configuration is not supported.
+    """
     embed = None
     provider = qconfig.get(cfg.provider)
+    key = __modelKey("embed", qconfig.get(cfg.embed_model_name))
     try:
         if provider == "openai":
-            embed = getOpenAIEmbedding()
+            http_client = model_registry.httpClient(provider, key[2])
+            embed = model_registry.get(key, lambda: getOpenAIEmbedding(http_client))
         elif provider == "tongyi":
-            embed = getDashScopeEmbedding()
+            embed = model_registry.get(key, getDashScopeEmbedding)
         else:
             raise Exception(f"Not supported {provider} for now")
     except Exception as e:
         signalBus.error_signal.emit(str(e))
         raise e
-    return embed
+    return CachedEmbeddings(
+        embed,
+        provider,
+        qconfig.get(cfg.embed_model_name),
+        getEmbeddingCache(cfg.get(cfg.database_folder)),
+    )
 
 
 def getTargetLanguage():
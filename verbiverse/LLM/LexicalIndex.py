@@ -0,0 +1,278 @@
+import json
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStore
+from ModuleLogger import logger
+
+LEXICAL_INDEX_NAME = "bm25.npz"
+# identity of the stores of the pure lexical mode, see `EmbeddingStore`
+LEXICAL_ONLY_EMBEDDING = {"provider": "bm25", "model": ""}
+# words of spaced scripts, every Chinese and Japanese character is a token
+TOKEN_PATTERN = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff]|[^\W_]+")
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """
+    Okapi BM25 inverted index of the chunks of a document.
+
+    The postings are kept in CSR arrays: the chunks and term frequencies of the term
+    `terms[i]` are `chunk_ids[offsets[i]:offsets[i + 1]]` and `tfs[offsets[i]:offsets[i + 1]]`.
+    """
+
+    def __init__(
+        self,
+        terms: List[str],
+        offsets: np.ndarray,
+        chunk_ids: np.ndarray,
+        tfs: np.ndarray,
+        lengths: np.ndarray,
+        k1: float = 1.5,
+        b: float = 0.75,
+    ):
+        self.terms: Dict[str, int] = {term: index for index, term in enumerate(terms)}
+        self.offsets = offsets
+        self.chunk_ids = chunk_ids
+        self.tfs = tfs
+        self.lengths = lengths
+        self.k1 = k1
+        self.b = b
+        average = lengths.mean() if len(lengths) else 0.0
+        # the length normalization of every chunk, computed once
+        self.norms = k1 * (1 - b + b * lengths / max(average, 1e-9))
+
+    @classmethod
+    def build(cls, texts: List[str]) -> "BM25Index":
+        vocabulary: Dict[str, int] = {}
+        term_ids, chunk_ids, tfs = [], [], []
+        lengths = np.zeros(len(texts), dtype=np.int32)
+        for chunk_id, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            lengths[chunk_id] = sum(counts.values())
+            term_ids.extend(
+                vocabulary.setdefault(term, len(vocabulary)) for term in counts
+            )
+            chunk_ids.extend([chunk_id] * len(counts))
+            tfs.extend(counts.values())
+
+        term_ids = np.array(term_ids, dtype=np.int32)
+        # group the postings by term, the chunks of a term stay in order
+        order = np.argsort(term_ids, kind="stable")
+        offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(term_ids, minlength=len(vocabulary)))
+        return cls(
+            list(vocabulary),
+            offsets,
+            np.array(chunk_ids, dtype=np.int32)[order],
+            np.array(tfs, dtype=np.int32)[order],
+            lengths,
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                data["terms"].tolist(),
+                data["offsets"],
+                data["chunk_ids"],
+                data["tfs"],
+                data["lengths"],
+            )
+
+    def save(self, path: str) -> None:
+        terms = list(self.terms)
+        # np.savez appends .npz to names without it
+        temp_path = path + ".tmp.npz"
+        np.savez(
+            temp_path,
+            terms=np.array(terms, dtype=str),
+            offsets=self.offsets,
+            chunk_ids=self.chunk_ids,
+            tfs=self.tfs,
+            lengths=self.lengths,
+        )
+        os.replace(temp_path, path)
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def search(
+        self, query: str, k: int = 4, mask: np.ndarray = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Args:
+            query (str): The text to search.
+            k (int): The max number of results.
+            mask (np.ndarray, optional): The chunks allowed in the results, all chunks if None.
+
+        Returns:
+            list: The (chunk id, score) of the best `k` chunks containing a term of the query.
+        """
+        scores = np.zeros(len(self.lengths), dtype=np.float64)
+        for term in set(tokenize(query)):
+            index = self.terms.get(term)
+            if index is None:
+                continue
+            start, end = self.offsets[index], self.offsets[index + 1]
+            chunk_ids = self.chunk_ids[start:end]
+            tfs = self.tfs[start:end]
+            idf = math.log(
+                1 + (len(self.lengths) - len(chunk_ids) + 0.5) / (len(chunk_ids) + 0.5)
+            )
+            scores[chunk_ids] += (
+                idf * tfs * (self.k1 + 1) / (tfs + self.norms[chunk_ids])
+            )
+
+        if mask is not None:
+            scores[~mask] = 0
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        matched = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(int(chunk_id), float(scores[chunk_id])) for chunk_id in matched]
+
+
+def openLexicalIndex(folder: str, splits: List[Document]) -> BM25Index:
+    """
+    Loads the BM25 index of the chunks saved in the folder, or builds and saves it.
+    """
+    path = os.path.join(folder, LEXICAL_INDEX_NAME)
+    if os.path.exists(path):
+        try:
+            index = BM25Index.load(path)
+            if len(index) == len(splits):
+                logger.info(f"load bm25 index [{path}]")
+                return index
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"invalid bm25 index [{path}]: {e}")
+    index = BM25Index.build([split.page_content for split in splits])
+    os.makedirs(folder, exist_ok=True)
+    index.save(path)
+    logger.info(f"create bm25 index [{path}]: {len(index.terms)} terms")
+    return index
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Fuses the ranks of the BM25 index and the vector store by reciprocal rank fusion.
+
+    Without vector store, it is a pure lexical retriever which never calls the embedding model.
+
+    With a reading `page`, the fused score of a chunk within `page_window` pages is multiplied
+    by 1 + page_boost * page_decay ** distance, and `read_pages_only` drops the chunks after
+    the reading page so the answers never spoil the rest of the book.
+    """
+
+    splits: List[Document]
+    index: BM25Index
+    vector_store: Optional[VectorStore] = None
+    k: int = 2
+    # candidates of each retriever, fused into the best k
+    fetch_k: int = 8
+    lexical_weight: float = 1.0
+    vector_weight: float = 1.0
+    # the rank constant of reciprocal rank fusion
+    rrf_k: int = 60
+    # the reading page, 0 based like the page metadata of the splits
+    page: Optional[int] = None
+    page_window: int = 0
+    page_decay: float = 0.8
+    page_boost: float = 1.0
+    read_pages_only: bool = False
+    # the chunk id of the text of every split, built by the first vector search
+    chunk_ids: Optional[Dict[str, int]] = None
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def pageOf(self, document: Document) -> int:
+        return document.metadata.get("page", 0)
+
+    def cacheKey(self) -> str:
+        """
+        The parameters the results depend on besides the query, the reading page only counts
+        when it is used.
+        """
+        uses_page = self.page is not None and (
+            self.page_window > 0 or self.read_pages_only
+        )
+        return json.dumps(
+            {
+                "k": self.k,
+                "fetch_k": self.fetch_k,
+                "lexical_weight": self.lexical_weight,
+                "vector_weight": self.vector_weight if self.vector_store else None,
+                "rrf_k": self.rrf_k,
+                "page": self.page if uses_page else None,
+                "page_window": self.page_window if uses_page else 0,
+                "page_decay": self.page_decay,
+                "page_boost": self.page_boost,
+                "read_pages_only": self.read_pages_only if uses_page else False,
+            },
+            sort_keys=True,
+        )
+
+    def retrieveIds(self, query: str) -> List[int]:
+        """
+        Returns:
+            list: The ids of the best `k` chunks, the indexes of `splits`.
+        """
+        scores: Dict[int, float] = {}
+        spoiler_filter = self.read_pages_only and self.page is not None
+        proximity = self.page_window > 0 and self.page is not None
+        # the boost could lift a candidate out of the plain top k
+        fetch_k = self.fetch_k * 2 if proximity else self.fetch_k
+
+        def fuse(ranked: List[int], weight: float):
+            for rank, chunk_id in enumerate(ranked):
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + weight / (
+                    self.rrf_k + rank + 1
+                )
+
+        mask = None
+        if spoiler_filter:
+            pages = np.array([self.pageOf(split) for split in self.splits])
+            mask = pages <= self.page
+        fuse(
+            [chunk_id for chunk_id, _ in self.index.search(query, fetch_k, mask)],
+            self.lexical_weight,
+        )
+        if self.vector_store is not None:
+            if self.chunk_ids is None:
+                # the chunks of both indexes are the same splits of the document
+                self.chunk_ids = {}
+                for chunk_id, split in enumerate(self.splits):
+                    self.chunk_ids.setdefault(split.page_content, chunk_id)
+            kwargs = {"filter": {"page": {"$lte": self.page}}} if spoiler_filter else {}
+            ranked = self.vector_store.similarity_search(query, k=fetch_k, **kwargs)
+            fuse(
+                [
+                    self.chunk_ids[document.page_content]
+                    for document in ranked
+                    if document.page_content in self.chunk_ids
+                ],
+                self.vector_weight,
+            )
+
+        if proximity:
+            for chunk_id in scores:
+                distance = abs(self.pageOf(self.splits[chunk_id]) - self.page)
+                if distance <= self.page_window:
+                    scores[chunk_id] *= 1 + self.page_boost * self.page_decay**distance
+        return sorted(scores, key=scores.get, reverse=True)[: self.k]
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return [self.splits[chunk_id] for chunk_id in self.retrieveIds(query)]
@@ -0,0 +1,379 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from ModuleLogger import logger
+
+VECTORS_NAME = "vectors.npy"
+# the scale of every int8 row
+SCALES_NAME = "scales.npy"
+CHUNKS_NAME = "chunks.db"
+VECTOR_DTYPES = {"float16": np.float16, "int8": np.int8}
+# rows scored at once, bounds the float32 copy of the matrix
+SEARCH_BLOCK_ROWS = 8192
+# max number of host parameters of one SQLite statement is 999 before 3.32
+QUERY_CHUNK = 500
+# masks of the recent filters, the reading page changes slowly
+FILTER_CACHE_SIZE = 16
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def quantize(vectors: np.ndarray, dtype: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Args:
+        vectors (np.ndarray): The unit vectors of the rows.
+        dtype (str): "float16" or "int8".
+
+    Returns:
+        tuple: The rows and their scales, int8 rows times their scale approximate the vectors.
+    """
+    if dtype == "float16":
+        return vectors.astype(np.float16), np.ones(len(vectors), dtype=np.float32)
+    scales = np.abs(vectors).max(axis=1) / 127
+    scales = np.maximum(scales, 1e-12).astype(np.float32)
+    rows = np.rint(vectors / scales[:, None]).astype(np.int8)
+    return rows, scales
+
+
+def matchFilter(metadata: dict, where: dict) -> bool:
+    """
+    Matches the metadata with the subset of the Chroma `where` filter used by the retrievers,
+    a value or {"$eq" | "$ne" | "$gt" | "$gte" | "$lt" | "$lte": value} per field.
+    """
+    operators = {
+        "$eq": lambda a, b: a == b,
+        "$ne": lambda a, b: a != b,
+        "$gt": lambda a, b: a > b,
+        "$gte": lambda a, b: a >= b,
+        "$lt": lambda a, b: a < b,
+        "$lte": lambda a, b: a <= b,
+    }
+    for field, condition in where.items():
+        value = metadata.get(field)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for operator, operand in condition.items():
+            if operator not in operators:
+                raise ValueError(f"unsupported filter operator {operator}")
+            if value is None or not operators[operator](value, operand):
+                return False
+    return True
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    A vector store of one document in memory-mapped NumPy matrices.
+
+    The unit vectors are saved as float16 or int8 rows of `vectors.npy`, the row of a chunk is
+    its id, and the text and metadata of the chunks are saved in the `chunks` table of
+    `chunks.db`. A chunk exists once its row is in the table, the row of the matrix is flushed
+    before. Search is a brute-force cosine similarity in blocks of rows, opening the store only
+    maps the files.
+    """
+
+    def __init__(
+        self,
+        persist_directory: str,
+        embedding_function: Embeddings,
+        capacity: int = None,
+        dtype: str = "float16",
+    ):
+        """
+        Args:
+            persist_directory (str): The folder of the store.
+            embedding_function (Embeddings): The embedding model.
+            capacity (int, optional): The number of rows to allocate, the matrix grows if needed.
+            dtype (str): "float16" or "int8", the type of a new matrix.
+        """
+        if dtype not in VECTOR_DTYPES:
+            raise ValueError(f"unsupported vector dtype {dtype}")
+        os.makedirs(persist_directory, exist_ok=True)
+        self.path = persist_directory
+        self.embedding_function = embedding_function
+        self.capacity = capacity or 0
+        self.dtype = dtype
+        self.vectors_path = os.path.join(persist_directory, VECTORS_NAME)
+        self.scales_path = os.path.join(persist_directory, SCALES_NAME)
+        self.lock = threading.Lock()
+        # set by `close`, the files are never touched after it
+        self.closed = False
+        # used by the indexing and the chat threads, every access holds the lock
+        self.conn = sqlite3.connect(
+            os.path.join(persist_directory, CHUNKS_NAME),
+            timeout=30,
+            check_same_thread=False,
+        )
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                id INTEGER PRIMARY KEY,
+                document TEXT NOT NULL,
+                metadata TEXT NOT NULL
+            )
+            """)
+        self.conn.commit()
+
+        self.matrix: Optional[np.ndarray] = None
+        self.scales: Optional[np.ndarray] = None
+        self.writable = False
+        if os.path.exists(self.vectors_path):
+            self.mapFiles("r")
+        self.valid = np.zeros(self.rows(), dtype=bool)
+        for (chunk_id,) in self.conn.execute("SELECT id FROM chunks"):
+            if chunk_id < len(self.valid):
+                self.valid[chunk_id] = True
+        # loaded by the first filtered search
+        self.metadatas: Optional[List[dict]] = None
+        self.filter_masks: Dict[str, np.ndarray] = {}
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding_function
+
+    def rows(self) -> int:
+        return 0 if self.matrix is None else self.matrix.shape[0]
+
+    def mapFiles(self, mode: str) -> None:
+        self.matrix = np.load(self.vectors_path, mmap_mode=mode)
+        self.dtype = self.matrix.dtype.name
+        self.scales = (
+            np.load(self.scales_path, mmap_mode=mode)
+            if os.path.exists(self.scales_path)
+            else None
+        )
+        self.writable = mode != "r"
+
+    def checkOpen(self) -> None:
+        if self.closed:
+            raise ValueError(f"vector store [{self.path}] is closed")
+
+    def reserve(self, rows: int, dim: int) -> None:
+        """Allocates the matrix of at least `rows` rows, the saved rows are copied."""
+        # a closed store has no matrix, a new one would replace the saved rows
+        self.checkOpen()
+        if self.matrix is not None and self.matrix.shape[1] != dim:
+            raise ValueError(
+                f"vector dimension {dim} does not match the store dimension {self.matrix.shape[1]}"
+            )
+        if rows <= self.rows():
+            if not self.writable:
+                self.mapFiles("r+")
+            return
+
+        capacity = max(rows, self.capacity, self.rows() * 2)
+        old_matrix, old_scales = self.matrix, self.scales
+        temp_path = self.vectors_path + ".tmp.npy"
+        matrix = np.lib.format.open_memmap(
+            temp_path, mode="w+", dtype=VECTOR_DTYPES[self.dtype], shape=(capacity, dim)
+        )
+        scales = None
+        if self.dtype == "int8":
+            scales_temp_path = self.scales_path + ".tmp.npy"
+            scales = np.lib.format.open_memmap(
+                scales_temp_path, mode="w+", dtype=np.float32, shape=(capacity,)
+            )
+        if old_matrix is not None:
+            logger.info(f"grow vector store [{self.path}] to {capacity} rows")
+            matrix[: len(old_matrix)] = old_matrix
+            if scales is not None and old_scales is not None:
+                scales[: len(old_scales)] = old_scales
+        matrix.flush()
+        # the old maps are closed before their files are replaced
+        del matrix, old_matrix, old_scales
+        self.matrix = self.scales = None
+        os.replace(temp_path, self.vectors_path)
+        if scales is not None:
+            scales.flush()
+            del scales
+            os.replace(scales_temp_path, self.scales_path)
+        self.mapFiles("r+")
+        self.valid = np.concatenate(
+            [self.valid, np.zeros(capacity - len(self.valid), dtype=bool)]
+        )
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        """
+        Adds or replaces the chunks, the ids are the rows of the chunks. Defaults to the rows
+        after the last saved chunk.
+        """
+        self.checkOpen()
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        vectors = normalize(self.embedding_function.embed_documents(texts))
+        with self.lock:
+            self.checkOpen()
+            if ids is None:
+                start = (
+                    int(np.flatnonzero(self.valid)[-1]) + 1 if self.valid.any() else 0
+                )
+                ids = [str(start + index) for index in range(len(texts))]
+            rows = np.array([int(chunk_id) for chunk_id in ids], dtype=np.int64)
+            if len(rows):
+                self.reserve(int(rows.max()) + 1, vectors.shape[1])
+                quantized, scales = quantize(vectors, self.dtype)
+                self.matrix[rows] = quantized
+                self.matrix.flush()
+                if self.scales is not None:
+                    self.scales[rows] = scales
+                    self.scales.flush()
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO chunks (id, document, metadata) VALUES (?, ?, ?)",
+                    [
+                        (int(row), text, json.dumps(metadata, ensure_ascii=False))
+                        for row, text, metadata in zip(rows, texts, metadatas)
+                    ],
+                )
+            self.valid[rows] = True
+            self.metadatas = None
+            self.filter_masks.clear()
+        return list(ids)
+
+    def loadMetadatas(self) -> List[dict]:
+        metadatas = [{} for _ in range(self.rows())]
+        for chunk_id, metadata in self.conn.execute("SELECT id, metadata FROM chunks"):
+            if chunk_id < len(metadatas):
+                metadatas[chunk_id] = json.loads(metadata)
+        return metadatas
+
+    def filterMask(self, where: dict) -> np.ndarray:
+        key = json.dumps(where, sort_keys=True)
+        if key not in self.filter_masks:
+            if self.metadatas is None:
+                self.metadatas = self.loadMetadatas()
+            if len(self.filter_masks) >= FILTER_CACHE_SIZE:
+                self.filter_masks.pop(next(iter(self.filter_masks)))
+            self.filter_masks[key] = np.array(
+                [matchFilter(metadata, where) for metadata in self.metadatas],
+                dtype=bool,
+            )
+        return self.filter_masks[key]
+
+    def readChunks(self, chunk_ids: List[int]) -> Dict[int, Document]:
+        documents = {}
+        for start in range(0, len(chunk_ids), QUERY_CHUNK):
+            chunk = chunk_ids[start : start + QUERY_CHUNK]
+            rows = self.conn.execute(
+                f"SELECT id, document, metadata FROM chunks WHERE id IN ({', '.join('?' * len(chunk))})",
+                chunk,
+            ).fetchall()
+            for chunk_id, text, metadata in rows:
+                documents[chunk_id] = Document(
+                    page_content=text, metadata=json.loads(metadata)
+                )
+        return documents
+
+    def similarity_search_by_vector_with_score(
+        self, embedding: List[float], k: int = 4, filter: dict = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        """
+        Returns:
+            list: The best `k` chunks and their cosine similarity to the vector.
+        """
+        query = normalize(embedding)
+        with self.lock:
+            self.checkOpen()
+            if self.matrix is None or k <= 0:
+                return []
+            mask = self.valid
+            if filter:
+                mask = mask & self.filterMask(filter)
+            scores = np.full(self.rows(), -np.inf, dtype=np.float32)
+            for start in range(0, self.rows(), SEARCH_BLOCK_ROWS):
+                end = min(start + SEARCH_BLOCK_ROWS, self.rows())
+                if not mask[start:end].any():
+                    continue
+                block = self.matrix[start:end].astype(np.float32) @ query
+                if self.scales is not None:
+                    block *= self.scales[start:end]
+                scores[start:end] = block
+            scores[~mask] = -np.inf
+
+            matched = np.flatnonzero(mask)
+            if len(matched) > k:
+                matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+            matched = matched[np.argsort(-scores[matched], kind="stable")]
+            documents = self.readChunks([int(row) for row in matched])
+        return [(documents[int(row)], float(scores[row])) for row in matched]
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, filter: dict = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(
+            self.embedding_function.embed_query(query), k, filter
+        )
+
+    def similarity_search_by_vector(
+        self, embedding: List[float], k: int = 4, filter: dict = None, **kwargs: Any
+    ) -> List[Document]:
+        return [
+            document
+            for document, _ in self.similarity_search_by_vector_with_score(
+                embedding, k, filter
+            )
+        ]
+
+    def similarity_search(
+        self, query: str, k: int = 4, filter: dict = None, **kwargs: Any
+    ) -> List[Document]:
+        return [
+            document
+            for document, _ in self.similarity_search_with_score(query, k, filter)
+        ]
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        # cosine similarity to [0, 1]
+        return lambda score: (score + 1) / 2
+
+    def get(self) -> dict:
+        """The ids, texts and metadatas of the saved chunks like `Chroma.get`."""
+        with self.lock:
+            self.checkOpen()
+            rows = self.conn.execute(
+                "SELECT id, document, metadata FROM chunks ORDER BY id"
+            ).fetchall()
+        return {
+            "ids": [str(chunk_id) for chunk_id, _, _ in rows],
+            "documents": [text for _, text, _ in rows],
+            "metadatas": [json.loads(metadata) for _, _, metadata in rows],
+        }
+
+    def close(self) -> None:
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.matrix = self.scales = None
+            self.conn.close()
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        persist_directory: str = None,
+        dtype: str = "float16",
+        **kwargs: Any,
+    ) -> "NumpyVectorStore":
+        store = cls(persist_directory, embedding, capacity=len(texts), dtype=dtype)
+        store.add_texts(texts, metadatas, ids=kwargs.get("ids"))
+        return store
@@ -1,3 +1,4 @@
+import httpx
 from Functions.Config import cfg
 from Functions.ErrorString import error_string
 from langchain_openai import ChatOpenAI, OpenAI, OpenAIEmbeddings
@@ -23,8 +24,6 @@ def __getConfig() -> (str, str, str):
     logger.info("OpenAI API url: %s", api_url)
     if model == "":
         raise Exception(error_string.NO_VALID_LLM_NAME)
-    if embed_model == "":
-        raise Exception(error_string.NO_VALID_EMBED_LLM_NAME)
     if api_key == "":
         raise Exception(error_string.NO_VALID_LLM_API)
     if api_url == "":
@@ -33,11 +32,14 @@ def __getConfig() -> (str, str, str):
     return api_key, api_url, model, embed_model
 
 
-def getOpenAIChatModel() -> ChatOpenAI:
+def getOpenAIChatModel(http_client: httpx.Client = None) -> ChatOpenAI:
     """
     Retrieves an instance of the ChatOpenAI class with the OpenAI API key, URL, and model name
     obtained from the getConfig() function.
 
+    Args:
+        http_client (httpx.Client, optional): The connection pool of the requests, a new one if None.
+
     Returns:
         ChatOpenAI: An instance of the ChatOpenAI class with the specified API key, URL, model name,
         and temperature set to 0.7.
@@ -49,16 +51,21 @@ def getOpenAIChatModel() -> ChatOpenAI:
         openai_api_key=api_key,
         openai_api_base=api_url,
         temperature=0.7,
+        http_client=http_client,
     )
 
 
-def getOpenAIEmbedding() -> OpenAIEmbeddings:
+def getOpenAIEmbedding(http_client: httpx.Client = None) -> OpenAIEmbeddings:
     api_key, api_url, _, embed_model = __getConfig()
+    # the chat model works without embedding, only the embedding needs a model name
+    if embed_model == "":
+        raise Exception(error_string.NO_VALID_EMBED_LLM_NAME)
     return OpenAIEmbeddings(
         model=embed_model,
         openai_api_key=api_key,
         openai_api_base=api_url,
         check_embedding_ctx_length=False,
+        http_client=http_client,
     )
 
 
@@ -0,0 +1,216 @@
+import datetime
+import json
+import os
+import re
+import shutil
+import threading
+from typing import Dict, List, NamedTuple, Optional
+
+from EmbeddingCache import EMBEDDING_CACHE_NAME
+from EmbeddingStore import MANIFEST_NAME, STATUS_READY
+from Functions.Config import cfg
+from ModuleLogger import logger
+
+# stores named after the md5 of the PDF path, they are not used since the stores are
+# addressed by content
+LEGACY_STORE_SUFFIX = "_db"
+LEGACY_STORE_PATTERN = re.compile(r"[0-9a-f]{32}" + re.escape(LEGACY_STORE_SUFFIX))
+STATUS_LEGACY = "legacy"
+MEGABYTE = 1 << 20
+
+
+class StoreUsage(NamedTuple):
+    """The disk usage of one store of the database folder."""
+
+    path: str
+    name: str
+    size: int
+    last_used: float
+    status: str
+
+
+def directorySize(path: str) -> int:
+    size = 0
+    for root, _, files in os.walk(path):
+        for file in files:
+            try:
+                size += os.path.getsize(os.path.join(root, file))
+            except OSError:
+                # removed while walking
+                pass
+    return size
+
+
+def parseTime(value: Optional[str]) -> Optional[float]:
+    try:
+        return datetime.datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+class StoreManager:
+    """
+    Accounts the stores of the database folder and keeps them under a disk budget.
+
+    The stores are removed least recently used first, the last use is recorded in the manifest
+    by `EmbeddingStore.touch`. Stores of the old path-based layout are never loaded again and
+    are removed before any other. Stores opened by a chat are never removed, see `acquire`,
+    nor the folders without a manifest which are not named like an old store.
+    """
+
+    def __init__(self, database_folder: str = None):
+        """
+        Args:
+            database_folder (str, optional): The folder of all stores. Defaults to the configuration.
+        """
+        self.database_folder = database_folder
+        self.in_use: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def folder(self) -> str:
+        return self.database_folder or cfg.get(cfg.database_folder)
+
+    def acquire(self, path: str) -> None:
+        """Keeps the store from being removed until it is released."""
+        path = os.path.abspath(path)
+        with self.lock:
+            self.in_use[path] = self.in_use.get(path, 0) + 1
+
+    def release(self, path: str) -> None:
+        path = os.path.abspath(path)
+        with self.lock:
+            count = self.in_use.get(path, 0) - 1
+            if count > 0:
+                self.in_use[path] = count
+            else:
+                self.in_use.pop(path, None)
+
+    def isInUse(self, path: str) -> bool:
+        with self.lock:
+            return os.path.abspath(path) in self.in_use
+
+    def readUsage(self, path: str) -> Optional[StoreUsage]:
+        """
+        Returns:
+            StoreUsage: The usage of the store, None if the folder is not a store.
+        """
+        try:
+            with open(os.path.join(path, MANIFEST_NAME), "r", encoding="utf-8") as file:
+                manifest = json.load(file)
+        except (OSError, ValueError):
+            manifest = None
+
+        name = os.path.basename(path)
+        if not isinstance(manifest, dict):
+            if LEGACY_STORE_PATTERN.fullmatch(name) is None:
+                # the database folder is set by the user, the folders of other apps and
+                # the stores with a broken manifest are kept
+                logger.warning(f"skip embed db folder without a manifest [{path}]")
+                return None
+            return StoreUsage(
+                path, name, directorySize(path), os.path.getmtime(path), STATUS_LEGACY
+            )
+
+        mtime = os.path.getmtime(path)
+        sources = manifest.get("sources") or [path]
+        last_used = None
+        for field in ("last_used_on", "finished_on", "created_on"):
+            last_used = parseTime(manifest.get(field))
+            if last_used is not None:
+                break
+        return StoreUsage(
+            path,
+            os.path.basename(sources[-1]),
+            directorySize(path),
+            last_used or mtime,
+            manifest.get("status", STATUS_READY),
+        )
+
+    def usage(self) -> List[StoreUsage]:
+        """
+        Returns:
+            list: The usage of every store of the database folder, most recently used first.
+        """
+        folder = self.folder()
+        try:
+            names = os.listdir(folder)
+        except FileNotFoundError:
+            return []
+
+        stores = []
+        for name in names:
+            path = os.path.abspath(os.path.join(folder, name))
+            if not os.path.isdir(path):
+                # the embedding cache and other files are not stores
+                continue
+            try:
+                store = self.readUsage(path)
+            except OSError as e:
+                logger.warning(f"read embed db usage [{path}] error: {e}")
+                continue
+            if store is not None:
+                stores.append(store)
+        return sorted(stores, key=lambda store: store.last_used, reverse=True)
+
+    def cacheSize(self) -> int:
+        """The size of the shared embedding cache with its WAL files."""
+        path = os.path.join(self.folder(), EMBEDDING_CACHE_NAME)
+        return sum(
+            os.path.getsize(path + suffix)
+            for suffix in ("", "-wal", "-shm")
+            if os.path.exists(path + suffix)
+        )
+
+    def remove(self, store: StoreUsage) -> bool:
+        """
+        Returns:
+            bool: Whether the store is removed, stores in use are kept.
+        """
+        if self.isInUse(store.path):
+            return False
+        try:
+            shutil.rmtree(store.path)
+        except OSError as e:
+            # the files of a store opened by another Chroma client could be locked
+            logger.warning(f"remove embed db [{store.path}] error: {e}")
+            return False
+        logger.info(
+            f"remove embed db [{store.name}] -> [{store.path}]: {store.size / MEGABYTE:.1f} MB"
+        )
+        return True
+
+    def collect(self, budget: int = None) -> List[StoreUsage]:
+        """
+        Removes the old-layout stores, then the least recently used stores until the total
+        size fits the budget.
+
+        Args:
+            budget (int, optional): The max bytes of all stores. Defaults to the configuration.
+
+        Returns:
+            list: The removed stores.
+        """
+        if budget is None:
+            budget = cfg.get(cfg.database_budget) * MEGABYTE
+        stores = self.usage()
+        total = sum(store.size for store in stores)
+        # legacy stores first, then the least recently used
+        candidates = sorted(
+            stores,
+            key=lambda store: (store.status != STATUS_LEGACY, store.last_used),
+        )
+        removed = []
+        for store in candidates:
+            if total <= budget and store.status != STATUS_LEGACY:
+                break
+            if self.remove(store):
+                total -= store.size
+                removed.append(store)
+        if total > budget:
+            logger.warning(
+                f"embed db uses {total / MEGABYTE:.1f} MB over the budget of {budget / MEGABYTE:.1f} MB"
+            )
+        return removed
+
+
+storeManager = StoreManager()
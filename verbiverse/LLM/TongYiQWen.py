@@ -25,8 +25,6 @@ def __getConfig() -> (str, str):
 
     if model == "":
         raise Exception(error_string.NO_VALID_LLM_NAME)
-    if embed_model == "":
-        raise Exception(error_string.NO_VALID_EMBED_LLM_NAME)
     if api_key == "":
         raise Exception(error_string.NO_VALID_LLM_API)
     return api_key, model, embed_model
@@ -48,6 +46,8 @@ def getTongYiChatModel() -> ChatTongyi:
 
 def getDashScopeEmbedding() -> DashScopeEmbeddings:
     api_key, _, embed_model = __getConfig()
+    if embed_model == "":
+        raise Exception(error_string.NO_VALID_EMBED_LLM_NAME)
     return DashScopeEmbeddings(model=embed_model, dashscope_api_key=api_key)
 
 
@@ -59,9 +59,11 @@ class MainWindow(FluentWindow):
         connectSignalToSlot(): Connects signals to their respective slots.
         switchPage(page_name: str): Switches to the specified page.
         showStatusMessage(title: str, content: str): Displays a status message.
+        updateStatusMessage(title: str, content: str): Updates the current status message.
         showInfoMessage(info_message: str): Displays an info message.
         showWarningMessage(warning_message: str): Displays a warning message.
         showErrorMessage(error_message: str): Displays an error message.
+        closeEvent(event): Cancels the running explanations and closes the connection pools.
     """
 
     def __init__(self):
@@ -133,6 +135,7 @@ class MainWindow(FluentWindow):
         signalBus.warning_signal.connect(self.showWarningMessage)
         signalBus.error_signal.connect(self.showErrorMessage)
         signalBus.status_signal.connect(self.showStatusMessage)
+        signalBus.status_progress_signal.connect(self.updateStatusMessage)
         self.stateTooltip = None
         signalBus.mica_enable_change_signal.connect(self.setMicaEffectEnabled)
 
@@ -168,6 +171,21 @@ class MainWindow(FluentWindow):
             # self.stateTooltip.move(510, 30)
             self.stateTooltip.show()
 
+    @Slot(str, str)
+    def updateStatusMessage(self, title: str, content: str):
+        """
+        Updates the content of the current status message, keeps it open.
+
+        Args:
+            title (str): The title of the status message.
+            content (str): The content of the status message.
+        """
+        if self.stateTooltip is None:
+            return
+        if len(title) > 0:
+            self.stateTooltip.setTitle(title)
+        self.stateTooltip.setContent(content)
+
     @Slot(str)
     def showInfoMessage(self, info_message: str):
         """
@@ -223,6 +241,17 @@ class MainWindow(FluentWindow):
             parent=self,
         )
 
+    def closeEvent(self, event):
+        from LLM.ExplainService import explain_service
+
+        # the registry of the LLM modules, which import it by its bare name
+        from LLMServerInfo import model_registry
+
+        # the explanations still streaming are cancelled with their HTTP streams
+        explain_service.stopAll()
+        model_registry.close()
+        super().closeEvent(event)
+
 
 def main():
     """
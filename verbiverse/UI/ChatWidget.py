@@ -1,4 +1,5 @@
 from ChatWidget_ui import Ui_ChatWidget
+from Functions.SignalBus import signalBus
 from LLM.ChatRAGChain import ChatRAGChain
 from LLM.ChatWithCustomHistoryChain import ChatLLMWithCustomHistory
 from LLM.ChatWorkerThread import ChatWorkThread
@@ -30,6 +31,8 @@ class ChatWidget(QWidget, Ui_ChatWidget):
 
         self.chat_chain = None
         self.check_chain = None
+        self.reader = None
+        self.reading_page = 1
         self.chat_worker = ChatWorkThread()
         self.chat_worker.finished.connect(self.workerThreadFinish)
         self.chat_worker.started.connect(self.workerThreadStart)
@@ -40,15 +43,25 @@ class ChatWidget(QWidget, Ui_ChatWidget):
         self.user_check_button.setIcon(FIF.EDIT)
         self.connectSignal()
 
-    def setRAGData(self, reader):
+    def setRAGData(self, reader, page: int = 1):
         """
         Sets the RAG data reader.
 
         Args:
             reader: The data reader to be used by the chat chain.
+            page (int): The reading page of the reader, 1 based.
         """
+        if self.chat_chain is not None:
+            self.chat_chain.close()
         self.chat_chain = None
         self.reader = reader
+        self.reading_page = page
+
+    @Slot(str, int)
+    def updateReadingPage(self, file_path: str, page: int):
+        """Keeps the reading page to index the nearest pages first when the chat starts."""
+        if self.reader is not None and file_path == self.reader.pdf_path:
+            self.reading_page = page
 
     def connectSignal(self):
         """Connects the signals to their respective slots."""
@@ -56,11 +69,12 @@ class ChatWidget(QWidget, Ui_ChatWidget):
             lambda: asyncio.ensure_future(self.sendMessage())
         )
         self.user_check_button.clicked.connect(self.checkInput)
+        signalBus.update_file_schedule_signal.connect(self.updateReadingPage)
 
     async def initChatChain(self):
         """Initializes the chat chain if it is not already initialized."""
         if self.chat_chain is None:
-            self.chat_chain = ChatRAGChain(self.reader)
+            self.chat_chain = ChatRAGChain(self.reader, self.reading_page)
             await self.chat_chain.createChatChain()
 
     def initCheckChain(self):
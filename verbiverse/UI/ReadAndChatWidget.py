@@ -87,7 +87,7 @@ class ReadAndChatWidget(QWidget, Ui_ReadAndChatWidget):
     def updatePdfReader(self, reader: PdfReader):
         self.pdf_reader = reader
         self.web_view.setPdfReader(reader)
-        self.tab_widget.chat_widget.setRAGData(reader)
+        self.tab_widget.chat_widget.setRAGData(reader, self.web_view.pdf_current_page)
         path = self.local_file_path.toLocalFile()
         logger.info(
             f"read pdf [{path}] finish get [{len(self.pdf_reader.pages)}] pages"
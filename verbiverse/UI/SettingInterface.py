@@ -1,14 +1,17 @@
-from typing import Union
+import datetime
+from typing import List, Union
 
+import LLM  # noqa: F401, adds the LLM modules imported by their bare names
 from CustomWidgets.StyleSheet import StyleSheet
 from Functions.Config import AUTHOR, FEEDBACK_URL, HELP_URL, VERSION, YEAR, cfg, isWin11
 from Functions.SignalBus import signalBus
-from PySide6.QtCore import Qt, QUrl, Signal
+from PySide6.QtCore import Qt, QTimer, QUrl, Signal
 from PySide6.QtGui import QDesktopServices, QIcon
 from PySide6.QtWidgets import QFileDialog, QWidget
 from qfluentwidgets import (
     ComboBoxSettingCard,
     CustomColorSettingCard,
+    ExpandGroupSettingCard,
     ExpandLayout,
     FluentIconBase,
     HyperlinkCard,
@@ -19,7 +22,9 @@ from qfluentwidgets import (
     OptionsSettingCard,
     PasswordLineEdit,
     PrimaryPushSettingCard,
+    PushButton,
     PushSettingCard,
+    RangeSettingCard,
     ScrollArea,
     SettingCard,
     SettingCardGroup,
@@ -29,6 +34,7 @@ from qfluentwidgets import (
     setThemeColor,
 )
 from qfluentwidgets import FluentIcon as FIF
+from StoreManager import MEGABYTE, StoreUsage, storeManager
 
 
 class PasswordInputSettingCard(SettingCard):
@@ -81,6 +87,73 @@ class InputSettingCard(SettingCard):
         self.editing_finished.emit()
 
 
+class StoreUsageCard(ExpandGroupSettingCard):
+    """The disk usage of the vector store of every book"""
+
+    def __init__(
+        self,
+        icon: Union[str, QIcon, FluentIconBase],
+        title,
+        content=None,
+        parent=None,
+    ):
+        super().__init__(icon, title, content, parent)
+        self.clean_button = PushButton(self.tr("Clean up"), self)
+        self.addWidget(self.clean_button)
+        self.clean_button.clicked.connect(self.cleanUp)
+        self.groups: List[QWidget] = []
+
+    def cleanUp(self):
+        removed = storeManager.collect()
+        if removed:
+            InfoBar.success(
+                self.tr("Cleaned up"),
+                self.tr("Removed the indexes of {0} books").format(len(removed)),
+                duration=1500,
+                parent=self.window(),
+            )
+        self.refresh()
+
+    def removeStore(self, store: StoreUsage):
+        storeManager.remove(store)
+        self.refresh()
+
+    def refresh(self):
+        for group in self.groups:
+            self.removeGroupWidget(group)
+            group.deleteLater()
+        self.groups.clear()
+
+        stores = storeManager.usage()
+        total = sum(store.size for store in stores)
+        self.card.setContent(
+            self.tr(
+                "{1:.1f} of {2} MB used by {0} book indexes, {3:.1f} MB by the embedding cache"
+            ).format(
+                len(stores),
+                total / MEGABYTE,
+                cfg.get(cfg.database_budget),
+                storeManager.cacheSize() / MEGABYTE,
+            )
+        )
+        for store in stores:
+            button = PushButton(self.tr("Remove"))
+            # the store of an open chat is kept
+            button.setEnabled(not storeManager.isInUse(store.path))
+            button.clicked.connect(lambda _, store=store: self.removeStore(store))
+            last_used = datetime.datetime.fromtimestamp(store.last_used)
+            self.groups.append(
+                self.addGroup(
+                    FIF.BOOK_SHELF,
+                    store.name,
+                    self.tr("{0:.1f} MB, last used {1}").format(
+                        store.size / MEGABYTE, last_used.strftime("%Y-%m-%d %H:%M")
+                    ),
+                    button,
+                )
+            )
+
+
 class SettingInterface(ScrollArea):
     """Setting interface"""
 
@@ -152,6 +225,31 @@ class SettingInterface(ScrollArea):
             texts=["Chinese", "English", "Japanese"],
             parent=self.function_info_group,
         )
+        self.explain_cache_card = SwitchSettingCard(
+            FIF.HISTORY,
+            self.tr("Explain cache"),
+            self.tr(
+                "Show the explanations of the same text and context from the cache, they can be regenerated"
+            ),
+            cfg.explain_cache,
+            self.function_info_group,
+        )
+        self.explain_concurrency_card = RangeSettingCard(
+            cfg.explain_concurrency,
+            FIF.SPEED_HIGH,
+            self.tr("Concurrent explanations"),
+            self.tr("Set the number of explanations requested from the LLM at once"),
+            parent=self.function_info_group,
+        )
+        self.explain_context_tokens_card = RangeSettingCard(
+            cfg.explain_context_tokens,
+            FIF.ALIGNMENT,
+            self.tr("Explanation context"),
+            self.tr(
+                "Set about the tokens of the sentences around the selected text sent to the LLM"
+            ),
+            parent=self.function_info_group,
+        )
         # self.datebase_save_path = PushSettingCard(
         #     self.tr("Choose folder"),
         #     FIF.CLOUD,
@@ -160,6 +258,107 @@ class SettingInterface(ScrollArea):
         #     self.function_info_group,
         # )
 
+        # chat
+        self.chat_group = SettingCardGroup(self.tr("Chat settings"), self.scroll_widget)
+        self.chat_page_window_card = RangeSettingCard(
+            cfg.chat_page_window,
+            FIF.LIBRARY,
+            self.tr("Reading page window"),
+            self.tr(
+                "Prefer the book content within this number of pages of the reading page, 0 to search the whole book evenly"
+            ),
+            parent=self.chat_group,
+        )
+        self.chat_page_decay_card = RangeSettingCard(
+            cfg.chat_page_decay,
+            FIF.ALIGNMENT,
+            self.tr("Reading page decay"),
+            self.tr(
+                "Set the percent of the preference kept for every page away from the reading page"
+            ),
+            parent=self.chat_group,
+        )
+        self.chat_read_pages_only_card = SwitchSettingCard(
+            FIF.HIDE,
+            self.tr("Read pages only"),
+            self.tr(
+                "Only answer with the pages up to the reading page to avoid spoilers"
+            ),
+            cfg.chat_read_pages_only,
+            self.chat_group,
+        )
+
+        self.chat_answer_cache_card = SwitchSettingCard(
+            FIF.HISTORY,
+            self.tr("Answer cache"),
+            self.tr("Answer the questions asked before from the cache of the book"),
+            cfg.chat_answer_cache,
+            self.chat_group,
+        )
+        self.chat_cache_similarity_card = RangeSettingCard(
+            cfg.chat_cache_similarity,
+            FIF.SYNC,
+            self.tr("Similar question"),
+            self.tr(
+                "Set the percent of similarity to reuse the search of a cached question, 100 for the same question only"
+            ),
+            parent=self.chat_group,
+        )
+        self.vector_store_card = ComboBoxSettingCard(
+            cfg.vector_store_backend,
+            FIF.DICTIONARY,
+            self.tr("Vector store"),
+            self.tr(
+                "Set the storage of the book indexes, NumPy matrices open faster and use less memory and disk"
+            ),
+            texts=["Chroma", "NumPy float16", "NumPy int8"],
+            parent=self.chat_group,
+        )
+        self.database_budget_card = RangeSettingCard(
+            cfg.database_budget,
+            FIF.SAVE,
+            self.tr("Index disk budget"),
+            self.tr(
+                "Set the megabytes of the book indexes, the least recently read books are removed over it"
+            ),
+            parent=self.chat_group,
+        )
+        self.store_usage_card = StoreUsageCard(
+            FIF.BOOK_SHELF,
+            self.tr("Book indexes"),
+            parent=self.chat_group,
+        )
+        # clean up the book indexes once the slider stops moving
+        self.database_budget_timer = QTimer(self)
+        self.database_budget_timer.setSingleShot(True)
+        self.database_budget_timer.setInterval(500)
+
+        # review
+        self.review_group = SettingCardGroup(
+            self.tr("Review settings"), self.scroll_widget
+        )
+        self.review_scheduler_card = ComboBoxSettingCard(
+            cfg.review_scheduler,
+            FIF.CALENDAR,
+            self.tr("Review scheduler"),
+            self.tr("Set the spaced repetition algorithm of the words book"),
+            texts=["SM-2", "FSRS"],
+            parent=self.review_group,
+        )
+        self.desired_retention_card = RangeSettingCard(
+            cfg.desired_retention,
+            FIF.SPEED_HIGH,
+            self.tr("Desired retention"),
+            self.tr(
+                "Set the percent of words to remember at review time, higher means more reviews"
+            ),
+            parent=self.review_group,
+        )
+        # reschedule the words book once the slider stops moving
+        self.review_config_timer = QTimer(self)
+        self.review_config_timer.setSingleShot(True)
+        self.review_config_timer.setInterval(500)
+
         # personalization
         self.personal_group = SettingCardGroup(
             self.tr("Personalization"), self.scroll_widget
@@ -284,8 +483,23 @@ class SettingInterface(ScrollArea):
         self.function_info_group.addSettingCard(self.provide_url)
         # self.function_info_group.addSettingCard(self.target_language_card)
         self.function_info_group.addSettingCard(self.mother_tongue_card)
+        self.function_info_group.addSettingCard(self.explain_cache_card)
+        self.function_info_group.addSettingCard(self.explain_concurrency_card)
+        self.function_info_group.addSettingCard(self.explain_context_tokens_card)
         # self.function_info_group.addSettingCard(self.datebase_save_path)
 
+        self.chat_group.addSettingCard(self.chat_page_window_card)
+        self.chat_group.addSettingCard(self.chat_page_decay_card)
+        self.chat_group.addSettingCard(self.chat_read_pages_only_card)
+        self.chat_group.addSettingCard(self.chat_answer_cache_card)
+        self.chat_group.addSettingCard(self.chat_cache_similarity_card)
+        self.chat_group.addSettingCard(self.vector_store_card)
+        self.chat_group.addSettingCard(self.database_budget_card)
+        self.chat_group.addSettingCard(self.store_usage_card)
+
+        self.review_group.addSettingCard(self.review_scheduler_card)
+        self.review_group.addSettingCard(self.desired_retention_card)
+
         self.personal_group.addSettingCard(self.mica_card)
         self.personal_group.addSettingCard(self.themeCard)
         self.personal_group.addSettingCard(self.themeColorCard)
@@ -302,10 +516,17 @@ class SettingInterface(ScrollArea):
         self.expand_layout.setSpacing(28)
         self.expand_layout.setContentsMargins(36, 10, 36, 0)
         self.expand_layout.addWidget(self.function_info_group)
+        self.expand_layout.addWidget(self.chat_group)
+        self.expand_layout.addWidget(self.review_group)
         self.expand_layout.addWidget(self.personal_group)
         # self.expand_layout.addWidget(self.updateSoftwareGroup)
         self.expand_layout.addWidget(self.aboutGroup)
 
+    def showEvent(self, event):
+        super().showEvent(event)
+        # the indexes change while reading
+        self.store_usage_card.refresh()
+
     def __showRestartTooltip(self):
         """show restart tooltip"""
         InfoBar.success(
@@ -352,6 +573,26 @@ class SettingInterface(ScrollArea):
         )
         # self.datebase_save_path.clicked.connect(self.__onDatabaseSetFolderCardClicked)
 
+        # chat
+        self.vector_store_card.comboBox.currentIndexChanged.connect(
+            lambda _: signalBus.llm_config_change_signal.emit()
+        )
+        self.database_budget_card.valueChanged.connect(
+            lambda _: self.database_budget_timer.start()
+        )
+        self.database_budget_timer.timeout.connect(self.store_usage_card.cleanUp)
+
+        # review
+        self.review_scheduler_card.comboBox.currentIndexChanged.connect(
+            lambda _: signalBus.review_config_change_signal.emit()
+        )
+        self.desired_retention_card.valueChanged.connect(
+            lambda _: self.review_config_timer.start()
+        )
+        self.review_config_timer.timeout.connect(
+            lambda: signalBus.review_config_change_signal.emit()
+        )
+
         # personalization
         self.themeCard.optionChanged.connect(lambda ci: setTheme(cfg.get(ci)))
         self.themeColorCard.colorChanged.connect(lambda c: setThemeColor(c))
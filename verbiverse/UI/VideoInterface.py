@@ -3,11 +3,12 @@ import os
 import traceback
 
 import pysrt
-from CustomWidgets import ExplainWindow
 from CustomWidgets.ExplainFlyoutView import ExplainFlyoutView
+from CustomWidgets.ExplainSession import ExplainSession
+from Functions.Config import cfg
 from Functions.LanguageType import ExplainLanguage
 from Functions.SignalBus import signalBus
-from LLM.ExplainWorkerThread import ExplainWorkerThread
+from LLM.ExplainContext import context_builder
 from ModuleLogger import logger
 from PySide6.QtCore import QPoint, Qt, QThread, QTimer, QUrl, Slot
 from PySide6.QtGui import QAction, QCursor, QKeySequence, QShortcut
@@ -281,15 +282,12 @@ class VideoInterface(QWidget, Ui_VideoInterface):
 
     @Slot(str)
     def _onExplainSignal(self, word: str):
-        if hasattr(self, "worker") and self.worker is not None:
-            logger.warning("flyout explain thread is not done")
-            return
         logger.info(f"explain signal: {word}")
         # 向上偏移避免超出屏幕
         cursor_pos = QCursor.pos()
         cursor_pos.setX(cursor_pos.x() + 10)
         cursor_pos.setY(cursor_pos.y() - 200)
-        self.explain_flyout = Flyout.make(
+        explain_flyout = Flyout.make(
             ExplainFlyoutView(word),
             cursor_pos,
             self,
@@ -300,74 +298,26 @@ class VideoInterface(QWidget, Ui_VideoInterface):
             self.file_path + " -> " + str(self.subtitle[self.subtitle_index].start)
         )
         logger.info(f"explanation location: {location}")
-        self.explain_flyout.view.setTextResource(location)
-        self.explain_flyout.closed.connect(self.explainClose)
-        self.explain_flyout.view.pin_explain_signal.connect(self.pinFlyout)
-
-        self.explain_window = None
 
-        all_text = ""
-        for i in range(
-            max(0, self.subtitle_index - 15),
-            min(len(self.subtitle), self.subtitle_index + 15),
-        ):
-            if all_text != "":
-                all_text = all_text + "\n" + self.getSubtitleStr(self.subtitle[i])
-            else:
-                all_text = self.getSubtitleStr(self.subtitle[i])
-        self.worker = ExplainWorkerThread(
-            selected_text=word,
-            all_text=all_text,
-            language_type=ExplainLanguage.MOTHER_TONGUE,
+        start = max(0, self.subtitle_index - 15)
+        # one line per subtitle, so the lines are the subtitles around the word
+        lines = [
+            self.getSubtitleStr(self.subtitle[i]).replace("\n", " ")
+            for i in range(start, min(len(self.subtitle), self.subtitle_index + 15))
+        ]
+        all_text = context_builder.build(
+            (self.file_path, start),
+            "\n".join(lines),
+            word,
+            cfg.get(cfg.explain_context_tokens),
+            line_breaks=True,
+            focus=self.subtitle_index - start,
         )
-        self.worker.messageCallBackSignal.connect(self.onExplainResultUpdate)
-        self.worker.finished.connect(self.finishedExplain)
-        self.worker.start()
-
-    @Slot(str)
-    def onExplainResultUpdate(self, explain: str):
-        if self.explain_flyout is not None:
-            self.explain_flyout.view.setContent(
-                self.explain_flyout.view.getContent() + explain
-            )
-        elif self.explain_window is not None:
-            self.explain_window.setContent(self.explain_window.getContent() + explain)
-
-    @Slot()
-    def explainClose(self):
-        logger.debug("flyout close")
-        self.explain_flyout = None
-        if self.explain_window is None:
-            self.stopWorker()
-
-    @Slot()
-    def finishedExplain(self):
-        self.explain_flyout = None
-        self.explain_window = None
-        self.worker = None
-
-    @Slot(str, str, bool)
-    def pinFlyout(self, title: str, content: str, already_add: bool):
-        logger.debug(f"pin flyout {title} \n content{content}")
-        self.explain_window = ExplainWindow(
-            title,
-            content,
-            self.file_path + " -> " + str(self.subtitle[self.subtitle_index].start),
-            already_add,
+        ExplainSession(
+            explain_flyout,
+            word,
+            all_text,
+            ExplainLanguage.MOTHER_TONGUE,
+            location,
+            parent=self,
         )
-        self.explain_window.show()
-        self.explain_window.close_signal.connect(self.pinWindowClose)
-
-    @Slot()
-    def pinWindowClose(self):
-        logger.debug("webview window close")
-        self.explain_window = None
-        if self.explain_flyout is None:
-            self.stopWorker()
-
-    def stopWorker(self):
-        if self.worker is not None:
-            logger.debug("close video interface explain thread ... ")
-            self.worker.stop()
-            self.worker.wait()
-            logger.debug("close video interface explain thread done !!! ")
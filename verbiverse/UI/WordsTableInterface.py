@@ -1,3 +1,4 @@
+from PySide6.QtCore import QTimer, Slot
 from PySide6.QtWidgets import QWidget
 from qfluentwidgets import FluentIcon as FIF
 from UI import Ui_WordsTableInterface
@@ -8,4 +9,26 @@ class WordsTableInterface(QWidget, Ui_WordsTableInterface):
         super().__init__(parent)
         self.setupUi(self)
         self.refresh.setIcon(FIF.SYNC)
-        self.refresh.clicked.connect(self.words_table.updateTable)
+        self.refresh.clicked.connect(self.refreshTable)
+
+        # search while typing, wait a little to skip the intermediate input
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(150)
+        self.search_timer.timeout.connect(self.searchWords)
+        self.search_edit.textChanged.connect(lambda _: self.search_timer.start())
+        self.search_edit.searchSignal.connect(lambda _: self.searchWords())
+        self.search_edit.clearSignal.connect(self.refreshTable)
+
+    @Slot()
+    def refreshTable(self):
+        text = self.search_edit.text().strip()
+        if text:
+            self.words_table.searchWords(text)
+        else:
+            self.words_table.updateTable()
+
+    @Slot()
+    def searchWords(self):
+        self.search_timer.stop()
+        self.refreshTable()
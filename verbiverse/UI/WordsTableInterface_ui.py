@@ -15,11 +15,11 @@ from PySide6.QtGui import (QBrush, QColor, QConicalGradient, QCursor,
     QFont, QFontDatabase, QGradient, QIcon,
     QImage, QKeySequence, QLinearGradient, QPainter,
     QPalette, QPixmap, QRadialGradient, QTransform)
-from PySide6.QtWidgets import (QApplication, QGridLayout, QSizePolicy, QVBoxLayout,
-    QWidget)
+from PySide6.QtWidgets import (QApplication, QGridLayout, QHBoxLayout, QSizePolicy,
+    QSpacerItem, QVBoxLayout, QWidget)
 
 from CustomWidgets import WordsTable
-from qfluentwidgets import PrimaryToolButton
+from qfluentwidgets import (PrimaryToolButton, SearchLineEdit)
 
 class Ui_WordsTableInterface(object):
     def setupUi(self, WordsTableInterface):
@@ -31,10 +31,25 @@ class Ui_WordsTableInterface(object):
         self.verticalLayout = QVBoxLayout()
         self.verticalLayout.setObjectName(u"verticalLayout")
         self.verticalLayout.setContentsMargins(0, -1, -1, -1)
+        self.toolLayout = QHBoxLayout()
+        self.toolLayout.setObjectName(u"toolLayout")
+        self.search_edit = SearchLineEdit(WordsTableInterface)
+        self.search_edit.setObjectName(u"search_edit")
+        self.search_edit.setMinimumSize(QSize(240, 0))
+
+        self.toolLayout.addWidget(self.search_edit)
+
+        self.toolSpacer = QSpacerItem(40, 20, QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Minimum)
+
+        self.toolLayout.addItem(self.toolSpacer)
+
         self.refresh = PrimaryToolButton(WordsTableInterface)
         self.refresh.setObjectName(u"refresh")
 
-        self.verticalLayout.addWidget(self.refresh, 0, Qt.AlignRight)
+        self.toolLayout.addWidget(self.refresh)
+
+
+        self.verticalLayout.addLayout(self.toolLayout)
 
         self.words_table = WordsTable(WordsTableInterface)
         self.words_table.setObjectName(u"words_table")
@@ -52,6 +67,7 @@ class Ui_WordsTableInterface(object):
 
     def retranslateUi(self, WordsTableInterface):
         WordsTableInterface.setWindowTitle(QCoreApplication.translate("WordsTableInterface", u"Form", None))
+        self.search_edit.setPlaceholderText(QCoreApplication.translate("WordsTableInterface", u"Search words", None))
         self.refresh.setText("")
     # retranslateUi
 